@@ -46,16 +46,31 @@ High-level layout (MS-DOS family):
 from __future__ import annotations
 
 import argparse
+import array
+import base64
+import bisect
 import codecs
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
 import html
+import itertools
 import json
+import mmap
 import os
+import queue
+import re
 import struct
 import sys
+import threading
 import unicodedata
-from dataclasses import dataclass
+import zlib
+from dataclasses import dataclass, field, replace
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 
 # ====
@@ -255,7 +270,7 @@ CONTROL_CHAR_NAMES = [
 # Data classes
 # ====
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FarPtr:
     """
     Represents a far pointer (segment:offset) from DOS COUNTRY.SYS file.
@@ -272,7 +287,7 @@ class FarPtr:
     linear: int
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Tagged:
     """
     Represents a tagged data structure in COUNTRY.SYS.
@@ -289,19 +304,153 @@ class Tagged:
         magic_raw: Raw 7-byte magic string from file
         magic: Cleaned magic string (stripped of spaces/nulls)
         size: Size of payload in bytes
-        payload: The actual payload data
+        payload: The actual payload data (a memoryview into the file buffer
+            when the file was parsed zero-copy, see open_country_sys())
         dbcs_dummy_word: For DBCS tables with size==0, the dummy WORD that follows
+        digest: Content hash of the payload (see payload_digest()); blocks
+            with equal digests hold identical payloads
     """
     offset: int
     tag: int
     magic_raw: bytes
     magic: str
     size: int
-    payload: bytes
+    payload: Union[bytes, memoryview]
     dbcs_dummy_word: Optional[int] = None
+    digest: bytes = b""
 
 
-@dataclass
+class DecodedRecord(Mapping):
+    """
+    Base class for typed, slotted decoded subfunction records.
+
+    Records read like a read-only mapping of their fields in declaration
+    order, so printers, compare and JSON output can treat them exactly like
+    the plain dicts they replace. Subclasses pass eq=False to @dataclass so
+    that Mapping.__eq__ is kept and a record compares equal to its dict form.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.__dataclass_fields__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__dataclass_fields__)
+
+    def __len__(self) -> int:
+        return len(self.__dataclass_fields__)
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class CtyInfo(DecodedRecord):
+    """
+    Decoded CTYINFO (Country Information), see decode_ctyinfo().
+
+    Attributes:
+        country_id: Country code stored in the structure
+        codepage: Codepage stored in the structure
+        date_format: Date format code (0=MDY, 1=DMY, 2=YMD)
+        date_format_name: Name of date_format
+        currency_symbol: Currency symbol (display form of the ASCIIZ field)
+        thousands_sep: Thousands separator
+        decimal_sep: Decimal separator
+        date_sep: Date separator
+        time_sep: Time separator
+        currency_format: Currency format bit field
+        currency_decimals: Number of digits after the decimal separator
+        time_format: Time format code (0=12-hour, 1=24-hour)
+        time_format_name: Name of time_format
+        case_map_ptr_raw: Raw case map routine pointer
+        data_sep: Data list separator
+        reserved_len: Number of reserved bytes present
+        extra_len: Number of bytes beyond the known fields
+    """
+    country_id: int
+    codepage: int
+    date_format: int
+    date_format_name: str
+    currency_symbol: str
+    thousands_sep: str
+    decimal_sep: str
+    date_sep: str
+    time_sep: str
+    currency_format: int
+    currency_decimals: int
+    time_format: int
+    time_format_name: str
+    case_map_ptr_raw: int
+    data_sep: str
+    reserved_len: int
+    extra_len: int
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class FChar(DecodedRecord):
+    """
+    Decoded FCHAR (Filename Character) table, see decode_fchar().
+
+    Attributes:
+        characteristics: Characteristics byte
+        lowest_char: Lowest permissible filename character
+        highest_char: Highest permissible filename character
+        excluded_first: First excluded character of the excluded range
+        excluded_last: Last excluded character of the excluded range
+        num_terminators: Number of filename terminator characters
+        terminators_hex: Terminator characters as hex
+    """
+    characteristics: int
+    lowest_char: int
+    highest_char: int
+    excluded_first: int
+    excluded_last: int
+    num_terminators: int
+    terminators_hex: str
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class FCharRaw(DecodedRecord):
+    """
+    FCHAR table too short to decode; only its raw bytes.
+
+    Attributes:
+        raw_hex: Payload bytes as hex
+    """
+    raw_hex: str
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Dbcs(DecodedRecord):
+    """
+    Decoded DBCS lead byte table, see decode_dbcs().
+
+    Attributes:
+        ranges: (start, end) lead byte ranges
+        dbcs_dummy_word: Dummy WORD following an empty table, if any
+        payload_len: Payload length in bytes
+    """
+    ranges: List[Tuple[int, int]]
+    dbcs_dummy_word: Optional[int]
+    payload_len: int
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class YesNo(DecodedRecord):
+    """
+    Decoded YESNO prompt characters, see decode_yesno().
+
+    Attributes:
+        yes: Yes character(s), with a note if the FreeDOS '0' bug is present
+        no: No character(s)
+        raw_hex: Payload bytes as hex
+    """
+    yes: str
+    no: str
+    raw_hex: str
+
+
+@dataclass(slots=True)
 class SubfuncEntry:
     """
     Represents a subfunction entry within a country/codepage entry.
@@ -319,10 +468,10 @@ class SubfuncEntry:
     subfunc_id: int
     data_ptr: FarPtr
     tagged: Optional[Tagged] = None
-    decoded: Optional[Dict[str, Any]] = None
+    decoded: Optional[DecodedRecord] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class CountryEntry:
     """
     Represents a country/codepage entry in COUNTRY.SYS.
@@ -358,14 +507,690 @@ class ParsedCountrySys:
         pointer_info_type: Pointer type/version byte (usually 1)
         entry_table_ptrs: List of far pointers to entry tables
         entries: List of all country/codepage entries
-        warnings: List of warning messages generated during parsing
+        diagnostics: Diagnostics reported during parsing
+        warnings: Diagnostics rendered as warning messages (read-only)
+        buf: The buffer that was parsed (payloads may be views into it)
+        block_cache: Tagged block cache shared by all subfunction references
+        partial: True if a ParseBudget was exhausted and parsing stopped early
+        entry_filter: Filter applied while parsing (None = everything parsed)
+        filtered_out: Number of entries skipped by entry_filter
+        columns: Columnar index over entries for filtering/sorting/grouping
+        by_key, duplicate_keys, codepages_by_country, countries_by_codepage,
+        entries_by_subfunc: Lookup indexes, each built once on first use
+        census: Signature scan of all tagged blocks and the copyright trailer
+        orphan_blocks: Tagged blocks no parsed subfunction entry points at
     """
     file_size: int
     entry_table_count: int
     pointer_info_type: int
     entry_table_ptrs: List[FarPtr]
     entries: List[CountryEntry]
-    warnings: List[str]
+    diagnostics: Diagnostics
+    buf: Union[bytes, memoryview] = field(default=b"", repr=False)
+    block_cache: Optional[TaggedBlockCache] = field(default=None, repr=False)
+    partial: bool = False
+    entry_filter: Optional[EntryFilter] = None
+    filtered_out: int = 0
+
+    @property
+    def warnings(self) -> List[str]:
+        """Diagnostics as warning messages (see Diagnostics.messages)."""
+        return self.diagnostics.messages()
+
+    @functools.cached_property
+    def columns(self) -> EntryColumns:
+        """Columnar index over entries, built on first use (see EntryColumns)."""
+        return EntryColumns(self.entries)
+
+    @functools.cached_property
+    def by_key(self) -> Dict[Tuple[int, int], CountryEntry]:
+        """
+        (country, codepage) -> entry, in file order of first occurrence.
+
+        Malformed files can list a pair more than once; like DOS, which stops
+        at the first match while scanning the entry table, the first entry
+        wins. The later ones are in duplicate_keys.
+        """
+        self._build_key_index()
+        return self.by_key
+
+    @functools.cached_property
+    def duplicate_keys(self) -> Dict[Tuple[int, int], List[CountryEntry]]:
+        """(country, codepage) -> entries shadowed by an earlier entry with that key."""
+        self._build_key_index()
+        return self.duplicate_keys
+
+    def _build_key_index(self) -> None:
+        by_key: Dict[Tuple[int, int], CountryEntry] = {}
+        duplicates: Dict[Tuple[int, int], List[CountryEntry]] = {}
+        for e in self.entries:
+            key = (e.country, e.codepage)
+            if by_key.setdefault(key, e) is not e:
+                duplicates.setdefault(key, []).append(e)
+        # Fill both cached_property slots at once
+        self.__dict__["by_key"] = by_key
+        self.__dict__["duplicate_keys"] = duplicates
+
+    @functools.cached_property
+    def codepages_by_country(self) -> Dict[int, List[int]]:
+        """Country code -> sorted distinct codepages it has entries for."""
+        cols = self.columns
+        return {c: sorted(set(map(cols.codepage.__getitem__, rows)))
+                for c, rows in sorted(cols.group_by_country().items())}
+
+    @functools.cached_property
+    def countries_by_codepage(self) -> Dict[int, List[int]]:
+        """Codepage -> sorted distinct country codes that have entries for it."""
+        cols = self.columns
+        return {cp: sorted(set(map(cols.country.__getitem__, rows)))
+                for cp, rows in sorted(cols.group_by_codepage().items())}
+
+    @functools.cached_property
+    def entries_by_subfunc(self) -> Dict[int, List[CountryEntry]]:
+        """Subfunction ID -> entries that have it, in file order."""
+        entries = self.entries
+        return {sf_id: [entries[i] for i in rows]
+                for sf_id, rows in sorted(self.columns.group_by_subfunc().items())}
+
+    def find_entry(self, country: int, codepage: int) -> Optional[CountryEntry]:
+        """Return the entry for (country, codepage), or None (see by_key)."""
+        return self.by_key.get((country, codepage))
+
+    def entries_for(self, country: Optional[int] = None,
+                    codepage: Optional[int] = None) -> Dict[Tuple[int, int], CountryEntry]:
+        """
+        Subset of by_key matching a country and/or codepage filter.
+
+        Args:
+            country: Country code to filter by (None = no filter)
+            codepage: Codepage to filter by (None = no filter)
+
+        Returns:
+            Dict of (country, codepage) -> entry (first occurrence wins), in
+            file order
+        """
+        by_key = self.by_key
+        if country is None and codepage is None:
+            return by_key
+        cols = self.columns
+        country_col, codepage_col = cols.country, cols.codepage
+        selected: Dict[Tuple[int, int], CountryEntry] = {}
+        for i in cols.select(country, codepage):
+            key = (country_col[i], codepage_col[i])
+            if key not in selected:
+                selected[key] = by_key[key]
+        return selected
+
+    @functools.cached_property
+    def census(self) -> BlockCensus:
+        """Tagged block census of buf, built on first use (see census_tagged_blocks)."""
+        return census_tagged_blocks(self.buf)
+
+    @property
+    def orphan_blocks(self) -> List[CensusBlock]:
+        """
+        Census blocks that no subfunction entry of this document points at.
+
+        Only entries that were parsed count as references, so with an
+        entry_filter the blocks of the skipped entries show up here too.
+        """
+        return self.census.orphans(self.columns.sf_data)
+
+    @property
+    def cache_stats(self) -> BlockCacheStats:
+        """Hits and unique blocks of the tagged block cache."""
+        if self.block_cache is None:
+            return BlockCacheStats(references=0, hits=0, unique_blocks=0)
+        return self.block_cache.stats
+
+
+class LazySubfuncEntry(SubfuncEntry):
+    """
+    SubfuncEntry whose tagged structure is parsed and decoded on first access.
+
+    Reading either tagged or decoded parses, validates and decodes the tagged
+    structure once (see _resolve_subfunc) and memoizes both results.
+    """
+    __slots__ = ("_doc", "_country", "_resolved", "_tagged", "_decoded")
+
+    def __init__(self, doc: LazyCountrySys, country: int, **fields: Any) -> None:
+        self._doc = doc
+        self._country = country
+        self._resolved = False
+        super().__init__(**fields)
+
+    def _resolve(self) -> None:
+        self._resolved = True
+        try:
+            _resolve_subfunc(self, self._doc.block_cache, self._country)
+        except _BudgetExhausted:
+            self._doc.partial = True
+
+    @property
+    def tagged(self) -> Optional[Tagged]:
+        if not self._resolved:
+            self._resolve()
+        return self._tagged
+
+    @tagged.setter
+    def tagged(self, value: Optional[Tagged]) -> None:
+        self._tagged = value
+
+    @property
+    def decoded(self) -> Optional[DecodedRecord]:
+        if not self._resolved:
+            self._resolve()
+        return self._decoded
+
+    @decoded.setter
+    def decoded(self, value: Optional[DecodedRecord]) -> None:
+        self._decoded = value
+
+
+class LazyCountryEntry(CountryEntry):
+    """
+    CountryEntry whose subfunction header is parsed on first access.
+
+    The resulting subfuncs are LazySubfuncEntry objects, so their tagged
+    structures stay unparsed until they are looked at as well.
+    """
+    __slots__ = ("_doc", "_subfuncs")
+
+    def __init__(self, doc: LazyCountrySys, **fields: Any) -> None:
+        self._doc = doc
+        self._subfuncs: Optional[List[SubfuncEntry]] = None
+        super().__init__(subfuncs=None, **fields)
+
+    @property
+    def subfuncs(self) -> List[SubfuncEntry]:
+        if self._subfuncs is None:
+            doc = self._doc
+            make = functools.partial(LazySubfuncEntry, doc, self.country)
+            flt = doc.entry_filter
+            keep = flt.wants_subfunc if flt is not None and flt.subfuncs is not None else None
+            try:
+                self._subfuncs = _parse_subfuncs(doc.buf, self.subfunc_header_ptr, self.country,
+                                                 self.codepage, doc.diagnostics, make=make,
+                                                 guard=doc.block_cache.guard, keep=keep)
+            except _BudgetExhausted:
+                doc.partial = True
+                self._subfuncs = []
+        return self._subfuncs
+
+    @subfuncs.setter
+    def subfuncs(self, value: Optional[List[SubfuncEntry]]) -> None:
+        self._subfuncs = value
+
+
+@dataclass
+class LazyCountrySys(ParsedCountrySys):
+    """
+    ParsedCountrySys whose entries decode their subfunctions on demand.
+
+    Only the file header and entry table are parsed up front (see
+    parse_country_sys_lazy); entries are LazyCountryEntry objects.
+
+    Attributes:
+        strict: Strict mode used when subfunctions are resolved later
+    """
+    strict: bool = False
+
+
+# ====
+# Diagnostics
+# ====
+
+# Diagnostic levels, in increasing severity (compatible with logging levels)
+DIAG_LEVELS: Dict[str, int] = {"info": 20, "warning": 30, "error": 40}
+
+# Diagnostic code -> (level, message template, argument names). Templates are
+# only formatted when a diagnostic is rendered; {offset} is the record offset
+# and the context (if any) is prefixed as "<context>: ".
+DIAG_CODES: Dict[str, Tuple[int, str, Tuple[str, ...]]] = {
+    # File header
+    "header-reserved": (20, "reserved bytes in file header are not all zero", ()),
+    "header-ptrs-truncated": (40, "pointer array truncated", ()),
+    "header-table-count": (20, "entry_table_count={count} (normally 1); parsed all available pointers", ("count",)),
+    "header-pointer-type": (20, "pointer_info_type={value} (normally 1); continuing anyway", ("value",)),
+    # Far pointers
+    "ptr-low16": (30, "far ptr {seg:04X}:{off:04X} => {linear:#x} beyond EOF; using low16 {off:#x}",
+                  ("seg", "off", "linear")),
+    "ptr-beyond-eof": (40, "pointer {linear:#x} beyond file length {file_len}", ("linear", "file_len")),
+    "ptr-mismatch": (30, "{raw:04X} != {off:04X} != {linear:#x}; using low16 {off:#x}", ("raw", "off", "linear")),
+    # Entry tables
+    "table-beyond-eof": (40, "entry_table[{table}]: offset {offset:#x} beyond EOF", ("table",)),
+    "entry-truncated": (40, "entry_table[{table}] entry[{index}]: truncated", ("table", "index")),
+    "entry-len-zero": (30, "entry_table[{table}] entry[{index}]: header_len=0 at {offset:#x}", ("table", "index")),
+    "entry-beyond-eof": (40, "entry_table[{table}] entry[{index}]: header extends beyond EOF", ("table", "index")),
+    "entry-len-short": (30, "entry_table[{table}] entry[{index}]: header_len {header_len} < 12 (cannot parse fields)",
+                        ("table", "index", "header_len")),
+    # Subfunction headers
+    "subfunc-truncated": (40, "subfunc_header {header:#x}: truncated", ("header",)),
+    "subfunc-len-zero": (40, "subfunc_header {header:#x}: entry_len=0 at {offset:#x} (would stall)", ("header",)),
+    "subfunc-beyond-eof": (40, "subfunc_header {header:#x}: entry beyond EOF at {offset:#x}", ("header",)),
+    # Tagged structures
+    "tagged-truncated": (40, "tagged header truncated at {offset:#x}", ()),
+    "payload-truncated": (40, "payload truncated (wanted {size} bytes) at {offset:#x}", ("size",)),
+    "magic-mismatch": (30, "sf {sf_id}: magic mismatch: got '{magic}', expected one of {expected} at {offset:#x}",
+                       ("sf_id", "magic", "expected")),
+    "aramode-tag": (30, "ARAMODE: expected tag 0x00, got {tag:#x} at {offset:#x}", ("tag",)),
+    "tag-unusual": (20, "tag unusual: got {tag:#x} at {offset:#x}", ("tag",)),
+    # Work budget (see ParseBudget)
+    "ptr-overlap": (30, "{kind} at {offset:#x} overlaps {other} at {other_offset:#x}",
+                    ("kind", "other", "other_offset")),
+    "ptr-cycle": (30, "{kind} at {offset:#x} points back into {other} at {other_offset:#x}",
+                  ("kind", "other", "other_offset")),
+    "budget-exceeded": (40, "parse budget exceeded: more than {limit} {what}; result is partial", ("what", "limit")),
+    "diag-limit": (40, "more than {limit} diagnostics; further ones suppressed", ("limit",)),
+}
+
+# Context of a diagnostic: a plain string, or a (template, *args) tuple that is
+# only formatted on render, so hot paths can pass it without building a string
+DiagContext = Union[None, str, Tuple[Any, ...]]
+
+
+def _positional_template(template: str, names: Tuple[str, ...]) -> str:
+    """Rewrite {name...} fields as {index...}, with offset after the arguments."""
+    fields = {name: str(i) for i, name in enumerate(names + ("offset",))}
+    return re.sub(r"\{(\w+)", lambda m: "{" + fields[m.group(1)], template)
+
+
+# Code -> bound str.format of its template, taking (*args, offset)
+_DIAG_FORMATTERS: Dict[str, Callable[..., str]] = {
+    code: _positional_template(template, names).format for code, (_, template, names) in DIAG_CODES.items()
+}
+
+
+def _render_context(ctx: DiagContext) -> str:
+    if ctx is None or isinstance(ctx, str):
+        return ctx or ""
+    return ctx[0].format(*ctx[1:])
+
+
+def _render_diagnostic(code: str, offset: Optional[int], ctx: DiagContext, args: Tuple[Any, ...]) -> str:
+    msg = _DIAG_FORMATTERS[code](*args, offset)
+    if ctx is None:
+        return msg
+    context = _render_context(ctx)
+    return f"{context}: {msg}" if context else msg
+
+
+@dataclass(frozen=True, slots=True)
+class Diagnostic:
+    """
+    One aggregated diagnostic reported while parsing.
+
+    Attributes:
+        code: Diagnostic code (a key of DIAG_CODES)
+        level: Severity (a value of DIAG_LEVELS)
+        offset: File offset the diagnostic refers to (None if not applicable)
+        context: Where it was found, e.g. "entry[49:850].sf[1].data_ptr"
+        args: Code-specific values, by the argument names of the code
+        count: Number of times it was reported (e.g. references to a shared block)
+    """
+    code: str
+    level: int
+    offset: Optional[int]
+    context: str
+    args: Dict[str, Any]
+    count: int
+
+    @property
+    def message(self) -> str:
+        """Text as in the warnings list, without the repeat count."""
+        return _render_diagnostic(self.code, self.offset, self.context, tuple(self.args.values()))
+
+    @property
+    def level_name(self) -> str:
+        for name, value in DIAG_LEVELS.items():
+            if value == self.level:
+                return name
+        return str(self.level)
+
+
+class Diagnostics:
+    """
+    Collector of parse diagnostics.
+
+    Records are stored unformatted as (code, offset, context, args) and
+    aggregated: reporting an identical record again only bumps its count.
+    Codes below the level threshold are dropped before anything is stored,
+    and messages are only formatted when rendered (see messages(), to_jsonable()).
+
+    Attributes:
+        level: Minimum level that is recorded (see DIAG_LEVELS)
+        limit: Maximum number of distinct records (None = unlimited); once
+            reached, new records are only counted in suppressed
+        suppressed: Number of reports dropped because of limit
+    """
+    __slots__ = ("level", "limit", "suppressed", "_counts", "_order")
+
+    def __init__(self, level: Union[int, str] = "info", limit: Optional[int] = None) -> None:
+        self.level = DIAG_LEVELS[level] if isinstance(level, str) else level
+        self.limit = limit
+        self.suppressed = 0
+        self._counts: Dict[Tuple[Any, ...], int] = {}
+        self._order: List[Tuple[Any, ...]] = []
+
+    def enabled(self, code: str) -> bool:
+        """Whether diagnostics with this code are recorded."""
+        return DIAG_CODES[code][0] >= self.level
+
+    def add(self, code: str, *args: Any, offset: Optional[int] = None, ctx: DiagContext = None) -> None:
+        """
+        Report a diagnostic.
+
+        Args:
+            code: Diagnostic code (a key of DIAG_CODES)
+            *args: Values for the code's argument names, in order
+            offset: File offset the diagnostic refers to
+            ctx: Context string, or (template, *args) tuple formatted on render
+        """
+        if DIAG_CODES[code][0] < self.level:
+            return
+        key = (code, offset, ctx, args)
+        count = self._counts.get(key)
+        if count is not None:
+            self._counts[key] = count + 1
+            return
+        if self.limit is not None and len(self._order) >= self.limit and code != "budget-exceeded":
+            if not self.suppressed:
+                # One extra record says that the limit was hit
+                self._order.append(("diag-limit", None, None, (self.limit,)))
+                self._counts[self._order[-1]] = 1
+            self.suppressed += 1
+            return
+        self._order.append(key)
+        self._counts[key] = 1
+
+    def mark(self) -> int:
+        """Position to pass to since() to get the records added after it."""
+        return len(self._order)
+
+    def since(self, mark: int) -> Tuple[Tuple[Any, ...], ...]:
+        """Keys of the records first reported after mark."""
+        return tuple(self._order[mark:])
+
+    def repeat(self, keys: Tuple[Tuple[Any, ...], ...]) -> None:
+        """Count records (from since()) once more, without re-reporting them."""
+        counts = self._counts
+        for key in keys:
+            counts[key] += 1
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __iter__(self) -> Iterator[Diagnostic]:
+        for key in self._order:
+            code, offset, ctx, args = key
+            level, _, names = DIAG_CODES[code]
+            yield Diagnostic(code=code, level=level, offset=offset, context=_render_context(ctx),
+                             args=dict(zip(names, args)), count=self._counts[key])
+
+    def counts_by_code(self) -> Dict[str, int]:
+        """Total number of reports per diagnostic code."""
+        totals: Dict[str, int] = {}
+        for key in self._order:
+            totals[key[0]] = totals.get(key[0], 0) + self._counts[key]
+        return totals
+
+    def messages(self) -> List[str]:
+        """
+        Render as warning text, one line per distinct record.
+
+        Returns:
+            Messages in order of first report; records reported more than
+            once carry a "(N references)" suffix
+        """
+        out = []
+        for key in self._order:
+            msg = _render_diagnostic(*key)
+            count = self._counts[key]
+            out.append(f"{msg} ({count} references)" if count > 1 else msg)
+        return out
+
+    def to_jsonable(self) -> List[Dict[str, Any]]:
+        """Render as a list of JSON-serializable dicts, one per distinct record."""
+        out = []
+        for d in self:
+            out.append({
+                "code": d.code, "level": d.level_name, "offset": d.offset,
+                "context": d.context, "args": {k: list(v) if isinstance(v, tuple) else v for k, v in d.args.items()},
+                "count": d.count, "message": d.message,
+            })
+        return out
+
+
+# ====
+# Work budget
+# ====
+
+@dataclass(frozen=True)
+class ParseBudget:
+    """
+    Caps on the work a parse may do, for untrusted input.
+
+    Attributes:
+        max_structures: Entries, subfunction entries and tagged references visited
+        max_bytes: Bytes of records and tagged payloads decoded
+        max_diagnostics: Distinct diagnostics kept (see Diagnostics.limit)
+
+    Note:
+        None means unlimited. Counts, pointers and lengths in a crafted file
+        can make structures be visited many times (e.g. every entry pointing
+        at one huge subfunction header); the caps bound that work, and the
+        parse stops with a partial result once one is exceeded.
+        Use for_size() for caps proportional to the file size.
+    """
+    max_structures: Optional[int] = None
+    max_bytes: Optional[int] = None
+    max_diagnostics: Optional[int] = None
+
+    @classmethod
+    def for_size(cls, file_size: int) -> ParseBudget:
+        """
+        Budget that keeps the worst-case parse linear in the file size.
+
+        Args:
+            file_size: Size of the file to be parsed
+
+        Returns:
+            ParseBudget with room to spare for any well-formed file: every
+            structure occupies at least 2 bytes, and a well-formed file
+            decodes each byte a few times at most
+        """
+        return cls(max_structures=file_size // 2 + 64, max_bytes=8 * file_size + 4096,
+                   max_diagnostics=file_size // 16 + 64)
+
+
+class _BudgetExhausted(Exception):
+    """Raised inside the parser when a ParseBudget cap is exceeded."""
+
+
+class _ParseGuard:
+    """
+    Work meter and region map for a budgeted parse.
+
+    charge() counts the work of each structure visited against the budget.
+    claim() records the byte range of each distinct structure the file points
+    to and reports ranges that partially overlap another structure, or that
+    point back into a structure of an earlier level (the file header, entry
+    tables, subfunction headers, tagged blocks), which is how pointer cycles
+    show up in this format.
+
+    Regions are filed under every fixed-size bucket of the file they cover,
+    so a claim only looks at the regions sharing its buckets: the cost
+    follows the claimed bytes (which charge() bounds), whatever order the
+    structures are visited in.
+    """
+    __slots__ = ("budget", "diag", "structures", "bytes", "exhausted",
+                 "_buckets", "_regions")
+
+    # Structure kinds, in pointer order (a kind only points at later ones)
+    _LEVELS = {"file header": 0, "entry table": 1, "subfunc header": 2, "tagged block": 3}
+
+    # Bucket size of the region map, as a shift (256 bytes)
+    _BUCKET_SHIFT = 8
+
+    def __init__(self, budget: ParseBudget, diag: Diagnostics) -> None:
+        self.budget = budget
+        self.diag = diag
+        self.structures = 0
+        self.bytes = 0
+        self.exhausted = False
+        self._buckets: Dict[int, List[int]] = {}
+        self._regions: Dict[int, Tuple[str, int]] = {}
+
+    def charge(self, structures: int, nbytes: int) -> None:
+        """
+        Count work against the budget.
+
+        Raises:
+            _BudgetExhausted: If a cap is exceeded (reported once)
+        """
+        self.structures += structures
+        self.bytes += nbytes
+        budget = self.budget
+        if budget.max_structures is not None and self.structures > budget.max_structures:
+            self._exhaust("structures", budget.max_structures)
+        if budget.max_bytes is not None and self.bytes > budget.max_bytes:
+            self._exhaust("bytes", budget.max_bytes)
+
+    def _exhaust(self, what: str, limit: int) -> None:
+        if not self.exhausted:
+            self.exhausted = True
+            self.diag.add("budget-exceeded", what, limit)
+        raise _BudgetExhausted(what)
+
+    def claim(self, kind: str, start: int, end: int) -> None:
+        """
+        Record the byte range [start, end) of a structure of the given kind.
+
+        Args:
+            kind: Structure kind (a key of _LEVELS)
+            start: Offset of the structure
+            end: End offset (clipped to EOF by the caller)
+        """
+        seen = self._regions.get(start)
+        if seen is not None and seen[0] == kind:
+            return  # shared structure, already checked
+        regions = self._regions
+        buckets = range(start >> self._BUCKET_SHIFT, ((max(end, start + 1) - 1) >> self._BUCKET_SHIFT) + 1)
+        # Report the overlapping region starting nearest at or before start,
+        # else the nearest one after it
+        before = after = None
+        for b in buckets:
+            for other_start in self._buckets.get(b, ()):
+                if other_start < end and start < regions[other_start][1]:
+                    if other_start <= start:
+                        if before is None or other_start > before:
+                            before = other_start
+                    elif after is None or other_start < after:
+                        after = other_start
+        other_start = before if before is not None else after
+        if other_start is not None:
+            self._report(kind, start, regions[other_start][0], other_start)
+        if seen is None:
+            regions[start] = (kind, end)
+            for b in buckets:
+                self._buckets.setdefault(b, []).append(start)
+
+    def _report(self, kind: str, start: int, other: str, other_start: int) -> None:
+        levels = self._LEVELS
+        code = "ptr-cycle" if levels[other] < levels[kind] else "ptr-overlap"
+        self.diag.add(code, kind, other, other_start, offset=start)
+
+
+# ====
+# Entry filters
+# ====
+
+def parse_int_ranges(text: str) -> Tuple[Tuple[int, int], ...]:
+    """
+    Parse a list of integers and inclusive ranges, e.g. "1,35" or "40-49,850".
+
+    Args:
+        text: Comma-separated numbers and lo-hi ranges
+
+    Returns:
+        Tuple of (lo, hi) pairs, in the order given
+
+    Raises:
+        ValueError: If a part is not a number or a valid range
+    """
+    ranges = []
+    for part in text.split(","):
+        lo, sep, hi = part.strip().partition("-")
+        try:
+            lo_i = int(lo)
+            hi_i = int(hi) if sep else lo_i
+        except ValueError:
+            raise ValueError(f"invalid number or range: {part.strip()!r}") from None
+        if hi_i < lo_i:
+            raise ValueError(f"empty range: {part.strip()!r}")
+        ranges.append((lo_i, hi_i))
+    return tuple(ranges)
+
+
+def _format_int_ranges(ranges: Tuple[Tuple[int, int], ...]) -> str:
+    return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in ranges)
+
+
+def _in_ranges(value: int, ranges: Tuple[Tuple[int, int], ...]) -> bool:
+    for lo, hi in ranges:
+        if lo <= value <= hi:
+            return True
+    return False
+
+
+@dataclass(frozen=True)
+class EntryFilter:
+    """
+    Entry and subfunction selection applied while parsing.
+
+    Attributes:
+        countries: Country code ranges to keep (None = all)
+        codepages: Codepage ranges to keep (None = all)
+        subfuncs: Subfunction ID ranges to keep (None = all)
+
+    Note:
+        Entries whose country/codepage do not match are skipped right after
+        their 14-byte header is read: their subfunction headers and tagged
+        structures are never parsed, validated or decoded (so they raise no
+        diagnostics either). Subfunctions not selected by subfuncs are left
+        out of each kept entry's subfuncs in the same way.
+    """
+    countries: Optional[Tuple[Tuple[int, int], ...]] = None
+    codepages: Optional[Tuple[Tuple[int, int], ...]] = None
+    subfuncs: Optional[Tuple[Tuple[int, int], ...]] = None
+
+    @classmethod
+    def parse(cls, country: Optional[str] = None, codepage: Optional[str] = None,
+              subfunc: Optional[str] = None) -> EntryFilter:
+        """Build a filter from command-line style strings (see parse_int_ranges)."""
+        return cls(countries=parse_int_ranges(country) if country is not None else None,
+                   codepages=parse_int_ranges(codepage) if codepage is not None else None,
+                   subfuncs=parse_int_ranges(subfunc) if subfunc is not None else None)
+
+    def matches(self, country: int, codepage: int) -> bool:
+        """Whether an entry with this country/codepage is kept."""
+        return ((self.countries is None or _in_ranges(country, self.countries)) and
+                (self.codepages is None or _in_ranges(codepage, self.codepages)))
+
+    def wants_subfunc(self, subfunc_id: int) -> bool:
+        """Whether a subfunction with this ID is kept."""
+        return self.subfuncs is None or _in_ranges(subfunc_id, self.subfuncs)
+
+    def describe(self) -> List[str]:
+        """Active criteria as "name=values" strings, e.g. ["country=49"]."""
+        parts = []
+        if self.countries is not None:
+            parts.append(f"country={_format_int_ranges(self.countries)}")
+        if self.codepages is not None:
+            parts.append(f"codepage={_format_int_ranges(self.codepages)}")
+        if self.subfuncs is not None:
+            parts.append(f"subfunc={_format_int_ranges(self.subfuncs)}")
+        return parts
 
 
 # ====
@@ -441,7 +1266,7 @@ def _asciiz(b: bytes) -> str:
         Non-printable characters (outside 0x20-0x7E) are shown in hex notation.
         This is used for currency symbols, separators, and other locale strings.
     """
-    s = b.split(b"\x00", 1)[0]
+    s = bytes(b).split(b"\x00", 1)[0]
     out = []
     for c in s:
         if 0x20 <= c < 0x7F:
@@ -453,6 +1278,11 @@ def _asciiz(b: bytes) -> str:
     return "".join(out)
 
 
+# Per-byte text, indexed by byte value (see _hex, _format_byte_table)
+_BYTE_HEX: Tuple[str, ...] = tuple(f"0x{x:02X}" for x in range(256))
+_BYTE_DEC3: Tuple[str, ...] = tuple(f"{x:3d}" for x in range(256))
+
+
 def _hex(b: bytes) -> str:
     """
     Format bytes as space-separated hex values.
@@ -463,7 +1293,7 @@ def _hex(b: bytes) -> str:
     Returns:
         String like "0x01 0x02 0x03"
     """
-    return " ".join(f"0x{x:02X}" for x in b)
+    return " ".join(map(_BYTE_HEX.__getitem__, b))
 
 
 def _format_byte_table(data: bytes, per_row: int = 8) -> str:
@@ -485,23 +1315,60 @@ def _format_byte_table(data: bytes, per_row: int = 8) -> str:
     Note:
         Uses decimal for easier comparison with FreeDOS country.asm source.
     """
-    lines = []
-    for i in range(0, len(data), per_row):
-        row = data[i:i+per_row]
-        formatted = " ".join(f"{b:3d}" for b in row)
-        lines.append(f"    db {formatted}")
-    return "\n".join(lines)
+    cells = list(map(_BYTE_DEC3.__getitem__, data))
+    return "\n".join("    db " + " ".join(cells[i:i + per_row]) for i in range(0, len(cells), per_row))
 
 
-def decode_far_ptr(u32: int, file_len: int, warnings: List[str], ctx: str) -> FarPtr:
+class LineWriter:
+    """
+    Buffered line output for the text dumpers.
+
+    Lines are collected and handed to write() in chunks of about limit
+    characters, instead of one print() call per line.
+
+    Usage:
+        with LineWriter(sys.stdout.write) as emit:
+            emit("line")
+            emit()          # empty line
+    """
+    __slots__ = ("_write", "_lines", "_size", "limit")
+
+    def __init__(self, write: Callable[[str], Any], limit: int = 1 << 16) -> None:
+        self._write = write
+        self._lines: List[str] = []
+        self._size = 0
+        self.limit = limit
+
+    def __call__(self, line: str = "") -> None:
+        self._lines.append(line)
+        self._size += len(line) + 1
+        if self._size >= self.limit:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write out all collected lines."""
+        if self._lines:
+            self._lines.append("")
+            self._write("\n".join(self._lines))
+            self._lines.clear()
+            self._size = 0
+
+    def __enter__(self) -> LineWriter:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.flush()
+
+
+def decode_far_ptr(u32: int, file_len: int, diag: Diagnostics, ctx: DiagContext) -> FarPtr:
     """
     Decode a far pointer from a 32-bit value.
 
     Args:
         u32: Raw 32-bit pointer value from file
         file_len: Total file length (for bounds checking)
-        warnings: List to append warning messages to
-        ctx: Context string for warning messages
+        diag: Diagnostics collector
+        ctx: Context for diagnostics (string, or (template, *args) tuple)
 
     Returns:
         FarPtr object with decoded segment, offset, and linear address
@@ -519,23 +1386,79 @@ def decode_far_ptr(u32: int, file_len: int, warnings: List[str], ctx: str) -> Fa
     if seg == 0:
         linear = off
     if linear > file_len and off <= file_len:
-        warnings.append(f"{ctx}: far ptr {seg:04X}:{off:04X} => {linear:#x} beyond EOF; using low16 {off:#x}")
+        diag.add("ptr-low16", seg, off, linear, ctx=ctx)
         linear = off
     if linear > file_len:
-        warnings.append(f"{ctx}: pointer {linear:#x} beyond file length {file_len}")
+        diag.add("ptr-beyond-eof", linear, file_len, ctx=ctx)
     if linear != off != raw:
-        warnings.append(f"{ctx}: {raw:04X} != {off:04X} != {linear:#x}; using low16 {off:#x}")
+        diag.add("ptr-mismatch", raw, off, linear, ctx=ctx)
         linear = off
     return FarPtr(raw_u32=raw, seg=seg, off=off, linear=linear)
 
 
-def token_fit_unpack(data: bytes, fields: List[Tuple[str, str, Any]]) -> Dict[str, Any]:
+# Result of decode_far_ptr(0, ...), which never warns
+_NULL_FAR_PTR = FarPtr(raw_u32=0, seg=0, off=0, linear=0)
+
+
+@functools.lru_cache(maxsize=4096)
+def _near_ptr(u32: int) -> FarPtr:
+    """
+    FarPtr for a segment-0 pointer, shared between all references to it.
+
+    Only valid when u32 <= 0xFFFF (segment 0) and u32 <= file length:
+    decode_far_ptr() returns the same value for such pointers and never
+    warns, so callers can skip building its context string. Pointers with
+    a non-zero segment must go through decode_far_ptr().
+    """
+    return FarPtr(raw_u32=u32, seg=0, off=u32, linear=u32)
+
+
+# ====
+# Compiled record layouts
+# ====
+
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+
+# Country_Codepage_Entry including its header_len WORD (header_len == 12)
+_ENTRY_STRUCT = struct.Struct("<HHHHHI")
+_ENTRY_HEADER_LEN = _ENTRY_STRUCT.size - 2
+
+# Subfunction_Entry including its entry_len WORD (entry_len == 6)
+_SUBFUNC_STRUCT = struct.Struct("<HHI")
+_SUBFUNC_ENTRY_LEN = _SUBFUNC_STRUCT.size - 2
+
+
+class FieldPlan:
+    """
+    Precompiled layout of a token-fit structure (see token_fit_unpack).
+
+    Attributes:
+        names: Field names in order
+        fields: (name, struct.Struct, default) per field
+        full: One Struct covering all fields, used when the data is long enough
+    """
+    __slots__ = ("names", "fields", "full")
+
+    def __init__(self, fields: List[Tuple[str, str, Any]]) -> None:
+        self.names = tuple(name for name, _, _ in fields)
+        self.fields = tuple((name, struct.Struct("<" + fmt), default) for name, fmt, default in fields)
+        self.full = struct.Struct("<" + "".join(fmt for _, fmt, _ in fields))
+
+
+@functools.lru_cache(maxsize=None)
+def _field_plan(fields: Tuple[Tuple[str, str, Any], ...]) -> FieldPlan:
+    return FieldPlan(list(fields))
+
+
+def token_fit_unpack(data: bytes, fields: Union[List[Tuple[str, str, Any]], FieldPlan]) -> Dict[str, Any]:
     """
     Unpack a structure using "token-fit" parsing.
 
     Args:
         data: Byte data to parse
-        fields: List of (name, format, default) tuples where format is struct format char
+        fields: List of (name, format, default) tuples where format is struct
+            format char, or a FieldPlan compiled from such a list
 
     Returns:
         Dictionary with field names as keys, plus "_used" (bytes consumed) and
@@ -546,16 +1469,23 @@ def token_fit_unpack(data: bytes, fields: List[Tuple[str, str, Any]]) -> Dict[st
         enough bytes for a field, the default value is used instead. This handles
         different versions of COUNTRY.SYS that may have shorter CTYINFO structures
         (e.g., MS-DOS 3.x vs 6.x).
+        Field lists are compiled (and cached) into a FieldPlan; when the data
+        holds every field, the whole record is unpacked with a single Struct.
     """
-    pos = 0
-    out: Dict[str, Any] = {}
-    for name, fmt, default in fields:
-        sz = struct.calcsize("<" + fmt)
-        if pos + sz <= len(data):
-            out[name] = struct.unpack_from("<" + fmt, data, pos)[0]
-            pos += sz
-        else:
-            out[name] = default
+    plan = fields if isinstance(fields, FieldPlan) else _field_plan(tuple(fields))
+    n = len(data)
+    if n >= plan.full.size:
+        out: Dict[str, Any] = dict(zip(plan.names, plan.full.unpack_from(data)))
+        pos = plan.full.size
+    else:
+        pos = 0
+        out = {}
+        for name, st, default in plan.fields:
+            if pos + st.size <= n:
+                out[name] = st.unpack_from(data, pos)[0]
+                pos += st.size
+            else:
+                out[name] = default
     out["_used"] = pos
     out["_extra"] = data[pos:]
     return out
@@ -565,15 +1495,23 @@ def token_fit_unpack(data: bytes, fields: List[Tuple[str, str, Any]]) -> Dict[st
 # Tagged / Subfunction decoders
 # ====
 
-def parse_tagged(buf: bytes, off: int, warnings: List[str], ctx: str) -> Tagged:
+def payload_digest(payload: Union[bytes, memoryview]) -> bytes:
+    """128-bit BLAKE2b hash of a tagged block payload."""
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+_EMPTY_DIGEST = payload_digest(b"")
+
+
+def parse_tagged(buf: bytes, off: int, diag: Diagnostics, ctx: DiagContext) -> Tagged:
     """
     Parse a tagged data structure from the file buffer.
 
     Args:
         buf: Complete file buffer
         off: Offset where tagged structure begins
-        warnings: List to append warning messages to
-        ctx: Context string for warning messages
+        diag: Diagnostics collector
+        ctx: Context for diagnostics (string, or (template, *args) tuple)
 
     Returns:
         Tagged object with parsed header and payload
@@ -581,18 +1519,20 @@ def parse_tagged(buf: bytes, off: int, warnings: List[str], ctx: str) -> Tagged:
     Note:
         Tagged structures have format: tag(1) + magic(7) + size(2) + payload(size).
         DBCS tables with size==0 have a special dummy WORD after the header.
+        The payload is hashed here, once per unique block (see TaggedBlockCache).
     """
     flen = len(buf)
     if off + 10 > flen:
-        warnings.append(f"{ctx}: tagged header truncated at {off:#x}")
-        return Tagged(offset=off, tag=0, magic_raw=b"", magic="", size=0, payload=b"")
+        diag.add("tagged-truncated", offset=off, ctx=ctx)
+        return Tagged(offset=off, tag=0, magic_raw=b"", magic="", size=0, payload=b"",
+                      digest=_EMPTY_DIGEST)
     tag = buf[off]
-    magic_raw = buf[off + 1: off + 8]
-    size = struct.unpack_from("<H", buf, off + 8)[0]
+    magic_raw = bytes(buf[off + 1: off + 8])
+    size = _U16.unpack_from(buf, off + 8)[0]
     magic_clean = magic_raw.rstrip(b" \x00").decode("ascii", "replace")
     end = off + 10 + size
     if end > flen:
-        warnings.append(f"{ctx}: payload truncated (wanted {size} bytes) at {off:#x}")
+        diag.add("payload-truncated", size, offset=off, ctx=ctx)
         payload = buf[off + 10: flen]
     else:
         payload = buf[off + 10: end]
@@ -601,13 +1541,27 @@ def parse_tagged(buf: bytes, off: int, warnings: List[str], ctx: str) -> Tagged:
     dbcs_dummy = None
     if magic_clean == "DBCS" and size == 0:
         if off + 12 <= flen:
-            dbcs_dummy = struct.unpack_from("<H", buf, off + 10)[0]
+            dbcs_dummy = _U16.unpack_from(buf, off + 10)[0]
     
     return Tagged(offset=off, tag=tag, magic_raw=magic_raw, magic=magic_clean,
-                  size=size, payload=payload, dbcs_dummy_word=dbcs_dummy)
+                  size=size, payload=payload, dbcs_dummy_word=dbcs_dummy,
+                  digest=payload_digest(payload))
+
+
+# CTYINFO layout (MS-DOS 6.x size); shorter versions are token-fit
+_CTYINFO_PLAN = FieldPlan([
+    ("country_id", "H", 0), ("codepage", "H", 0), ("date_format", "H", 0),
+    ("currency_symbol", "5s", b""), ("thousands_sep", "2s", b""),
+    ("decimal_sep", "2s", b""), ("date_sep", "2s", b""), ("time_sep", "2s", b""),
+    ("currency_format", "B", 0), ("currency_decimals", "B", 0),
+    ("time_format", "B", 0), ("case_map_ptr_raw", "I", 0),
+    ("data_sep", "2s", b""), ("reserved", "10s", b""),
+])
+
+_FCHAR_HEADER = struct.Struct("<BBBBBBBB")
 
 
-def decode_ctyinfo(tagged: Tagged, country: int) -> Dict[str, Any]:
+def decode_ctyinfo(tagged: Tagged, country: int) -> CtyInfo:
     """
     Decode CTYINFO (Country Information) structure.
 
@@ -615,42 +1569,37 @@ def decode_ctyinfo(tagged: Tagged, country: int) -> Dict[str, Any]:
         tagged: Tagged structure with CTYINFO data
 
     Returns:
-        Dictionary with decoded country information fields
+        CtyInfo record with decoded country information fields
 
     Note:
         Uses token-fit parsing to handle different CTYINFO versions across DOS releases.
         Standard fields include country ID, codepage, date/time formats,
         currency symbol, separators, etc. Extra bytes are tracked for debugging.
+        The short separator/symbol strings are interned, so entries that share
+        a locale convention share the string objects too.
     """
-    fields = [
-        ("country_id", "H", 0), ("codepage", "H", 0), ("date_format", "H", 0),
-        ("currency_symbol", "5s", b""), ("thousands_sep", "2s", b""),
-        ("decimal_sep", "2s", b""), ("date_sep", "2s", b""), ("time_sep", "2s", b""),
-        ("currency_format", "B", 0), ("currency_decimals", "B", 0),
-        ("time_format", "B", 0), ("case_map_ptr_raw", "I", 0),
-        ("data_sep", "2s", b""), ("reserved", "10s", b""),
-    ]
-    t = token_fit_unpack(tagged.payload, fields)
-    return {
-        "country_id": t["country_id"], "codepage": t["codepage"],
-        "date_format": t["date_format"],
-        "date_format_name": DATE_FORMAT_NAMES.get(t["date_format"], "unknown"),
-        "currency_symbol": _asciiz(t["currency_symbol"]),
-        "thousands_sep": _asciiz(t["thousands_sep"]),
-        "decimal_sep": _asciiz(t["decimal_sep"]),
-        "date_sep": _asciiz(t["date_sep"]), "time_sep": _asciiz(t["time_sep"]),
-        "currency_format": t["currency_format"],
-        "currency_decimals": t["currency_decimals"],
-        "time_format": t["time_format"],
-        "time_format_name": TIME_FORMAT_NAMES.get(t["time_format"], "unknown"),
-        "case_map_ptr_raw": t["case_map_ptr_raw"],
-        "data_sep": _asciiz(t["data_sep"]),
-        "reserved_len": len(t["reserved"]) if isinstance(t["reserved"], (bytes, bytearray)) else 0,
-        "extra_len": len(t["_extra"]),
-    }
+    t = token_fit_unpack(tagged.payload, _CTYINFO_PLAN)
+    intern = sys.intern
+    return CtyInfo(
+        country_id=t["country_id"], codepage=t["codepage"],
+        date_format=t["date_format"],
+        date_format_name=DATE_FORMAT_NAMES.get(t["date_format"], "unknown"),
+        currency_symbol=intern(_asciiz(t["currency_symbol"])),
+        thousands_sep=intern(_asciiz(t["thousands_sep"])),
+        decimal_sep=intern(_asciiz(t["decimal_sep"])),
+        date_sep=intern(_asciiz(t["date_sep"])), time_sep=intern(_asciiz(t["time_sep"])),
+        currency_format=t["currency_format"],
+        currency_decimals=t["currency_decimals"],
+        time_format=t["time_format"],
+        time_format_name=TIME_FORMAT_NAMES.get(t["time_format"], "unknown"),
+        case_map_ptr_raw=t["case_map_ptr_raw"],
+        data_sep=intern(_asciiz(t["data_sep"])),
+        reserved_len=len(t["reserved"]) if isinstance(t["reserved"], (bytes, bytearray)) else 0,
+        extra_len=len(t["_extra"]),
+    )
 
 
-def decode_fchar(tagged: Tagged) -> Dict[str, Any]:
+def decode_fchar(tagged: Tagged) -> Union[FChar, FCharRaw]:
     """
     Decode FCHAR (Filename Character) table.
 
@@ -658,7 +1607,8 @@ def decode_fchar(tagged: Tagged) -> Dict[str, Any]:
         tagged: Tagged structure with FCHAR data
 
     Returns:
-        Dictionary with filename character restrictions and terminator list
+        FChar record with filename character restrictions and terminator list,
+        or FCharRaw with just the raw bytes if the table is too short
 
     Note:
         FCHAR defines which characters are valid in filenames and which
@@ -667,19 +1617,19 @@ def decode_fchar(tagged: Tagged) -> Dict[str, Any]:
     """
     p = tagged.payload
     if len(p) < 8:
-        return {"raw_hex": _hex(p)}
-    characteristics, low, high, r1, ex1, ex2, r2, nterm = struct.unpack_from("<BBBBBBBB", p, 0)
+        return FCharRaw(raw_hex=_hex(p))
+    characteristics, low, high, r1, ex1, ex2, r2, nterm = _FCHAR_HEADER.unpack_from(p, 0)
     # Bounds check: ensure we don't read past payload end
     nterm = min(nterm, len(p) - 8)
     terms = p[8:8 + nterm]
-    return {
-        "characteristics": characteristics, "lowest_char": low, "highest_char": high,
-        "excluded_first": ex1, "excluded_last": ex2, "num_terminators": nterm,
-        "terminators_hex": _hex(terms),
-    }
+    return FChar(
+        characteristics=characteristics, lowest_char=low, highest_char=high,
+        excluded_first=ex1, excluded_last=ex2, num_terminators=nterm,
+        terminators_hex=_hex(terms),
+    )
 
 
-def decode_yesno(tagged: Tagged) -> Dict[str, Any]:
+def decode_yesno(tagged: Tagged) -> YesNo:
     """
     Decode YESNO (Yes/No prompt characters) structure.
 
@@ -687,7 +1637,7 @@ def decode_yesno(tagged: Tagged) -> Dict[str, Any]:
         tagged: Tagged structure with YESNO data
 
     Returns:
-        Dictionary with yes/no characters
+        YesNo record with yes/no characters
 
     Note:
         Some COUNTRY.SYS files (notably FreeDOS) have a bug where null bytes
@@ -702,10 +1652,10 @@ def decode_yesno(tagged: Tagged) -> Dict[str, Any]:
     if len(p) >= 2 and p[1] == 0x30:
         yes += f" ==> {chr(p[0])} followed by zero mis-encoded as \'0\' == 0x30"
     no = _asciiz(p[2:4]) if len(p) >= 4 else ""
-    return {"yes": yes, "no": no, "raw_hex": _hex(p)}
+    return YesNo(yes=sys.intern(yes), no=sys.intern(no), raw_hex=_hex(p))
 
 
-def decode_dbcs(tagged: Tagged) -> Dict[str, Any]:
+def decode_dbcs(tagged: Tagged) -> Dbcs:
     """
     Decode DBCS (Double-Byte Character Set) lead byte table.
 
@@ -713,7 +1663,7 @@ def decode_dbcs(tagged: Tagged) -> Dict[str, Any]:
         tagged: Tagged structure with DBCS data
 
     Returns:
-        Dictionary with DBCS lead byte ranges
+        Dbcs record with DBCS lead byte ranges
 
     Note:
         DBCS tables list ranges of lead bytes for double-byte character sets
@@ -731,17 +1681,17 @@ def decode_dbcs(tagged: Tagged) -> Dict[str, Any]:
             break
         ranges.append((start, end))
         i += 2
-    return {"ranges": ranges, "dbcs_dummy_word": tagged.dbcs_dummy_word, "payload_len": len(p)}
+    return Dbcs(ranges=ranges, dbcs_dummy_word=tagged.dbcs_dummy_word, payload_len=len(p))
 
 
-def validate_magic_and_tag(subfunc_id: int, tagged: Tagged, warnings: List[str], strict: bool) -> None:
+def validate_magic_and_tag(subfunc_id: int, tagged: Tagged, diag: Diagnostics, strict: bool) -> None:
     """
     Validate that a tagged structure has the correct magic string and tag.
 
     Args:
         subfunc_id: Subfunction ID that should match the magic
         tagged: Tagged structure to validate
-        warnings: List to append warning messages to
+        diag: Diagnostics collector
         strict: If True, raise ValidationError on mismatch; if False, just warn
 
     Raises:
@@ -754,47 +1704,360 @@ def validate_magic_and_tag(subfunc_id: int, tagged: Tagged, warnings: List[str],
     """
     allowed = ALLOWED_MAGICS.get(subfunc_id)
     if allowed and tagged.magic not in allowed:
-        msg = f"sf {subfunc_id}: magic mismatch: got \'{tagged.magic}\', expected one of {allowed} at {tagged.offset:#x}"
+        args = (subfunc_id, tagged.magic, allowed)
         if strict:
-            raise ValidationError(msg)
-        warnings.append(msg)
+            raise ValidationError(_render_diagnostic("magic-mismatch", tagged.offset, None, args))
+        diag.add("magic-mismatch", *args, offset=tagged.offset)
     if tagged.magic == "ARAMODE":
         if tagged.tag != 0x00:
-            msg = f"ARAMODE: expected tag 0x00, got {tagged.tag:#x} at {tagged.offset:#x}"
             if strict:
-                raise ValidationError(msg)
-            warnings.append(msg)
+                raise ValidationError(_render_diagnostic("aramode-tag", tagged.offset, None, (tagged.tag,)))
+            diag.add("aramode-tag", tagged.tag, offset=tagged.offset)
     else:
         if tagged.tag not in (0xFF, 0x00):
-            msg = f"tag unusual: got {tagged.tag:#x} at {tagged.offset:#x}"
-            warnings.append(msg)
+            diag.add("tag-unusual", tagged.tag, offset=tagged.offset)
+
+
+def _decode_subfunc(sf_id: int, tagged: Tagged, country: int) -> Optional[DecodedRecord]:
+    """
+    Decode a tagged structure according to its subfunction ID.
+
+    Args:
+        sf_id: Subfunction ID the structure was referenced as
+        tagged: Parsed tagged structure
+        country: Country code of the referencing entry
+
+    Returns:
+        Decoded fields, or None for table-only subfunctions or mismatched magic
+    """
+    if sf_id == 1 and tagged.magic == "CTYINFO":
+        return decode_ctyinfo(tagged, country)
+    if sf_id == 5 and tagged.magic == "FCHAR":
+        return decode_fchar(tagged)
+    if sf_id == 7 and tagged.magic == "DBCS":
+        return decode_dbcs(tagged)
+    if sf_id == 35 and tagged.magic in ("YESNO", "ARAMODE"):
+        return decode_yesno(tagged)
+    return None
+
+
+@dataclass(frozen=True)
+class BlockCacheStats:
+    """
+    Statistics of a TaggedBlockCache.
+
+    Attributes:
+        references: Subfunction references resolved through the cache
+        hits: References that reused an already parsed tagged block
+        unique_blocks: Distinct tagged blocks parsed
+    """
+    references: int
+    hits: int
+    unique_blocks: int
+
+
+class TaggedBlockCache:
+    """
+    Per-parse cache of tagged blocks keyed by their linear file offset.
+
+    Most subfunctions of a FreeDOS COUNTRY.SYS point at a handful of shared
+    tables (ucase_437, fchar, dbcs_empty, yn_yn, ...). The cache parses each
+    block once, validates and decodes it once per subfunction ID, and hands
+    the same Tagged and decoded objects to every further reference. The
+    diagnostics of a block are reported once and counted once per reference.
+
+    Attributes:
+        buf: Complete file buffer
+        strict: If True, magic mismatches raise ValidationError
+        diag: Diagnostics collector for block diagnostics
+        guard: Work meter of a budgeted parse (None = unbudgeted)
+        references: Number of references resolved
+        hits: Number of references that reused a parsed block
+    """
+
+    def __init__(self, buf: Union[bytes, memoryview], strict: bool, diag: Diagnostics,
+                 guard: Optional[_ParseGuard] = None) -> None:
+        self.buf = buf
+        self.strict = strict
+        self.diag = diag
+        self.guard = guard
+        self.references = 0
+        self.hits = 0
+        # Values carry the keys of the diagnostics raised on first use, which
+        # are counted again on every further reference
+        self._blocks: Dict[int, Tuple[Tagged, Tuple[Any, ...]]] = {}
+        self._resolved: Dict[Tuple[int, int], Tuple[Optional[DecodedRecord], Tuple[Any, ...]]] = {}
+
+    def resolve(self, sf_id: int, offset: int, country: int) -> Tuple[Tagged, Optional[DecodedRecord]]:
+        """
+        Return the tagged block at offset and its decoding as subfunction sf_id.
+
+        Args:
+            sf_id: Subfunction ID the block is referenced as
+            offset: Linear file offset of the tagged block
+            country: Country code of the referencing entry
+
+        Returns:
+            Tuple of (tagged, decoded); shared between all references
+
+        Raises:
+            ValidationError: If strict mode and validation fails
+            _BudgetExhausted: If the parse budget is exceeded
+        """
+        self.references += 1
+        diag = self.diag
+        guard = self.guard
+        if guard is not None:
+            guard.charge(1, 0)
+        block = self._blocks.get(offset)
+        if block is None:
+            mark = diag.mark()
+            tagged = parse_tagged(self.buf, offset, diag, ("sf[{}]", sf_id))
+            if guard is not None:
+                end = offset + 10 + len(tagged.payload)
+                guard.claim("tagged block", offset, end)
+                guard.charge(0, end - offset)
+            block = self._blocks[offset] = (tagged, diag.since(mark))
+        else:
+            self.hits += 1
+            if block[1]:
+                diag.repeat(block[1])
+        tagged = block[0]
+        
+        key = (offset, sf_id)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            if guard is not None:
+                guard.charge(0, len(tagged.payload))
+            mark = diag.mark()
+            validate_magic_and_tag(sf_id, tagged, diag, self.strict)
+            decoded = _decode_subfunc(sf_id, tagged, country)
+            resolved = self._resolved[key] = (decoded, diag.since(mark))
+        elif resolved[1]:
+            diag.repeat(resolved[1])
+        return tagged, resolved[0]
+
+    @property
+    def stats(self) -> BlockCacheStats:
+        return BlockCacheStats(references=self.references, hits=self.hits,
+                               unique_blocks=len(self._blocks))
+
+
+# ====
+# Columnar entry index
+# ====
+
+class EntryColumns:
+    """
+    Column-oriented index over the entries of a parsed COUNTRY.SYS.
+
+    Entry fields live in parallel arrays (one slot per entry, in file order),
+    and subfunctions in CSR form: the subfunctions of entry i are
+    sf_id[sf_start[i]:sf_start[i + 1]] and the matching sf_data slice.
+    Filtering, sorting and grouping work on these arrays and return entry
+    row numbers, so no CountryEntry objects are touched until the caller
+    picks the rows it wants (doc.entries[i]).
+
+    The subfunction arrays are built on first use; for a LazyCountrySys this
+    is what parses the subfunction headers, so country/codepage queries alone
+    leave them untouched.
+
+    Attributes:
+        country: Country code per entry (array 'H')
+        codepage: Codepage per entry (array 'H')
+        offset: File offset of each entry (array 'I')
+        subfunc_header: Linear subfunction header offset per entry (array 'I')
+        sf_start: Row pointers into sf_id/sf_data, len(entries) + 1 long (array 'I')
+        sf_id: Subfunction ID of every subfunction entry (array 'H')
+        sf_data: Linear data offset of every subfunction entry (array 'I')
+
+    Note:
+        Offsets use 'I' rather than 'H': far pointers can address beyond 64 KiB.
+        The index is a snapshot; rebuild it if doc.entries is modified.
+    """
+    __slots__ = ("country", "codepage", "offset", "subfunc_header",
+                 "_entries", "_key", "_sf_start", "_sf_id", "_sf_data", "_sf_row")
+
+    def __init__(self, entries: List[CountryEntry]) -> None:
+        self._entries = entries
+        self.country = array.array("H", [e.country for e in entries])
+        self.codepage = array.array("H", [e.codepage for e in entries])
+        self.offset = array.array("I", [e.offset for e in entries])
+        self.subfunc_header = array.array("I", [e.subfunc_header_ptr.linear for e in entries])
+        # (country, codepage) packed into one sortable integer per entry
+        self._key = array.array("I", [(c << 16) | cp for c, cp in zip(self.country, self.codepage)])
+        self._sf_start: Optional[array.array] = None
+        self._sf_id: Optional[array.array] = None
+        self._sf_data: Optional[array.array] = None
+        self._sf_row: Optional[array.array] = None
+
+    def __len__(self) -> int:
+        return len(self.country)
+
+    def _build_subfuncs(self) -> None:
+        sf_start = array.array("I", [0])
+        sf_id = array.array("H")
+        sf_data = array.array("I")
+        sf_row = array.array("I")
+        for row, e in enumerate(self._entries):
+            subfuncs = e.subfuncs
+            sf_id.extend([s.subfunc_id for s in subfuncs])
+            sf_data.extend([s.data_ptr.linear for s in subfuncs])
+            sf_row.extend(itertools.repeat(row, len(subfuncs)))
+            sf_start.append(len(sf_id))
+        self._sf_start, self._sf_id, self._sf_data, self._sf_row = sf_start, sf_id, sf_data, sf_row
+
+    @property
+    def sf_start(self) -> array.array:
+        if self._sf_start is None:
+            self._build_subfuncs()
+        return self._sf_start
+
+    @property
+    def sf_id(self) -> array.array:
+        if self._sf_id is None:
+            self._build_subfuncs()
+        return self._sf_id
+
+    @property
+    def sf_data(self) -> array.array:
+        if self._sf_data is None:
+            self._build_subfuncs()
+        return self._sf_data
+
+    def subfunc_ids(self, row: int) -> array.array:
+        """Subfunction IDs of entry row, in file order."""
+        start = self.sf_start
+        return self.sf_id[start[row]:start[row + 1]]
+
+    def _sf_rows(self) -> array.array:
+        """Owning entry row of every subfunction (the CSR row pointers expanded)."""
+        if self._sf_row is None:
+            self._build_subfuncs()
+        return self._sf_row
+
+    def select(self, country: Optional[int] = None, codepage: Optional[int] = None,
+               subfunc: Optional[int] = None, rows: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Return the rows matching all given criteria, in file order.
+
+        Args:
+            country: Country code to match (None = any)
+            codepage: Codepage to match (None = any)
+            subfunc: Subfunction ID the entry must have (None = any)
+            rows: Rows to select from (None = all entries)
+
+        Returns:
+            List of matching entry rows, in the order of rows (file order
+            by default)
+        """
+        full = rows is None
+        rows = range(len(self)) if full else list(rows)
+        if country is not None:
+            rows = self._where(self.country, country, rows, full)
+            full = False
+        if codepage is not None:
+            rows = self._where(self.codepage, codepage, rows, full)
+        if subfunc is not None:
+            sf_rows = self._sf_rows()
+            having = {sf_rows[j] for j in self._where(self.sf_id, subfunc, (), True)}
+            rows = [i for i in rows if i in having]
+        return list(rows)
+
+    @staticmethod
+    def _where(col: array.array, value: int, rows: Sequence[int], full: bool) -> List[int]:
+        if not full:
+            return [i for i in rows if col[i] == value]
+        # Whole column: search the raw column bytes for the value's encoding,
+        # which runs at memchr speed instead of boxing every item
+        size = col.itemsize
+        try:
+            needle = value.to_bytes(size, sys.byteorder)
+        except OverflowError:
+            return []
+        data = col.tobytes()
+        out: List[int] = []
+        pos = data.find(needle)
+        while pos != -1:
+            if pos % size:
+                # Straddles two items; resume at the next item boundary
+                pos = data.find(needle, pos - pos % size + size)
+                continue
+            out.append(pos // size)
+            pos = data.find(needle, pos + size)
+        return out
+
+    def sort(self, rows: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Return rows ordered by (country, codepage).
+
+        Args:
+            rows: Rows to sort (None = all entries)
+
+        Returns:
+            Sorted list of rows; stable, so duplicate keys keep file order
+        """
+        if rows is None:
+            rows = range(len(self))
+        return sorted(rows, key=self._key.__getitem__)
+
+    def _group(self, col: array.array, rows: Optional[Iterable[int]]) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = {}
+        for i in (range(len(self)) if rows is None else rows):
+            groups.setdefault(col[i], []).append(i)
+        return groups
+
+    def group_by_country(self, rows: Optional[Iterable[int]] = None) -> Dict[int, List[int]]:
+        """Map each country code to its entry rows (in the order given)."""
+        return self._group(self.country, rows)
+
+    def group_by_codepage(self, rows: Optional[Iterable[int]] = None) -> Dict[int, List[int]]:
+        """Map each codepage to its entry rows (in the order given)."""
+        return self._group(self.codepage, rows)
+
+    def group_by_subfunc(self, rows: Optional[Iterable[int]] = None) -> Dict[int, List[int]]:
+        """
+        Map each subfunction ID to the entry rows that have it.
+
+        Args:
+            rows: Rows to group (None = all entries)
+
+        Returns:
+            Dict of subfunction ID -> ascending entry rows; an entry listing
+            the same ID twice appears once
+        """
+        wanted = None if rows is None else set(rows)
+        groups: Dict[int, List[int]] = {}
+        for row, sf_id in zip(self._sf_rows(), self.sf_id):
+            if wanted is not None and row not in wanted:
+                continue
+            bucket = groups.setdefault(sf_id, [])
+            if not bucket or bucket[-1] != row:
+                bucket.append(row)
+        return groups
 
 
 # ====
 # Main parser
 # ====
 
-def parse_country_sys(buf: bytes, strict: bool = False) -> ParsedCountrySys:
+def _parse_file_header(buf: Union[bytes, memoryview], strict: bool, diag: Diagnostics,
+                       guard: Optional[_ParseGuard] = None) -> Tuple[int, int, List[FarPtr]]:
     """
-    Parse a complete COUNTRY.SYS file.
+    Validate the file header and decode the entry table pointers.
 
     Args:
-        buf: Complete file contents as bytes
-        strict: If True, treat validation warnings as fatal errors
+        buf: Complete file buffer
+        strict: If True, report non-zero reserved header bytes
+        diag: Diagnostics collector
+        guard: Work meter of a budgeted parse (None = unbudgeted)
 
     Returns:
-        ParsedCountrySys object with all parsed data and warnings
+        Tuple of (entry_table_count, pointer_info_type, entry_table_ptrs)
 
     Raises:
-        ValidationError: If file format is invalid or strict mode validation fails
-
-    Note:
-        This is the main entry point for parsing. It validates the file header,
-        parses all entry tables, country/codepage entries, subfunction entries,
-        and tagged data structures. Warnings are collected rather than raising
-        exceptions (unless strict mode is enabled).
+        ValidationError: If the file is too short or the signature is wrong
     """
-    warnings: List[str] = []
     flen = len(buf)
     
     # Validate minimum file size for header
@@ -803,593 +2066,2196 @@ def parse_country_sys(buf: bytes, strict: bool = False) -> ParsedCountrySys:
     
     # Validate signature and magic
     sig = buf[0]
-    magic = buf[1:8]
+    magic = bytes(buf[1:8])
     if sig != 0xFF or magic.rstrip(b"\x00") != b"COUNTRY":
         raise ValidationError("Bad signature/magic (expected 0xFF + \'COUNTRY\')")
     
     # Check reserved bytes (should be all zeros, but not fatal if not)
-    reserved = buf[8:16]
+    reserved = bytes(buf[8:16])
     if strict and reserved != b"\x00" * 8:
-        warnings.append("reserved bytes in file header are not all zero")
+        diag.add("header-reserved", offset=8)
     
     # Parse header fields
-    entry_table_count = struct.unpack_from("<H", buf, 0x10)[0]
+    entry_table_count = _U16.unpack_from(buf, 0x10)[0]
     pointer_info_type = buf[0x12]
     
     # Parse entry table pointers
     ptrs: List[FarPtr] = []
     base = 0x13
+    if guard is not None:
+        guard.claim("file header", 0, min(flen, base + 4 * entry_table_count))
     for i in range(entry_table_count):
         if base + i * 4 + 4 > flen:
-            warnings.append("pointer array truncated")
+            diag.add("header-ptrs-truncated", offset=base + i * 4)
             break
-        u32 = struct.unpack_from("<I", buf, base + i * 4)[0]
-        ptrs.append(decode_far_ptr(u32, flen, warnings, f"entry_table_ptr[{i}]"))
+        if guard is not None:
+            guard.charge(1, 4)
+        u32 = _U32.unpack_from(buf, base + i * 4)[0]
+        ptrs.append(decode_far_ptr(u32, flen, diag, ("entry_table_ptr[{}]", i)))
     
-    # Parse all country/codepage entries
-    entries: List[CountryEntry] = []
-    for t_i, p in enumerate(ptrs):
-        P = p.linear
-        if P + 2 > flen:
-            warnings.append(f"entry_table[{t_i}]: offset {P:#x} beyond EOF")
-            continue
-        
-        X = struct.unpack_from("<H", buf, P)[0]  # Number of entries in this table
+    return entry_table_count, pointer_info_type, ptrs
+
+
+def _header_warnings(entry_table_count: int, pointer_info_type: int, diag: Diagnostics) -> None:
+    """
+    Warn about unusual (but not fatal) file header values.
+
+    Args:
+        entry_table_count: Number of entry tables declared in the header
+        pointer_info_type: Pointer type/version byte from the header
+        diag: Diagnostics collector
+    """
+    if entry_table_count != 1:
+        diag.add("header-table-count", entry_table_count, offset=0x10)
+    if pointer_info_type != 1:
+        diag.add("header-pointer-type", pointer_info_type, offset=0x12)
+
+
+def _iter_entry_headers(buf: Union[bytes, memoryview], ptrs: List[FarPtr], diag: Diagnostics,
+                        guard: Optional[_ParseGuard] = None) -> Iterator[Tuple[int, int, int, int, int, int, FarPtr]]:
+    """
+    Walk the entry table(s) and decode each Country_Codepage_Entry header.
+
+    Args:
+        buf: Complete file buffer
+        ptrs: Far pointers to the entry tables
+        diag: Diagnostics collector
+        guard: Work meter of a budgeted parse (None = unbudgeted)
+
+    Yields:
+        Tuples of (offset, header_len, country, codepage, reserved1, reserved2,
+        subfunc_header_ptr); subfunction headers are not touched
+    """
+    flen = len(buf)
+    for t_i, p in enumerate(ptrs):
+        P = p.linear
+        if P + 2 > flen:
+            diag.add("table-beyond-eof", t_i, offset=P)
+            continue
+        
+        X = _U16.unpack_from(buf, P)[0]  # Number of entries in this table
         pos = P + 2
+        x_i = 0
+        if guard is not None:
+            guard.claim("entry table", P, min(flen, pos + X * _ENTRY_STRUCT.size))
+        
+        # Fast path: standard 14-byte records are decoded in bulk straight
+        # from the contiguous table, until the first non-standard header_len
+        n_bulk = min(X, (flen - pos) // _ENTRY_STRUCT.size)
+        for header_len, country, codepage, reserved1, reserved2, u32q in \
+                _ENTRY_STRUCT.iter_unpack(buf[pos:pos + n_bulk * _ENTRY_STRUCT.size]):
+            if header_len != _ENTRY_HEADER_LEN:
+                break
+            if guard is not None:
+                guard.charge(1, _ENTRY_STRUCT.size)
+            if u32q <= 0xFFFF and u32q <= flen:
+                qptr = _near_ptr(u32q)
+            else:
+                qptr = decode_far_ptr(u32q, flen, diag, ("entry[{}:{}].subfunc_header_ptr", country, codepage))
+            yield pos, header_len, country, codepage, reserved1, reserved2, qptr
+            pos += _ENTRY_STRUCT.size
+            x_i += 1
         
-        for x_i in range(X):
+        # Per-record path for non-standard or truncated records
+        for x_i in range(x_i, X):
             if pos + 2 > flen:
-                warnings.append(f"entry_table[{t_i}] entry[{x_i}]: truncated")
+                diag.add("entry-truncated", t_i, x_i, offset=pos)
                 break
             
-            header_len = struct.unpack_from("<H", buf, pos)[0]
+            header_len = _U16.unpack_from(buf, pos)[0]
             if header_len == 0:
-                warnings.append(f"entry_table[{t_i}] entry[{x_i}]: header_len=0 at {pos:#x}")
+                diag.add("entry-len-zero", t_i, x_i, offset=pos)
             
             if pos + 2 + header_len > flen:
-                warnings.append(f"entry_table[{t_i}] entry[{x_i}]: header extends beyond EOF")
+                diag.add("entry-beyond-eof", t_i, x_i, offset=pos)
                 break
+            if guard is not None:
+                guard.charge(1, 2 + header_len)
             
             # Parse country/codepage entry fields
             country = codepage = reserved1 = reserved2 = 0
-            qptr = decode_far_ptr(0, flen, warnings, f"entry[{x_i}].subfunc_header_ptr")
             
             if header_len >= 12:
-                country, codepage, reserved1, reserved2, u32q = struct.unpack_from("<HHHHI", buf, pos + 2)
-                qptr = decode_far_ptr(u32q, flen, warnings, f"entry[{country}:{codepage}].subfunc_header_ptr")
+                country, codepage, reserved1, reserved2, u32q = _ENTRY_STRUCT.unpack_from(buf, pos)[1:]
+                qptr = decode_far_ptr(u32q, flen, diag, ("entry[{}:{}].subfunc_header_ptr", country, codepage))
             else:
-                warnings.append(f"entry_table[{t_i}] entry[{x_i}]: header_len {header_len} < 12 (cannot parse fields)")
+                # A null pointer never warns, so no context string is needed
+                qptr = _NULL_FAR_PTR
+                diag.add("entry-len-short", t_i, x_i, header_len, offset=pos)
             
-            # Parse subfunctions for this country/codepage
-            Q = qptr.linear
-            subfuncs: List[SubfuncEntry] = []
+            yield pos, header_len, country, codepage, reserved1, reserved2, qptr
+            pos += 2 + header_len
+
+
+def _parse_subfuncs(buf: Union[bytes, memoryview], qptr: FarPtr, country: int, codepage: int,
+                    diag: Diagnostics, make: Callable[..., SubfuncEntry] = SubfuncEntry,
+                    resolve: Optional[Callable[[SubfuncEntry], None]] = None,
+                    guard: Optional[_ParseGuard] = None,
+                    keep: Optional[Callable[[int], bool]] = None) -> List[SubfuncEntry]:
+    """
+    Parse the Country_Subfunction_Header at a subfunction header pointer.
+
+    Args:
+        buf: Complete file buffer
+        qptr: Far pointer to the subfunction header
+        country: Country code of the owning entry (for warning context)
+        codepage: Codepage of the owning entry (for warning context)
+        diag: Diagnostics collector
+        make: Factory used to construct each SubfuncEntry
+        resolve: Called on each entry as soon as it is parsed (eager decoding);
+            None leaves tagged/decoded untouched
+        guard: Work meter of a budgeted parse (None = unbudgeted)
+        keep: Predicate on subfunction IDs; entries it rejects are walked
+            over but not constructed or resolved (None = keep all)
+
+    Returns:
+        List of subfunction entries in file order
+
+    Raises:
+        _BudgetExhausted: If the parse budget is exceeded
+    """
+    flen = len(buf)
+    Q = qptr.linear
+    subfuncs: List[SubfuncEntry] = []
+    
+    if Q + 2 > flen:
+        return subfuncs
+    
+    Y = _U16.unpack_from(buf, Q)[0]  # Number of subfunctions
+    sfpos = Q + 2
+    y_i = 0
+    if guard is not None:
+        guard.claim("subfunc header", Q, min(flen, sfpos + Y * _SUBFUNC_STRUCT.size))
+    
+    # Fast path: standard 8-byte records are decoded in bulk, until the
+    # first non-standard entry_len
+    n_bulk = min(Y, (flen - sfpos) // _SUBFUNC_STRUCT.size)
+    for entry_len, sf_id, u32d in _SUBFUNC_STRUCT.iter_unpack(buf[sfpos:sfpos + n_bulk * _SUBFUNC_STRUCT.size]):
+        if entry_len != _SUBFUNC_ENTRY_LEN:
+            break
+        if guard is not None:
+            guard.charge(1, _SUBFUNC_STRUCT.size)
+        if keep is not None and not keep(sf_id):
+            sfpos += _SUBFUNC_STRUCT.size
+            y_i += 1
+            continue
+        if u32d <= 0xFFFF and u32d <= flen:
+            dptr = _near_ptr(u32d)
+        else:
+            dptr = decode_far_ptr(u32d, flen, diag, ("entry[{}:{}].sf[{}].data_ptr", country, codepage, sf_id))
+        s = make(offset=sfpos, entry_len=entry_len, subfunc_id=sf_id, data_ptr=dptr)
+        if resolve is not None:
+            resolve(s)
+        subfuncs.append(s)
+        sfpos += _SUBFUNC_STRUCT.size
+        y_i += 1
+    
+    # Per-record path for non-standard or truncated records
+    for _ in range(y_i, Y):
+        if sfpos + 2 > flen:
+            diag.add("subfunc-truncated", Q, offset=sfpos)
+            break
+        
+        entry_len = _U16.unpack_from(buf, sfpos)[0]
+        if entry_len == 0:
+            diag.add("subfunc-len-zero", Q, offset=sfpos)
+            break
+        
+        if sfpos + 2 + entry_len > flen:
+            diag.add("subfunc-beyond-eof", Q, offset=sfpos)
+            break
+        if guard is not None:
+            guard.charge(1, 2 + entry_len)
+        
+        # Parse subfunction entry fields
+        sf_id = u32d = 0
+        if entry_len >= 6:
+            sf_id, u32d = _SUBFUNC_STRUCT.unpack_from(buf, sfpos)[1:]
+        if keep is not None and not keep(sf_id):
+            sfpos += 2 + entry_len
+            continue
+        
+        dptr = _NULL_FAR_PTR
+        if entry_len >= 6:
+            dptr = decode_far_ptr(u32d, flen, diag, ("entry[{}:{}].sf[{}].data_ptr", country, codepage, sf_id))
+        
+        s = make(offset=sfpos, entry_len=entry_len, subfunc_id=sf_id, data_ptr=dptr)
+        if resolve is not None:
+            resolve(s)
+        
+        subfuncs.append(s)
+        sfpos += 2 + entry_len
+    
+    return subfuncs
+
+
+def _resolve_subfunc(s: SubfuncEntry, cache: TaggedBlockCache, country: int) -> None:
+    """
+    Attach the tagged structure a subfunction points at, and its decoding.
+
+    Args:
+        s: Subfunction entry to fill in (sets s.tagged and s.decoded)
+        cache: Block cache of the document being parsed
+        country: Country code of the owning entry
+    """
+    # Parse tagged data structure if valid
+    if s.subfunc_id == 0 or s.data_ptr.linear >= len(cache.buf):
+        return
+    s.tagged, s.decoded = cache.resolve(s.subfunc_id, s.data_ptr.linear, country)
+
+
+def parse_country_sys(buf: Union[bytes, memoryview, mmap.mmap], strict: bool = False,
+                      diagnostics: Optional[Diagnostics] = None,
+                      budget: Optional[ParseBudget] = None,
+                      entry_filter: Optional[EntryFilter] = None) -> ParsedCountrySys:
+    """
+    Parse a complete COUNTRY.SYS file.
+
+    Args:
+        buf: Complete file contents as bytes, or a memoryview/mmap of them
+        strict: If True, treat validation warnings as fatal errors
+        diagnostics: Collector to report to (default: a new one at level "info")
+        budget: Work caps for untrusted input (None = unbounded)
+        entry_filter: Entries/subfunctions to parse (None = all); see EntryFilter
+
+    Returns:
+        ParsedCountrySys object with all parsed data and warnings
+
+    Raises:
+        ValidationError: If file format is invalid or strict mode validation fails
+
+    Note:
+        This is the main entry point for parsing. It validates the file header,
+        parses all entry tables, country/codepage entries, subfunction entries,
+        and tagged data structures. Warnings are collected rather than raising
+        exceptions (unless strict mode is enabled).
+        When buf is a memoryview (or an mmap, which is wrapped in one), tagged
+        payloads are views into it instead of copies, so repeated references
+        to shared tables cost no payload allocations.
+        With a budget, overlapping and back-pointing structures are reported,
+        and parsing stops once a cap is exceeded: the result then has
+        partial=True and holds the entries completed so far.
+    """
+    if isinstance(buf, mmap.mmap):
+        buf = memoryview(buf)
+    diag, guard = _setup_diagnostics(diagnostics, budget)
+    cache = TaggedBlockCache(buf, strict, diag, guard)
+    
+    # Parse all country/codepage entries
+    entries: List[CountryEntry] = []
+    partial = False
+    filtered_out = 0
+    keep = entry_filter.wants_subfunc if entry_filter is not None and entry_filter.subfuncs is not None else None
+    # Stay empty if the budget runs out within the file header
+    entry_table_count = pointer_info_type = 0
+    ptrs: List[FarPtr] = []
+    header_done = False
+    try:
+        entry_table_count, pointer_info_type, ptrs = _parse_file_header(buf, strict, diag, guard)
+        header_done = True
+        for pos, header_len, country, codepage, reserved1, reserved2, qptr in _iter_entry_headers(buf, ptrs, diag, guard):
+            if entry_filter is not None and not entry_filter.matches(country, codepage):
+                filtered_out += 1
+                continue
             
-            if Q + 2 <= flen:
-                Y = struct.unpack_from("<H", buf, Q)[0]  # Number of subfunctions
-                sfpos = Q + 2
-                
-                for y_i in range(Y):
-                    if sfpos + 2 > flen:
-                        warnings.append(f"subfunc_header {Q:#x}: truncated")
-                        break
-                    
-                    entry_len = struct.unpack_from("<H", buf, sfpos)[0]
-                    if entry_len == 0:
-                        warnings.append(f"subfunc_header {Q:#x}: entry_len=0 at {sfpos:#x} (would stall)")
-                        break
-                    
-                    if sfpos + 2 + entry_len > flen:
-                        warnings.append(f"subfunc_header {Q:#x}: entry beyond EOF at {sfpos:#x}")
-                        break
-                    
-                    # Parse subfunction entry fields
-                    sf_id = 0
-                    dptr = decode_far_ptr(0, flen, warnings, f"entry[{country}:{codepage}].sf[{y_i}].data_ptr")
-                    
-                    if entry_len >= 6:
-                        sf_id = struct.unpack_from("<H", buf, sfpos + 2)[0]
-                        u32d = struct.unpack_from("<I", buf, sfpos + 4)[0]
-                        dptr = decode_far_ptr(u32d, flen, warnings, f"entry[{country}:{codepage}].sf[{sf_id}].data_ptr")
-                    
-                    s = SubfuncEntry(offset=sfpos, entry_len=entry_len, subfunc_id=sf_id, data_ptr=dptr)
-                    
-                    # Parse tagged data structure if valid
-                    if sf_id != 0 and dptr.linear < flen:
-                        tagged = parse_tagged(buf, dptr.linear, warnings, f"sf[{sf_id}]")
-                        validate_magic_and_tag(sf_id, tagged, warnings, strict)
-                        s.tagged = tagged
-                    
-                        # Decode known subfunction types
-                        if sf_id == 1 and tagged.magic == "CTYINFO":
-                            s.decoded = decode_ctyinfo(tagged, country)
-                        elif sf_id == 5 and tagged.magic == "FCHAR":
-                            s.decoded = decode_fchar(tagged)
-                        elif sf_id == 7 and tagged.magic == "DBCS":
-                            s.decoded = decode_dbcs(tagged)
-                        elif sf_id == 35 and tagged.magic in ("YESNO", "ARAMODE"):
-                            s.decoded = decode_yesno(tagged)
-                    
-                    subfuncs.append(s)
-                    sfpos += 2 + entry_len
+            # Parse subfunctions for this country/codepage
+            def resolve(s: SubfuncEntry, country: int = country) -> None:
+                _resolve_subfunc(s, cache, country)
+            subfuncs = _parse_subfuncs(buf, qptr, country, codepage, diag, resolve=resolve, guard=guard,
+                                       keep=keep)
             
             entries.append(CountryEntry(
                 offset=pos, header_len=header_len, country=country,
                 codepage=codepage, reserved1=reserved1, reserved2=reserved2,
                 subfunc_header_ptr=qptr, subfuncs=subfuncs
             ))
-            pos += 2 + header_len
+    except _BudgetExhausted:
+        partial = True
     
     # Warn about unusual header values (not fatal)
-    if entry_table_count != 1:
-        warnings.append(f"entry_table_count={entry_table_count} (normally 1); parsed all available pointers")
-    if pointer_info_type != 1:
-        warnings.append(f"pointer_info_type={pointer_info_type} (normally 1); continuing anyway")
+    if header_done:
+        _header_warnings(entry_table_count, pointer_info_type, diag)
     
     return ParsedCountrySys(
-        file_size=flen, entry_table_count=entry_table_count,
+        file_size=len(buf), entry_table_count=entry_table_count,
         pointer_info_type=pointer_info_type, entry_table_ptrs=ptrs,
-        entries=entries, warnings=warnings
+        entries=entries, diagnostics=diag, buf=buf, block_cache=cache,
+        partial=partial, entry_filter=entry_filter, filtered_out=filtered_out
+    )
+
+
+def _setup_diagnostics(diagnostics: Optional[Diagnostics],
+                       budget: Optional[ParseBudget]) -> Tuple[Diagnostics, Optional[_ParseGuard]]:
+    """
+    Create or adopt the Diagnostics of a parse, and its guard if budgeted.
+
+    Args:
+        diagnostics: Caller-supplied collector (None = a new one)
+        budget: Work caps (None = unbounded)
+
+    Returns:
+        Tuple of (diagnostics, guard); the budget's max_diagnostics becomes
+        the collector's limit unless it already has one
+    """
+    diag = Diagnostics() if diagnostics is None else diagnostics
+    if budget is None:
+        return diag, None
+    if diag.limit is None:
+        diag.limit = budget.max_diagnostics
+    return diag, _ParseGuard(budget, diag)
+
+
+def parse_country_sys_lazy(buf: Union[bytes, memoryview, mmap.mmap], strict: bool = False,
+                           diagnostics: Optional[Diagnostics] = None,
+                           budget: Optional[ParseBudget] = None,
+                           entry_filter: Optional[EntryFilter] = None) -> LazyCountrySys:
+    """
+    Parse only the header and entry table of a COUNTRY.SYS file.
+
+    Args:
+        buf: Complete file contents as bytes, or a memoryview/mmap of them
+        strict: If True, treat validation warnings as fatal errors (raised
+            when the offending subfunction is first accessed)
+        diagnostics: Collector to report to (default: a new one at level "info")
+        budget: Work caps for untrusted input (None = unbounded); shared by
+            the up-front parse and everything resolved later
+        entry_filter: Entries/subfunctions to parse (None = all); see EntryFilter
+
+    Returns:
+        LazyCountrySys whose entries resolve their subfunctions on demand
+
+    Raises:
+        ValidationError: If the file header is invalid
+
+    Note:
+        Subfunction headers are read on the first access to an entry's
+        subfuncs; tagged structures are parsed, validated and decoded on the
+        first access to a subfunction's tagged/decoded. Both are memoized.
+        Diagnostics are reported to doc.diagnostics as parts of the file are
+        resolved, so they only cover what has been looked at so far. Once
+        the budget is exhausted, doc.partial is set and further subfunction
+        headers and tagged structures resolve as empty.
+    """
+    if isinstance(buf, mmap.mmap):
+        buf = memoryview(buf)
+    diag, guard = _setup_diagnostics(diagnostics, budget)
+    doc = LazyCountrySys(
+        file_size=len(buf), entry_table_count=0, pointer_info_type=0,
+        entry_table_ptrs=[], entries=[], diagnostics=diag, buf=buf,
+        entry_filter=entry_filter, strict=strict
     )
+    doc.block_cache = TaggedBlockCache(buf, strict, diag, guard)
+    header_done = False
+    try:
+        doc.entry_table_count, doc.pointer_info_type, doc.entry_table_ptrs = \
+            _parse_file_header(buf, strict, diag, guard)
+        header_done = True
+        for pos, header_len, country, codepage, reserved1, reserved2, qptr in \
+                _iter_entry_headers(buf, doc.entry_table_ptrs, diag, guard):
+            if entry_filter is not None and not entry_filter.matches(country, codepage):
+                doc.filtered_out += 1
+                continue
+            doc.entries.append(LazyCountryEntry(
+                doc, offset=pos, header_len=header_len, country=country,
+                codepage=codepage, reserved1=reserved1, reserved2=reserved2,
+                subfunc_header_ptr=qptr
+            ))
+    except _BudgetExhausted:
+        doc.partial = True
+    if header_done:
+        _header_warnings(doc.entry_table_count, doc.pointer_info_type, diag)
+    return doc
+
+
+@contextlib.contextmanager
+def open_country_sys(path: Union[str, os.PathLike], strict: bool = False,
+                     lazy: bool = False, diagnostics: Optional[Diagnostics] = None,
+                     budget: Optional[ParseBudget] = None,
+                     entry_filter: Optional[EntryFilter] = None) -> Iterator[ParsedCountrySys]:
+    """
+    Memory-map a COUNTRY.SYS file and parse it zero-copy.
+
+    Args:
+        path: Path to COUNTRY.SYS
+        strict: If True, treat validation warnings as fatal errors
+        lazy: If True, parse with parse_country_sys_lazy()
+        diagnostics: Collector to report to (default: a new one at level "info")
+        budget: Work caps for untrusted input (None = unbounded)
+        entry_filter: Entries/subfunctions to parse (None = all); see EntryFilter
+
+    Yields:
+        ParsedCountrySys whose tagged payloads are views into the mapping
+
+    Raises:
+        ValidationError: If file format is invalid or strict mode validation fails
+
+    Note:
+        Payload views are only guaranteed to be usable inside the with-block.
+        On exit the mapping is closed; if views are still referenced elsewhere
+        the close is skipped and the mapping is released by the garbage
+        collector once the last view goes away, so a stale view can never
+        point at unmapped memory.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValidationError("File too short for COUNTRY.SYS header")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    parse = parse_country_sys_lazy if lazy else parse_country_sys
+    try:
+        yield parse(view, strict=strict, diagnostics=diagnostics, budget=budget, entry_filter=entry_filter)
+    finally:
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            # Payload views escaped the with-block; keep the mapping alive.
+            pass
 
 
 # ====
 # Copyright / Version detection
 # ====
 
-def find_copyright_and_version(buf: bytes) -> Optional[Dict[str, Any]]:
+@dataclass(frozen=True, slots=True)
+class CensusBlock:
+    """
+    A tagged block found by signature scan (see census_tagged_blocks()).
+
+    Attributes:
+        offset: File offset of the tag byte
+        tag: Tag byte (0xFF, or 0x00 for ARAMODE)
+        magic: Cleaned magic string
+        size: Size WORD from the block header
+        end: Offset just past the payload (clamped to the file size)
+        truncated: True if the payload runs past the end of file
+    """
+    offset: int
+    tag: int
+    magic: str
+    size: int
+    end: int
+    truncated: bool
+
+
+@dataclass(frozen=True)
+class BlockCensus:
+    """
+    Every tagged block signature in a file, plus the end-of-file trailer.
+
+    Attributes:
+        blocks: Blocks in file order
+        trailer: Copyright/version result (see find_copyright_and_version())
+    """
+    blocks: Tuple[CensusBlock, ...]
+    trailer: Optional[Dict[str, Any]]
+
+    @functools.cached_property
+    def by_offset(self) -> Dict[int, CensusBlock]:
+        """Offset -> block."""
+        return {b.offset: b for b in self.blocks}
+
+    def orphans(self, referenced: Iterable[int]) -> List[CensusBlock]:
+        """
+        Blocks that no subfunction entry points at.
+
+        Args:
+            referenced: Linear data offsets of the subfunction entries
+
+        Returns:
+            Unreferenced blocks in file order (the FreeDOS VERSION block is
+            always one of them)
+        """
+        referenced = set(referenced)
+        return [b for b in self.blocks if b.offset not in referenced]
+
+
+def _tagged_signature_re() -> re.Pattern:
+    # 0xFF + known magic padded to 7 bytes with spaces or NULs. The file
+    # header (0xFF "COUNTRY") has no size WORD and is left out on purpose.
+    magics = sorted({m for ms in ALLOWED_MAGICS.values() for m in ms} | {"VERSION"})
+    alts = [re.escape(m.encode("ascii")) + b"[ \\x00]{%d}" % (7 - len(m))
+            for m in magics if m != "ARAMODE"]
+    return re.compile(b"\\xff(?:" + b"|".join(alts) + b")")
+
+
+# ARAMODE (tag 0x00 or 0xFF) is searched for separately: patterns that start
+# with a literal let the regex engine skip ahead with a fast byte search, a
+# leading 0x00 alternative would be tried at every NUL of the file.
+_TAGGED_SIGNATURE = _tagged_signature_re()
+_ARAMODE_MAGIC = re.compile(b"ARAMODE")
+
+
+def _searchable(buf: Union[bytes, memoryview, mmap.mmap]) -> Union[bytes, mmap.mmap]:
+    """Object with find/rfind for buf (the exporter of a whole-buffer view, no copy)."""
+    if not isinstance(buf, memoryview):
+        return buf
+    obj = buf.obj
+    if isinstance(obj, (bytes, mmap.mmap)) and len(obj) == buf.nbytes:
+        return obj
+    return bytes(buf)
+
+
+def _find_trailer(buf: Union[bytes, mmap.mmap], flen: int,
+                  by_offset: Dict[int, CensusBlock]) -> Optional[Dict[str, Any]]:
+    if flen < 10:
+        return None
+    # Last 0x00 byte (usually precedes the terminating string)
+    zero_pos = buf.rfind(b"\x00")
+    if zero_pos < 0:
+        return None
+    # Closest 0xFF before it whose 10-byte header ends before the 0x00,
+    # searched within the preceding 1000 bytes
+    lo = max(0, zero_pos - 1000) + 1
+    hi = zero_pos - 10
+    tagged_start = buf.rfind(b"\xff", lo, hi) if hi > lo else -1
+    if tagged_start < 0:
+        return None
+
+    copyright_str = bytes(buf[zero_pos + 1:]).decode("ascii", "replace").rstrip("\x00 \r\n")
+    result: Dict[str, Any] = {"copyright": copyright_str}
+
+    block = by_offset.get(tagged_start)
+    if block is not None and block.magic == "VERSION" and block.size == 4 and not block.truncated:
+        # Payload: <major>\x00<minor>\x00
+        payload = bytes(buf[tagged_start + 10: tagged_start + 14])
+        major = payload[:2].decode("ascii", "replace").rstrip("\x00")
+        minor = payload[2:].decode("ascii", "replace").rstrip("\x00")
+        result["version"] = major + "." + minor
+    return result
+
+
+def census_tagged_blocks(buf: Union[bytes, memoryview, mmap.mmap]) -> BlockCensus:
+    """
+    Find every tagged block and the copyright trailer in one forward pass.
+
+    Args:
+        buf: Complete file contents (bytes, memoryview or mmap)
+
+    Returns:
+        BlockCensus with all blocks found and the trailer
+
+    Note:
+        Blocks are found by their signature (tag byte + known magic), not by
+        following pointers, so unreferenced blocks such as the FreeDOS VERSION
+        extension are included. Like any carving scan this can report a
+        signature that happens to occur inside a payload. The scan runs in
+        the regex engine over the buffer without copying it.
+    """
+    flen = len(buf)
+    blocks = []
+    unpack = _U16.unpack_from
+    starts = [m.start() for m in _TAGGED_SIGNATURE.finditer(buf)]
+    aramode = [m.start() - 1 for m in _ARAMODE_MAGIC.finditer(buf, 1)
+               if buf[m.start() - 1] in (0x00, 0xFF)]
+    if aramode:
+        starts = sorted(starts + aramode)
+    for off in starts:
+        if off + 10 > flen:
+            continue
+        size = unpack(buf, off + 8)[0]
+        end = off + 10 + size
+        blocks.append(CensusBlock(
+            offset=off, tag=buf[off],
+            magic=bytes(buf[off + 1: off + 8]).rstrip(b" \x00").decode("ascii"),
+            size=size, end=min(end, flen), truncated=end > flen))
+    trailer = _find_trailer(_searchable(buf), flen, {b.offset: b for b in blocks})
+    return BlockCensus(blocks=tuple(blocks), trailer=trailer)
+
+
+def find_copyright_and_version(buf: Union[bytes, memoryview]) -> Optional[Dict[str, Any]]:
     """
     Scan from end of file for copyright string and optional VERSION tag.
 
     Args:
-        buf: Complete file contents as bytes
+        buf: Complete file contents as bytes (or a memoryview of them)
 
     Returns:
         Dictionary with 'copyright' string and optional 'version' (major.minor),
         or None if no copyright found
 
     Note:
-        Scans backward from EOF looking for a 0x00 byte. If found, scans backward
-        for a tagged structure (0xFF + magic + size). If the 0x00 is past the end
-        of this structure, everything after the 0x00 is the copyright string.
-        If the tagged structure has magic "VERSION" and size==4, it contains
-        major and minor version WORDs. Limits search to last 1000 bytes for perf.
+        Looks for the last 0x00 byte, then for the closest tagged structure
+        (0xFF + magic + size) within the 1000 bytes before it whose header
+        ends before the 0x00. Everything after the 0x00 is the copyright
+        string. If the tagged structure has magic "VERSION" and size==4, it
+        contains major and minor version WORDs. Same as
+        census_tagged_blocks(buf).trailer.
     """
-    flen = len(buf)
-    if flen < 10:
-        return None
+    return census_tagged_blocks(buf).trailer
 
-    # Scan backward from end looking for 0x00 byte (usually preceeds terminating string)
-    zero_pos = None
-    for i in range(flen - 1, -1, -1):
-        if buf[i] == 0x00:
-            zero_pos = i
-            break
 
-    if zero_pos is None:
-        return None
+# ====
+# Byte diff engine
+# ====
+
+# A run of non-zero bytes in an XOR mask = a run of differing bytes
+_NONZERO_RUN = re.compile(b"[^\x00]+")
+
+
+@dataclass(frozen=True, slots=True)
+class ByteDiff:
+    """
+    Differing bytes of two buffers as run-length spans.
+
+    Attributes:
+        size_a: Length of buffer A
+        size_b: Length of buffer B
+        spans: (start, end) half-open ranges of differing bytes, ascending and
+            non-adjacent; if the sizes differ, the tail of the longer buffer
+            is one span
+    """
+    size_a: int
+    size_b: int
+    spans: Tuple[Tuple[int, int], ...]
+
+    def __bool__(self) -> bool:
+        return bool(self.spans)
+
+    @property
+    def count(self) -> int:
+        """Number of differing bytes."""
+        return sum(end - start for start, end in self.spans)
+
+    def rows(self, per_row: int = 8, limit: Optional[int] = None) -> List[int]:
+        """
+        Row numbers (offset // per_row) that contain differing bytes.
+
+        Args:
+            per_row: Bytes per row
+            limit: Stop after this many rows (None = all)
+
+        Returns:
+            Ascending row numbers
+        """
+        rows: List[int] = []
+        for start, end in self.spans:
+            first = start // per_row
+            if rows and rows[-1] == first:
+                first += 1
+            rows.extend(range(first, (end - 1) // per_row + 1))
+            if limit is not None and len(rows) >= limit:
+                return rows[:limit]
+        return rows
+
+    def positions(self, start: int, end: int) -> List[int]:
+        """Differing offsets within [start, end), ascending."""
+        spans = self.spans
+        i = bisect.bisect_right(spans, (start, start)) - 1
+        if i < 0:
+            i = 0
+        out: List[int] = []
+        for s, e in spans[i:]:
+            if s >= end:
+                break
+            out.extend(range(max(s, start), min(e, end)))
+        return out
+
+
+def diff_bytes(a: Union[bytes, memoryview], b: Union[bytes, memoryview]) -> ByteDiff:
+    """
+    Compute the differing spans of two buffers in bulk.
+
+    Args:
+        a: First buffer
+        b: Second buffer
+
+    Returns:
+        ByteDiff (falsy if the buffers are identical)
+
+    Note:
+        The common prefix is compared with one C-level equality check; if it
+        differs, both sides are read as big integers and XORed, and the runs
+        of non-zero bytes of the result are the differing spans. No Python
+        code runs per byte.
+    """
+    n = min(len(a), len(b))
+    head_a, head_b = a[:n], b[:n]
+    if head_a == head_b:
+        spans: Tuple[Tuple[int, int], ...] = ()
+    else:
+        mask = (int.from_bytes(head_a, "big") ^ int.from_bytes(head_b, "big")).to_bytes(n, "big")
+        spans = tuple(m.span() for m in _NONZERO_RUN.finditer(mask))
+    if len(a) != len(b):
+        spans += ((n, max(len(a), len(b))),)
+    return ByteDiff(size_a=len(a), size_b=len(b), spans=spans)
+
+
+def format_db_diff(pa: Union[bytes, memoryview], pb: Union[bytes, memoryview], diff: ByteDiff,
+                   rows: Iterable[int], per_row: int = 8, use_colors: bool = False) -> List[str]:
+    """
+    Render rows of two equally sized buffers side by side as "db" lines.
+
+    Args:
+        pa: Buffer A
+        pb: Buffer B
+        diff: diff_bytes(pa, pb)
+        rows: Row numbers to render
+        per_row: Bytes per row
+        use_colors: Whether to highlight differing bytes (A red, B green)
+
+    Returns:
+        Three lines per row: a "Line N (bytes s-e):" caption, then A and B
+    """
+    result = []
+    for line_num in rows:
+        start = line_num * per_row
+        end = min(start + per_row, len(pa))
+        parts_a = list(map(_BYTE_DEC3.__getitem__, pa[start:end]))
+        parts_b = list(map(_BYTE_DEC3.__getitem__, pb[start:end]))
+        for pos in diff.positions(start, end):
+            i = pos - start
+            parts_a[i] = _colorize(parts_a[i], AnsiColors.RED, use_colors)
+            parts_b[i] = _colorize(parts_b[i], AnsiColors.GREEN, use_colors)
+        result.append(_colorize(f"    Line {line_num} (bytes {start}-{end-1}):", AnsiColors.CYAN, use_colors))
+        result.append(f"      A: db {' '.join(parts_a)}")
+        result.append(f"      B: db {' '.join(parts_b)}")
+    return result
+
+
+# ====
+# Collation diff
+# ====
+
+@dataclass(frozen=True)
+class CollationDiff:
+    """
+    Semantic difference of two COLLATE weight tables.
+
+    Characters are ordered by weight; a character's rank is the number of
+    characters with a smaller weight, so equal weights (ties) share a rank
+    and shifting all weights by the same amount changes nothing.
+
+    Attributes:
+        size: Number of characters (table length)
+        moved: (char, rank in A, rank in B) for each character whose rank
+            changed, by char
+        ties_created: Characters tied in B that were not all tied in A,
+            one sorted list per tie class of B
+        ties_broken: Characters tied in A that are no longer all tied in B,
+            one sorted list per tie class of A
+        tied_pairs_created: Character pairs tied in B but not in A
+        tied_pairs_broken: Character pairs tied in A but not in B
+        inversions: Character pairs ordered one way in A and the other way
+            in B (Kendall tau distance; tied pairs never count)
+    """
+    size: int
+    moved: List[Tuple[int, int, int]]
+    ties_created: List[List[int]]
+    ties_broken: List[List[int]]
+    tied_pairs_created: int
+    tied_pairs_broken: int
+    inversions: int
+
+    def __bool__(self) -> bool:
+        return bool(self.moved or self.tied_pairs_created or self.tied_pairs_broken)
+
+    @property
+    def tau_distance(self) -> float:
+        """inversions normalized to 0..1 by the number of character pairs."""
+        pairs = self.size * (self.size - 1) // 2
+        return self.inversions / pairs if pairs else 0.0
+
+
+def collation_order(weights: Union[bytes, memoryview]) -> Tuple[List[int], List[int], List[List[int]]]:
+    """
+    Sort permutation, ranks and tie classes of a collating weight table.
+
+    Args:
+        weights: Weight of each character (index = character code)
+
+    Returns:
+        Tuple of (permutation, ranks, ties): characters in collating order
+        (ties by character code), the rank of each character, and the
+        classes of two or more characters with the same weight
+    """
+    weights = bytes(weights)
+    perm = sorted(range(len(weights)), key=weights.__getitem__)
+    ranks = [0] * len(weights)
+    ties: List[List[int]] = []
+    start = 0
+    for i in range(1, len(perm) + 1):
+        if i == len(perm) or weights[perm[i]] != weights[perm[start]]:
+            for c in perm[start:i]:
+                ranks[c] = start
+            if i - start > 1:
+                ties.append(perm[start:i])
+            start = i
+    return perm, ranks, ties
+
+
+def _count_inversions(seq: List[int]) -> int:
+    """Pairs i < j with seq[i] > seq[j], by merge sort in O(n log n)."""
+    count = 0
+    width = 1
+    n = len(seq)
+    src = list(seq)
+    while width < n:
+        dst = []
+        for lo in range(0, n, 2 * width):
+            left = src[lo:lo + width]
+            right = src[lo + width:lo + 2 * width]
+            i = j = 0
+            while i < len(left) and j < len(right):
+                if right[j] < left[i]:
+                    # right[j] jumps ahead of everything left in `left`
+                    count += len(left) - i
+                    dst.append(right[j])
+                    j += 1
+                else:
+                    dst.append(left[i])
+                    i += 1
+            dst.extend(left[i:])
+            dst.extend(right[j:])
+        src = dst
+        width *= 2
+    return count
+
+
+def _tie_pairs(groups: Iterable[int]) -> int:
+    return sum(n * (n - 1) // 2 for n in groups)
+
 
-    # Scan backward from zero_pos looking for tagged structure (0xFF byte)
-    tagged_start = None
-    for i in range(zero_pos - 1, max(0, zero_pos - 1000), -1):  # Limit search to 1000 bytes
-        if buf[i] == 0xFF:
-            # Check if this looks like a valid tagged structure
-            if i + 10 <= flen:
-                magic_raw = buf[i + 1: i + 8]
-                size = struct.unpack_from("<H", buf, i + 8)[0]
-                tagged_end = i + 10  # End of header (payload not included in check)
-                # Check if zero_pos is past the tagged header
-                if tagged_end < zero_pos:
-                    tagged_start = i
-                    break
-
-    if tagged_start is None:
+def diff_collation(a: Union[bytes, memoryview], b: Union[bytes, memoryview]) -> Optional[CollationDiff]:
+    """
+    Compare two COLLATE weight tables as orderings rather than bytes.
+
+    Args:
+        a: Weight table of file A
+        b: Weight table of file B
+
+    Returns:
+        CollationDiff (falsy if both tables sort identically), or None if
+        the tables differ in length
+
+    Note:
+        O(n log n): one sort per table, one sort by (weight A, weight B) and
+        a merge-sort inversion count of the B weights in that order.
+    """
+    if len(a) != len(b):
         return None
+    wa, wb = bytes(a), bytes(b)
+    _, ranks_a, ties_a = collation_order(wa)
+    _, ranks_b, ties_b = collation_order(wb)
+    moved = [(c, ra, rb) for c, (ra, rb) in enumerate(zip(ranks_a, ranks_b)) if ra != rb]
+
+    # A tie class of one side that the other side splits up
+    ties_created = [t for t in ties_b if len({wa[c] for c in t}) > 1]
+    ties_broken = [t for t in ties_a if len({wb[c] for c in t}) > 1]
+    both = _tie_pairs(collections.Counter(zip(wa, wb)).values())
+    created = _tie_pairs(collections.Counter(wb).values()) - both
+    broken = _tie_pairs(collections.Counter(wa).values()) - both
+
+    # Ordered by A (ties in A by B, so they add no inversions), a pair is
+    # discordant exactly when the B weights are strictly inverted
+    by_a = sorted(range(len(wa)), key=lambda c: (wa[c], wb[c]))
+    inversions = _count_inversions([wb[c] for c in by_a])
+
+    return CollationDiff(size=len(wa), moved=moved, ties_created=ties_created, ties_broken=ties_broken,
+                         tied_pairs_created=created, tied_pairs_broken=broken, inversions=inversions)
+
+
+def _collate_char(c: int) -> str:
+    """Character code for collation reports: hex, plus the ASCII glyph if printable."""
+    return f"{c:#04x} '{chr(c)}'" if 0x20 < c < 0x7F else f"{c:#04x}"
+
+
+def format_collation_diff(cd: CollationDiff, limit: int = 8) -> List[str]:
+    """
+    Render a CollationDiff as summary lines.
+
+    Args:
+        cd: Result of diff_collation()
+        limit: Most characters/tie classes listed per line (largest moves first)
+
+    Returns:
+        Lines, unindented
+    """
+    lines = [f"Collation: {len(cd.moved)} character(s) moved rank, "
+             f"{cd.tied_pairs_created} tied pair(s) created, {cd.tied_pairs_broken} broken, "
+             f"{cd.inversions} inversion(s) (Kendall tau distance {cd.tau_distance:.4f})"]
+    if cd.moved:
+        moved = sorted(cd.moved, key=lambda m: (-abs(m[2] - m[1]), m[0]))
+        shown = ", ".join(f"{_collate_char(c)} {ra}->{rb}" for c, ra, rb in moved[:limit])
+        more = f", ... ({len(moved) - limit} more)" if len(moved) > limit else ""
+        lines.append(f"Moved: {shown}{more}")
+    for label, classes in (("Ties created", cd.ties_created), ("Ties broken", cd.ties_broken)):
+        if classes:
+            shown = ", ".join("{" + " ".join(_collate_char(c) for c in t) + "}" for t in classes[:limit])
+            more = f", ... ({len(classes) - limit} more)" if len(classes) > limit else ""
+            lines.append(f"{label}: {shown}{more}")
+    return lines
+
+
+# ====
+# Compare helpers
+# ====
+
+# (field, value in A, value in B)
+FieldChange = Tuple[str, Any, Any]
+
+# CTYINFO fields that matter to users (internal fields like case_map_ptr_raw are skipped)
+_CTYINFO_COMPARE_FIELDS = (
+    "date_format", "date_format_name", "currency_symbol", "thousands_sep",
+    "decimal_sep", "date_sep", "time_sep", "currency_format",
+    "currency_decimals", "time_format", "time_format_name", "data_sep",
+)
+
+
+def ctyinfo_changes(a: Mapping, b: Mapping) -> List[FieldChange]:
+    """
+    Compare two CTYINFO decoded structures field by field.
+
+    Args:
+        a: Decoded CTYINFO from file A
+        b: Decoded CTYINFO from file B
+
+    Returns:
+        (field, value in A, value in B) for each differing field; a field
+        missing from one side has the value "<missing>" there
+    """
+    changes = []
+    for name in _CTYINFO_COMPARE_FIELDS:
+        val_a = a.get(name, "<missing>")
+        val_b = b.get(name, "<missing>")
+        if val_a != val_b:
+            changes.append((name, val_a, val_b))
+    return changes
+
+
+def _format_ctyinfo_changes(changes: List[FieldChange], use_colors: bool) -> List[str]:
+    return [_colorize(f"    {name}: '{val_a}' in A, '{val_b}' in B", AnsiColors.YELLOW, use_colors)
+            for name, val_a, val_b in changes]
+
+
+def compare_ctyinfo(a: Mapping, b: Mapping, use_colors: bool = False) -> List[str]:
+    """
+    Compare two CTYINFO decoded structures and return human-readable differences.
+
+    Args:
+        a: Decoded CTYINFO from file A
+        b: Decoded CTYINFO from file B
+        use_colors: Whether to use ANSI colors in output
+
+    Returns:
+        List of difference strings (empty if identical)
+
+    Note:
+        Compares only decoded fields that matter to users (date/time formats,
+        separators, currency, etc.). Skips internal fields like case_map_ptr_raw.
+        Returns concise diffs like "date_sep: '-' in A, '/' in B".
+    """
+    return _format_ctyinfo_changes(ctyinfo_changes(a, b), use_colors)
+
+
+def compare_table_data(tag_a: Tagged, tag_b: Tagged, sf_id: int, use_colors: bool = False) -> Optional[str]:
+    """
+    Compare two table payloads (UCASE, LCASE, COLLATE, etc.) and return summary.
+
+    Args:
+        tag_a: Tagged structure from file A
+        tag_b: Tagged structure from file B
+        sf_id: Subfunction ID (for naming in output)
+        use_colors: Whether to use ANSI colors in output
+
+    Returns:
+        Summary string if different, None if identical
+
+    Note:
+        Fast check: compare lengths first. If same, diff with diff_bytes().
+        If only 1-2 adjacent lines (8 bytes each) differ, shows the actual
+        byte values in "db" format for easy comparison, with differing bytes
+        highlighted in color.
+    """
+    pa = tag_a.payload
+    pb = tag_b.payload
+    if len(pa) != len(pb):
+        return _format_table_diff(pa, pb, None, sf_id, use_colors)
+    diff = diff_bytes(pa, pb)
+    if not diff:
+        return None
+    return _format_table_diff(pa, pb, diff, sf_id, use_colors)
+
+
+def _format_table_diff(pa: Union[bytes, memoryview], pb: Union[bytes, memoryview],
+                       diff: Optional[ByteDiff], sf_id: int, use_colors: bool) -> str:
+    # diff is None for payloads of different size
+    if diff is None:
+        msg = f"    Table sizes differ: A={len(pa)} bytes, B={len(pb)} bytes"
+        return _colorize(msg, AnsiColors.RED, use_colors)
+    
+    table_name = SUBFUNC_NAMES.get(sf_id, f"sf{sf_id}")
+    diff_count = diff.count
+    
+    # Show the bytes if the differences are in 1-2 adjacent lines (8 bytes per line)
+    rows = diff.rows(8, limit=3)
+    if len(rows) == 1 or (len(rows) == 2 and rows[1] - rows[0] == 1):
+        result = [_colorize(f"  {diff_count} byte(s) differ in {table_name}:", AnsiColors.YELLOW, use_colors)]
+        result.extend(format_db_diff(pa, pb, diff, rows, 8, use_colors))
+        return "\n".join(result)
+    
+    # Default: just show count
+    msg = f"  {diff_count} byte(s) differ in {table_name}"
+    return _colorize(msg, AnsiColors.YELLOW, use_colors)
+
+
+@dataclass
+class BlockDiffPair:
+    """
+    A distinct pair of differing blocks, with the entries that reference it.
+
+    Attributes:
+        sf_id: Subfunction ID the blocks are compared as
+        offset_a: File offset of the block in A (first reference)
+        offset_b: File offset of the block in B (first reference)
+        size_a: Payload size in A
+        size_b: Payload size in B
+        diff: Differing byte spans (None if the sizes differ)
+        entries: (country, codepage) keys of the entries affected, in
+            comparison order
+        collation: Ordering difference of COLLATE tables (sf 6 of equal
+            size only, see diff_collation())
+        payload_a: Payload in A (for rendering)
+        payload_b: Payload in B (for rendering)
+    """
+    sf_id: int
+    offset_a: int
+    offset_b: int
+    size_a: int
+    size_b: int
+    diff: Optional[ByteDiff]
+    entries: List[Tuple[int, int]] = field(default_factory=list)
+    collation: Optional[CollationDiff] = None
+    payload_a: Union[bytes, memoryview] = field(default=b"", repr=False, compare=False)
+    payload_b: Union[bytes, memoryview] = field(default=b"", repr=False, compare=False)
+
+    @property
+    def diff_count(self) -> Optional[int]:
+        """Number of differing bytes (None if the sizes differ)."""
+        return self.diff.count if self.diff is not None else None
+
+    @property
+    def summary(self) -> str:
+        """One-line description of the difference."""
+        if self.diff is None:
+            return f"sizes differ: A={self.size_a} bytes, B={self.size_b} bytes"
+        return f"{self.diff.count} byte(s) differ"
+
+    def render(self, use_colors: bool = False) -> str:
+        """The comparison as compare_table_data() renders it."""
+        return _format_table_diff(self.payload_a, self.payload_b, self.diff, self.sf_id, use_colors)
+
+
+class BlockDiffMemo:
+    """
+    Table comparisons memoized by the content hash pair of the two blocks.
+
+    FreeDOS COUNTRY.SYS files share a handful of tables between many
+    entries, so comparing two builds entry by entry asks about the same
+    pair of payloads over and over. Blocks with equal digests are skipped
+    without looking at the payloads; any other pair is diffed once (COLLATE
+    tables also as orderings) and remembered together with the entries it
+    affects.
+
+    Attributes:
+        comparisons: Table comparisons requested
+        identical: Comparisons skipped because the digests were equal
+        pairs: (sf_id, digest_a, digest_b) -> pair, for differing pairs only
+    """
+
+    def __init__(self) -> None:
+        self.comparisons = 0
+        self.identical = 0
+        self.pairs: Dict[Tuple[int, bytes, bytes], BlockDiffPair] = {}
+        # One diff per digest pair, also when referenced as several subfunctions
+        self._diffs: Dict[Tuple[bytes, bytes], Optional[ByteDiff]] = {}
+        self._collations: Dict[Tuple[bytes, bytes], Optional[CollationDiff]] = {}
+
+    def compare_table(self, sf_id: int, tag_a: Tagged, tag_b: Tagged,
+                      entry: Tuple[int, int]) -> Optional[BlockDiffPair]:
+        """
+        Memoized table comparison (see compare_table_data()).
+
+        Args:
+            sf_id: Subfunction ID the blocks are compared as
+            tag_a: Tagged structure from file A
+            tag_b: Tagged structure from file B
+            entry: (country, codepage) key of the entry being compared
+
+        Returns:
+            The pair, shared by all entries that reference it, or None if
+            the payloads are identical
+        """
+        self.comparisons += 1
+        digest_a = tag_a.digest or payload_digest(tag_a.payload)
+        digest_b = tag_b.digest or payload_digest(tag_b.payload)
+        if digest_a == digest_b:
+            self.identical += 1
+            return None
+        key = (sf_id, digest_a, digest_b)
+        pair = self.pairs.get(key)
+        if pair is None:
+            pa, pb = tag_a.payload, tag_b.payload
+            try:
+                diff = self._diffs[digest_a, digest_b]
+            except KeyError:
+                diff = self._diffs[digest_a, digest_b] = diff_bytes(pa, pb) if len(pa) == len(pb) else None
+            collation = None
+            if sf_id == 6:
+                try:
+                    collation = self._collations[digest_a, digest_b]
+                except KeyError:
+                    collation = self._collations[digest_a, digest_b] = diff_collation(pa, pb)
+            pair = self.pairs[key] = BlockDiffPair(
+                sf_id=sf_id, offset_a=tag_a.offset, offset_b=tag_b.offset,
+                size_a=len(pa), size_b=len(pb), diff=diff, collation=collation,
+                payload_a=pa, payload_b=pb)
+        pair.entries.append(entry)
+        return pair
+
+
+# ====
+# Diff model
+# ====
+
+@dataclass
+class SubfuncDiff:
+    """
+    Differences in one subfunction shared by both entries.
+
+    Attributes:
+        sf_id: Subfunction ID
+        name: Display name ("CTYINFO", table name, "DBCS", "YESNO")
+        kind: "ctyinfo", "table", "dbcs" or "yesno"
+        changes: Field changes (ctyinfo/yesno fields, dbcs "ranges")
+        table: The differing block pair (kind "table" only)
+    """
+    sf_id: int
+    name: str
+    kind: str
+    changes: List[FieldChange] = field(default_factory=list)
+    table: Optional[BlockDiffPair] = None
+
+
+@dataclass
+class EntryDiff:
+    """
+    Differences between the A and B entries for one (country, codepage).
+
+    Attributes:
+        country: Country code
+        codepage: Codepage
+        only_a: Subfunction IDs only in A (sorted)
+        only_b: Subfunction IDs only in B (sorted)
+        subfuncs: Differing shared subfunctions, by ID
+    """
+    country: int
+    codepage: int
+    only_a: List[int]
+    only_b: List[int]
+    subfuncs: List[SubfuncDiff]
+
+
+@dataclass
+class CodepageSetDiff:
+    """
+    A country whose set of codepages differs between A and B.
+
+    Attributes:
+        country: Country code
+        only_a: Codepages only in A (sorted)
+        only_b: Codepages only in B (sorted)
+        shared: Codepages in both (sorted)
+    """
+    country: int
+    only_a: List[int]
+    only_b: List[int]
+    shared: List[int]
+
+
+@dataclass
+class DuplicateKey:
+    """
+    A (country, codepage) listed more than once in one file.
+
+    Attributes:
+        country: Country code
+        codepage: Codepage
+        offset: File offset of the first entry (the one compared)
+        ignored: File offsets of the later entries
+    """
+    country: int
+    codepage: int
+    offset: int
+    ignored: List[int]
+
+
+@dataclass
+class CountrySysDiff:
+    """
+    Structured result of comparing two COUNTRY.SYS files (see diff_country_sys()).
+
+    Attributes:
+        file_a: Filename of A
+        file_b: Filename of B
+        size_a: Size of A in bytes
+        size_b: Size of B in bytes
+        entry_count_a: Entries in A (including entries a parse-time filter skipped)
+        entry_count_b: Entries in B (likewise)
+        filter: Active filters, as "name=value" strings
+        duplicates_a: Repeated keys in A
+        duplicates_b: Repeated keys in B
+        only_a: (country, codepage) keys only in A (sorted)
+        only_b: (country, codepage) keys only in B (sorted)
+        shared: Number of keys in both
+        codepage_sets: Countries whose codepage sets differ, by country
+        entries: Shared entries that differ, by (country, codepage)
+        tables: Distinct differing table pairs, in order of first reference
+        table_comparisons: Table comparisons made (including repeats)
+        warnings_a: Diagnostics of A as warning messages
+        warnings_b: Diagnostics of B as warning messages
+    """
+    file_a: str
+    file_b: str
+    size_a: int
+    size_b: int
+    entry_count_a: int
+    entry_count_b: int
+    filter: List[str]
+    duplicates_a: List[DuplicateKey]
+    duplicates_b: List[DuplicateKey]
+    only_a: List[Tuple[int, int]]
+    only_b: List[Tuple[int, int]]
+    shared: int
+    codepage_sets: List[CodepageSetDiff]
+    entries: List[EntryDiff]
+    tables: List[BlockDiffPair]
+    table_comparisons: int
+    warnings_a: List[str]
+    warnings_b: List[str]
+
+
+def _diff_subfuncs(entry_a: CountryEntry, entry_b: CountryEntry, key: Tuple[int, int],
+                   table_memo: BlockDiffMemo) -> Optional[EntryDiff]:
+    # Build subfunction maps: sf_id -> SubfuncEntry
+    sf_map_a = {s.subfunc_id: s for s in entry_a.subfuncs if s.subfunc_id != 0}
+    sf_map_b = {s.subfunc_id: s for s in entry_b.subfuncs if s.subfunc_id != 0}
+    only_a_sf = sorted(sf_map_a.keys() - sf_map_b.keys())
+    only_b_sf = sorted(sf_map_b.keys() - sf_map_a.keys())
+
+    data_diffs = []
+    for sf_id in sorted(sf_map_a.keys() & sf_map_b.keys()):
+        sf_a = sf_map_a[sf_id]
+        sf_b = sf_map_b[sf_id]
+        
+        # Compare CTYINFO fields
+        if sf_id == 1 and sf_a.decoded and sf_b.decoded:
+            changes = ctyinfo_changes(sf_a.decoded, sf_b.decoded)
+            if changes:
+                data_diffs.append(SubfuncDiff(sf_id, "CTYINFO", "ctyinfo", changes))
+        
+        # Compare table data (UCASE, LCASE, COLLATE, etc.)
+        elif sf_id in (2, 3, 4, 6) and sf_a.tagged and sf_b.tagged:
+            pair = table_memo.compare_table(sf_id, sf_a.tagged, sf_b.tagged, key)
+            if pair is not None:
+                data_diffs.append(SubfuncDiff(sf_id, SUBFUNC_NAMES.get(sf_id, f"sf{sf_id}"), "table",
+                                              table=pair))
+        
+        # Compare DBCS ranges
+        elif sf_id == 7 and sf_a.decoded and sf_b.decoded:
+            ranges_a = sf_a.decoded.get("ranges", [])
+            ranges_b = sf_b.decoded.get("ranges", [])
+            if ranges_a != ranges_b:
+                data_diffs.append(SubfuncDiff(sf_id, "DBCS", "dbcs", [("ranges", ranges_a, ranges_b)]))
+        
+        # Compare YESNO
+        elif sf_id == 35 and sf_a.decoded and sf_b.decoded:
+            changes = [(name, sf_a.decoded.get(name, ""), sf_b.decoded.get(name, ""))
+                       for name in ("yes", "no")]
+            changes = [c for c in changes if c[1] != c[2]]
+            if changes:
+                data_diffs.append(SubfuncDiff(sf_id, "YESNO", "yesno", changes))
+
+    if not (only_a_sf or only_b_sf or data_diffs):
+        return None
+    return EntryDiff(key[0], key[1], only_a_sf, only_b_sf, data_diffs)
+
+
+def diff_country_sys(doc_a: ParsedCountrySys, doc_b: ParsedCountrySys,
+                     file_a: str, file_b: str, country: Optional[int] = None,
+                     codepage: Optional[int] = None) -> CountrySysDiff:
+    """
+    Compare two parsed COUNTRY.SYS files into a structured diff.
+
+    Args:
+        doc_a: Parsed data from file A
+        doc_b: Parsed data from file B
+        file_a: Filename of A (for display)
+        file_b: Filename of B (for display)
+        country: Filter by country code (None = no filter)
+        codepage: Filter by codepage (None = no filter)
+
+    Returns:
+        CountrySysDiff; render it with print_compare_text(),
+        write_compare_json() or write_compare_jsonl()
+
+    Raises:
+        ValidationError: If a lazy strict document fails validation while
+            its subfunctions are decoded
+    """
+    filter_parts = []
+    if country is not None:
+        filter_parts.append(f"country={country}")
+    if codepage is not None:
+        filter_parts.append(f"codepage={codepage}")
+    if doc_a.entry_filter is not None:
+        filter_parts.extend(doc_a.entry_filter.describe())
+
+    # Filtered (country, codepage) -> CountryEntry lookups, served from the
+    # documents' shared indexes; a repeated pair resolves to its first entry
+    map_a = doc_a.entries_for(country, codepage)
+    map_b = doc_b.entries_for(country, codepage)
+    keys_a = map_a.keys()
+    keys_b = map_b.keys()
+    shared = keys_a & keys_b
+
+    # Repeated pairs, which are otherwise silently shadowed
+    def duplicates(doc: ParsedCountrySys, keys: Iterable[Tuple[int, int]]) -> List[DuplicateKey]:
+        return [DuplicateKey(c, cp, doc.by_key[(c, cp)].offset, [e.offset for e in shadowed])
+                for (c, cp), shadowed in sorted(doc.duplicate_keys.items()) if (c, cp) in keys]
+
+    # Group by country: codepage set differences, then the shared entries
+    table_memo = BlockDiffMemo()
+    codepage_sets = []
+    entries = []
+    for c in sorted({c for c, _ in keys_a} | {c for c, _ in keys_b}):
+        cps_a = set(doc_a.codepages_by_country.get(c, ()))
+        cps_b = set(doc_b.codepages_by_country.get(c, ()))
+        if codepage is not None:
+            cps_a &= {codepage}
+            cps_b &= {codepage}
+        if cps_a != cps_b:
+            codepage_sets.append(CodepageSetDiff(c, sorted(cps_a - cps_b), sorted(cps_b - cps_a),
+                                                 sorted(cps_a & cps_b)))
+        for cp in sorted(cps_a & cps_b):
+            key = (c, cp)
+            if key not in shared:
+                continue
+            entry_diff = _diff_subfuncs(map_a[key], map_b[key], key, table_memo)
+            if entry_diff is not None:
+                entries.append(entry_diff)
+
+    return CountrySysDiff(
+        file_a=file_a, file_b=file_b, size_a=doc_a.file_size, size_b=doc_b.file_size,
+        entry_count_a=len(doc_a.entries) + doc_a.filtered_out,
+        entry_count_b=len(doc_b.entries) + doc_b.filtered_out,
+        filter=filter_parts,
+        duplicates_a=duplicates(doc_a, keys_a), duplicates_b=duplicates(doc_b, keys_b),
+        only_a=sorted(keys_a - keys_b), only_b=sorted(keys_b - keys_a), shared=len(shared),
+        codepage_sets=codepage_sets, entries=entries,
+        tables=list(table_memo.pairs.values()), table_comparisons=table_memo.comparisons,
+        warnings_a=doc_a.warnings, warnings_b=doc_b.warnings,
+    )
+
+
+def compare_country_sys(doc_a: ParsedCountrySys, doc_b: ParsedCountrySys, 
+                    file_a: str, file_b: str, country: Optional[int] = None, 
+                    codepage: Optional[int] = None) -> None:
+    """
+    Compare two parsed COUNTRY.SYS files and print hierarchical diff summary.
+
+    Args:
+        doc_a: Parsed data from file A
+        doc_b: Parsed data from file B
+        file_a: Filename of A (for display)
+        file_b: Filename of B (for display)
+        country: Filter by country code (None = no filter)
+        codepage: Filter by codepage (None = no filter)
+
+    Note:
+        Same as print_compare_text(diff_country_sys(...)).
+        Filters can also be applied while parsing (see EntryFilter); they
+        are then shown from doc_a.entry_filter.
+        Compare summarizes by country/codepage key to highlight real divergences fast.
+        Groups by country, shows missing/extra codepages, then dives into subfunction
+        diffs for shared entries. Uses sets for O(1) lookups and clear set operations.
+        Output is hierarchical with bullets for easy scanning. Avoids exhaustive dumps
+        unless they improve understanding (e.g., CTYINFO field diffs are shown, but
+        256-byte COLLATE tables are summarized as "5 bytes differ").
+        Supports ANSI colors when output is to a TTY (not piped).
+    """
+    diff = diff_country_sys(doc_a, doc_b, file_a, file_b, country, codepage)
+    print_compare_text(diff, _use_colors())
+
+
+def _subfunc_diff_lines(sub: SubfuncDiff, use_colors: bool) -> List[str]:
+    if sub.kind == "ctyinfo":
+        return _format_ctyinfo_changes(sub.changes, use_colors)
+    if sub.kind == "dbcs":
+        _, ranges_a, ranges_b = sub.changes[0]
+        return [_colorize(f"  DBCS ranges differ: A={ranges_a}, B={ranges_b}", AnsiColors.YELLOW, use_colors)]
+    if sub.kind == "yesno":
+        return [_colorize(f"  {name}: '{a}' in A, '{b}' in B", AnsiColors.YELLOW, use_colors)
+                for name, a, b in sub.changes]
+    return []
+
+
+def print_compare_text(diff: CountrySysDiff, use_colors: bool = False) -> None:
+    """
+    Print a CountrySysDiff as the hierarchical text report of --compare.
+
+    Args:
+        diff: Result of diff_country_sys()
+        use_colors: Whether to use ANSI colors in output
+    """
+    print(_colorize(f"# Comparing COUNTRY.SYS files", AnsiColors.BOLD + AnsiColors.CYAN, use_colors))
+    # Entry counts cover the whole file, including entries a parse-time filter skipped
+    print(f"# File A: {diff.file_a} ({diff.size_a} bytes, {diff.entry_count_a} entries)")
+    print(f"# File B: {diff.file_b} ({diff.size_b} bytes, {diff.entry_count_b} entries)")
+    
+    # Show filter info if active (both documents are expected to share a parse-time filter)
+    if diff.filter:
+        print(_colorize(f"# Filter: {', '.join(diff.filter)}", AnsiColors.YELLOW, use_colors))
+    
+    print()
+
+    for label, dups, color in (("A", diff.duplicates_a, AnsiColors.RED), ("B", diff.duplicates_b, AnsiColors.GREEN)):
+        if not dups:
+            continue
+        print(_colorize(f"## Duplicate entries in {label} (first occurrence compared):", AnsiColors.BOLD + color, use_colors))
+        for dup in dups:
+            offsets = ", ".join(f"{off:#06x}" for off in dup.ignored)
+            print(f"  - {dup.country}:{dup.codepage} at {dup.offset:#06x}, ignored: {offsets}")
+        print()
+    
+    # Report missing/extra entries
+    for label, keys, color in (("A", diff.only_a, AnsiColors.RED), ("B", diff.only_b, AnsiColors.GREEN)):
+        if not keys:
+            continue
+        print(_colorize(f"## Entries only in {label}:", AnsiColors.BOLD + color, use_colors))
+        for country, codepage in keys:
+            print(f"  - {country}:{codepage} ({_country_name(country)} / {_codepage_name(codepage)})")
+        print()
+    
+    if not diff.shared:
+        print(_colorize("## No shared entries to compare.", AnsiColors.YELLOW, use_colors))
+        return
+    
+    print(_colorize(f"## Comparing {diff.shared} shared entries:", AnsiColors.BOLD + AnsiColors.BLUE, use_colors))
+    print()
+    
+    # Both lists are sorted by country: each country's codepage set
+    # difference comes before its entries
+    rendered_tables: Dict[int, str] = {}
+    sets = iter(diff.codepage_sets)
+    pending = next(sets, None)
+    for entry in itertools.chain(diff.entries, (None,)):
+        while pending is not None and (entry is None or pending.country <= entry.country):
+            print(_colorize(f"### Country {pending.country} ({_country_name(pending.country)}):",
+                            AnsiColors.BOLD + AnsiColors.MAGENTA, use_colors))
+            if pending.only_a:
+                print(_colorize(f"  Codepages only in A: {pending.only_a}", AnsiColors.RED, use_colors))
+            if pending.only_b:
+                print(_colorize(f"  Codepages only in B: {pending.only_b}", AnsiColors.GREEN, use_colors))
+            if pending.shared:
+                print(f"  Shared codepages: {pending.shared}")
+            print()
+            pending = next(sets, None)
+        if entry is None:
+            break
+        
+        entry_header = (f"### [{entry.country}:{entry.codepage}] "
+                        f"{_country_name(entry.country)} / {_codepage_name(entry.codepage)}")
+        print(_colorize(entry_header, AnsiColors.BOLD + AnsiColors.CYAN, use_colors))
+        for label, sf_ids, color in (("A", entry.only_a, AnsiColors.RED), ("B", entry.only_b, AnsiColors.GREEN)):
+            if sf_ids:
+                names = [f"{sf_id} ({SUBFUNC_NAMES.get(sf_id, f'sf{sf_id}')})" for sf_id in sf_ids]
+                print(_colorize(f"  Subfunctions only in {label}: {', '.join(names)}", color, use_colors))
+        
+        for sub in entry.subfuncs:
+            print(_colorize(f"  Subfunction {sub.sf_id} ({sub.name}) differs:", AnsiColors.MAGENTA, use_colors))
+            if sub.table is not None:
+                # Rendered once per distinct pair
+                text = rendered_tables.get(id(sub.table))
+                if text is None:
+                    text = rendered_tables[id(sub.table)] = sub.table.render(use_colors)
+                print(text)
+            else:
+                for line in _subfunc_diff_lines(sub, use_colors):
+                    print(line)
+        
+        print()
+    
+    # Each distinct differing pair of tables once, with the entries it affects
+    if diff.tables:
+        print(_colorize(f"## Distinct table differences ({len(diff.tables)} of {diff.table_comparisons} "
+                        f"table comparisons):", AnsiColors.BOLD + AnsiColors.BLUE, use_colors))
+        for pair in diff.tables:
+            sf_name = SUBFUNC_NAMES.get(pair.sf_id, f"sf{pair.sf_id}")
+            print(f"  - {sf_name}, A@{pair.offset_a:#06x} / B@{pair.offset_b:#06x}: {pair.summary}")
+            entries = ", ".join(f"{c}:{cp}" for c, cp in pair.entries)
+            print(f"    Entries ({len(pair.entries)}): {entries}")
+            if pair.collation is not None:
+                for line in format_collation_diff(pair.collation):
+                    print(f"    {line}")
+        print()
+    
+    # Print warnings if any
+    if diff.warnings_a or diff.warnings_b:
+        print(_colorize("## Warnings:", AnsiColors.BOLD + AnsiColors.YELLOW, use_colors))
+        if diff.warnings_a:
+            print(f"### File A ({diff.file_a}):")
+            for w in diff.warnings_a:
+                print(f"  - {w}")
+        if diff.warnings_b:
+            print(f"### File B ({diff.file_b}):")
+            for w in diff.warnings_b:
+                print(f"  - {w}")
+
+
+def _write_json(write: Callable[[str], Any], value: Any, level: int = 0) -> None:
+    """
+    Write value as json.dumps(value, indent=2) would, streaming iterators.
+
+    Dicts are written key by key and iterators (e.g. generators) as arrays,
+    one element at a time, so a large document never exists as one string.
+    Anything else is serialized with json.dumps() and indented in place.
+    """
+    if isinstance(value, dict) and value:
+        open_, close, items = "{", "}", ((json.dumps(k) + ": ", v) for k, v in value.items())
+    elif isinstance(value, Iterator):
+        open_, close, items = "[", "]", (("", v) for v in value)
+    else:
+        write(json.dumps(value, indent=2).replace("\n", "\n" + "  " * level))
+        return
+    sep = open_ + "\n" + "  " * (level + 1)
+    for prefix, v in items:
+        write(sep + prefix)
+        _write_json(write, v, level + 1)
+        sep = ",\n" + "  " * (level + 1)
+    if sep[0] == open_:
+        write(open_ + close)  # empty iterator
+    else:
+        write("\n" + "  " * level + close)
+
+
+def _key_record(key: Tuple[int, int]) -> Dict[str, int]:
+    return {"country": key[0], "codepage": key[1]}
+
+
+def _compare_records(diff: CountrySysDiff, max_diffs: Optional[int]) -> Dict[str, Any]:
+    """
+    JSON-ready parts of a CountrySysDiff, shared by the JSON and JSONL renderers.
+
+    List-valued parts are iterators capped at max_diffs items; "counts"
+    holds the uncapped totals. Entries that refer to a table beyond the
+    cap are left out (before capping the entries), so every "table" index
+    in the output is present in "tables"; counts["entries_dropped"] says
+    how many.
+    """
+    def capped(items: Iterable[Any]) -> Iterator[Any]:
+        return itertools.islice(items, max_diffs)
+
+    table_index = {id(pair): i for i, pair in enumerate(diff.tables)}
+    tables_kept = len(diff.tables) if max_diffs is None else min(max_diffs, len(diff.tables))
+
+    def refs_kept(e: EntryDiff) -> bool:
+        return all(s.table is None or table_index[id(s.table)] < tables_kept for s in e.subfuncs)
+
+    kept_entries = diff.entries if tables_kept == len(diff.tables) else list(filter(refs_kept, diff.entries))
+
+    def subfunc(sub: SubfuncDiff) -> Dict[str, Any]:
+        rec: Dict[str, Any] = {"id": sub.sf_id, "name": sub.name, "kind": sub.kind,
+                               "changes": [{"field": name, "a": a, "b": b} for name, a, b in sub.changes]}
+        if sub.table is not None:
+            rec["table"] = table_index[id(sub.table)]
+        return rec
+
+    def entry(e: EntryDiff) -> Dict[str, Any]:
+        return {"country": e.country, "codepage": e.codepage,
+                "subfuncs_only_in_a": e.only_a, "subfuncs_only_in_b": e.only_b,
+                "subfuncs": [subfunc(s) for s in e.subfuncs]}
+
+    def table(i: int, pair: BlockDiffPair) -> Dict[str, Any]:
+        spans = pair.diff.spans if pair.diff is not None else ()
+        return {"index": i, "id": pair.sf_id, "name": SUBFUNC_NAMES.get(pair.sf_id, f"sf{pair.sf_id}"),
+                "offset_a": pair.offset_a, "offset_b": pair.offset_b,
+                "size_a": pair.size_a, "size_b": pair.size_b, "diff_count": pair.diff_count,
+                "span_count": len(spans), "spans": [list(s) for s in capped(spans)],
+                "entry_count": len(pair.entries), "entries": [_key_record(k) for k in capped(pair.entries)],
+                "collation": collation(pair.collation) if pair.collation is not None else None}
+
+    def collation(cd: CollationDiff) -> Dict[str, Any]:
+        return {"moved_count": len(cd.moved),
+                "moved": [{"char": ch, "rank_a": ra, "rank_b": rb} for ch, ra, rb in capped(cd.moved)],
+                "ties_created": list(capped(cd.ties_created)), "ties_broken": list(capped(cd.ties_broken)),
+                "tied_pairs_created": cd.tied_pairs_created, "tied_pairs_broken": cd.tied_pairs_broken,
+                "inversions": cd.inversions, "tau_distance": cd.tau_distance}
+
+    def duplicate(d: DuplicateKey) -> Dict[str, Any]:
+        return {"country": d.country, "codepage": d.codepage, "offset": d.offset, "ignored": d.ignored}
+
+    counts = {
+        "only_in_a": len(diff.only_a), "only_in_b": len(diff.only_b),
+        "codepage_sets": len(diff.codepage_sets), "entries": len(diff.entries),
+        "subfunc_diffs": sum(len(e.subfuncs) for e in diff.entries), "tables": len(diff.tables),
+    }
+    longest = max([*counts.values(), *(len(p.entries) for p in diff.tables),
+                   *(len(p.diff.spans) for p in diff.tables if p.diff is not None)])
+    counts["entries_dropped"] = len(diff.entries) - len(kept_entries)
+    counts["max_diffs"] = max_diffs
+    counts["truncated"] = max_diffs is not None and longest > max_diffs
+
+    return {
+        "file_a": {"path": diff.file_a, "file_size": diff.size_a, "entries": diff.entry_count_a},
+        "file_b": {"path": diff.file_b, "file_size": diff.size_b, "entries": diff.entry_count_b},
+        "filter": diff.filter,
+        "duplicates_a": map(duplicate, diff.duplicates_a),
+        "duplicates_b": map(duplicate, diff.duplicates_b),
+        "only_in_a": map(_key_record, capped(diff.only_a)),
+        "only_in_b": map(_key_record, capped(diff.only_b)),
+        "shared": diff.shared,
+        "codepage_sets": ({"country": s.country, "only_in_a": s.only_a, "only_in_b": s.only_b,
+                           "shared": s.shared} for s in capped(diff.codepage_sets)),
+        "entries": map(entry, capped(kept_entries)),
+        "tables": itertools.starmap(table, capped(enumerate(diff.tables))),
+        "table_comparisons": diff.table_comparisons,
+        "counts": counts,
+        "warnings_a": diff.warnings_a,
+        "warnings_b": diff.warnings_b,
+    }
+
+
+def write_compare_json(diff: CountrySysDiff, write: Callable[[str], Any],
+                       max_diffs: Optional[int] = None) -> None:
+    """
+    Write a CountrySysDiff as one JSON document (2-space indent), streamed.
+
+    Args:
+        diff: Result of diff_country_sys()
+        write: Output function, e.g. sys.stdout.write
+        max_diffs: Emit at most this many items per list (None = all); the
+            full totals are in "counts"
+
+    Note:
+        Entries refer to their table difference by its index in "tables".
+        With max_diffs, entries whose table difference was cut from
+        "tables" are left out rather than pointing at a missing index;
+        counts["entries_dropped"] is their number.
+    """
+    _write_json(write, _compare_records(diff, max_diffs))
+    write("\n")
+
+
+def write_compare_jsonl(diff: CountrySysDiff, write: Callable[[str], Any],
+                        max_diffs: Optional[int] = None) -> None:
+    """
+    Write a CountrySysDiff as JSON Lines, one record per line.
+
+    Args:
+        diff: Result of diff_country_sys()
+        write: Output function, e.g. sys.stdout.write
+        max_diffs: Emit at most this many records per kind (None = all);
+            the full totals are in the final "summary" record
+
+    Note:
+        Records are tagged with "type": header, duplicate, only_in,
+        codepage_set, entry, table, warning and summary (always last).
+        As in write_compare_json(), entry records whose table difference
+        is beyond max_diffs are left out (counted in "entries_dropped"),
+        so every "table" index refers to an emitted table record.
+    """
+    rec = _compare_records(diff, max_diffs)
+
+    def emit(kind: str, body: Dict[str, Any], **extra: Any) -> None:
+        write(json.dumps({"type": kind, **extra, **body}) + "\n")
+
+    emit("header", {"file_a": rec["file_a"], "file_b": rec["file_b"], "filter": rec["filter"],
+                    "shared": rec["shared"]})
+    for side in ("a", "b"):
+        for d in rec["duplicates_" + side]:
+            emit("duplicate", d, file=side)
+    for side in ("a", "b"):
+        for k in rec["only_in_" + side]:
+            emit("only_in", k, file=side)
+    for kind, name in (("codepage_set", "codepage_sets"), ("entry", "entries"), ("table", "tables")):
+        for r in rec[name]:
+            emit(kind, r)
+    for side in ("a", "b"):
+        for w in rec["warnings_" + side]:
+            emit("warning", {"message": w}, file=side)
+    emit("summary", {"table_comparisons": rec["table_comparisons"], **rec["counts"]})
+
+
+# ====
+# N-way comparison
+# ====
+
+MatrixKey = Tuple[int, int, int]  # (country, codepage, subfunction ID)
+
+
+@dataclass(frozen=True)
+class FileFingerprint:
+    """
+    Block content hashes of one COUNTRY.SYS file, as used by compare_many().
+
+    Attributes:
+        path: Path of the file
+        file_size: Size of the file in bytes
+        entry_count: Entries in the file (including entries a filter skipped)
+        cells: (country, codepage, subfunction ID) -> payload digest of the
+            tagged block it points at; first entry wins for a repeated
+            (country, codepage), last subfunction for a repeated ID, like
+            compare_country_sys()
+        diagnostics: Number of distinct diagnostics reported while parsing
+        partial: True if a parse budget ran out
+    """
+    path: str
+    file_size: int
+    entry_count: int
+    cells: Dict[MatrixKey, bytes]
+    diagnostics: int
+    partial: bool
+
+
+def fingerprint_country_sys(doc: ParsedCountrySys, path: str) -> FileFingerprint:
+    """
+    Reduce a parsed file to its key -> block digest map.
+
+    Args:
+        doc: Parsed COUNTRY.SYS data
+        path: Path of the file (for display)
 
-    # Extract copyright (everything after the 0x00)
-    copyright_bytes = buf[zero_pos + 1:]
-    copyright_str = copyright_bytes.decode("ascii", "replace").rstrip("\x00 \r\n")
+    Returns:
+        FileFingerprint (plain data, cheap to send between processes)
+    """
+    cells: Dict[MatrixKey, bytes] = {}
+    for (country, codepage), e in doc.by_key.items():
+        for s in e.subfuncs:
+            if s.subfunc_id != 0 and s.tagged is not None:
+                cells[(country, codepage, s.subfunc_id)] = s.tagged.digest
+    return FileFingerprint(path=path, file_size=doc.file_size,
+                           entry_count=len(doc.entries) + doc.filtered_out,
+                           cells=cells, diagnostics=len(doc.diagnostics), partial=doc.partial)
 
-    result: Dict[str, Any] = {"copyright": copyright_str}
 
-    # Check if the tagged structure is VERSION
-    magic_raw = buf[tagged_start + 1: tagged_start + 8]
-    magic = magic_raw.rstrip(b" \x00").decode("ascii", "replace")
-    size = struct.unpack_from("<H", buf, tagged_start + 8)[0]
+def _fingerprint_file(path: str, args: argparse.Namespace) -> FileFingerprint:
+    # Process pool worker: parse one file with the CLI options. Errors name
+    # the file, since any of the N inputs may have raised them.
+    try:
+        with contextlib.ExitStack() as stack:
+            doc = _load_country_sys(stack, path, args)
+            return fingerprint_country_sys(doc, path)
+    except ValidationError as e:
+        raise ValidationError(f"{path}: {e}") from None
+    except OSError as e:
+        if e.filename is None:
+            raise OSError(e.errno, f"{path}: {e.strerror or e}") from None
+        raise
 
-    if magic == "VERSION" and size == 4:
-        # Parse version: <major>\x00<minor>\x00
-        payload_start = tagged_start + 10
-        if payload_start + 4 <= flen:
-            major = buf[payload_start:payload_start+2].decode("ascii", "replace").rstrip("\x00")
-            minor = buf[payload_start+2:payload_start+4].decode("ascii", "replace").rstrip("\x00")
-            result["version"] = major + "." + minor
 
-    return result
+@dataclass(frozen=True)
+class CompareMatrix:
+    """
+    Key x file matrix of block digests, reduced to the keys that diverge.
 
+    Attributes:
+        files: Fingerprints of the compared files, in command-line order
+        key_count: Distinct keys present in at least one file
+        divergent: (key, classes) for every key whose digests differ, sorted
+            by key. classes is a list of (digest, file indexes) equivalence
+            classes in order of first file; digest None means the key is
+            absent from those files.
+    """
+    files: List[FileFingerprint]
+    key_count: int
+    divergent: List[Tuple[MatrixKey, List[Tuple[Optional[bytes], List[int]]]]]
 
-# ====
-# Compare helpers
-# ====
 
-def compare_ctyinfo(a: Dict[str, Any], b: Dict[str, Any], use_colors: bool = False) -> List[str]:
+def build_compare_matrix(files: List[FileFingerprint]) -> CompareMatrix:
     """
-    Compare two CTYINFO decoded structures and return human-readable differences.
+    Find the keys whose blocks differ between files and group the files.
 
     Args:
-        a: Decoded CTYINFO from file A
-        b: Decoded CTYINFO from file B
-        use_colors: Whether to use ANSI colors in output
+        files: Fingerprints to compare
 
     Returns:
-        List of difference strings (empty if identical)
+        CompareMatrix
 
     Note:
-        Compares only decoded fields that matter to users (date/time formats,
-        separators, currency, etc.). Skips internal fields like case_map_ptr_raw.
-        Returns concise diffs like "date_sep: '-' in A, '/' in B".
+        One pass over the union of keys; each key costs one dict lookup per
+        file, so N files take O(N * keys) instead of N^2 pairwise compares.
     """
-    diffs = []
-    # Fields to compare (skip internal/debug fields)
-    compare_fields = [
-        "date_format", "date_format_name", "currency_symbol", "thousands_sep",
-        "decimal_sep", "date_sep", "time_sep", "currency_format",
-        "currency_decimals", "time_format", "time_format_name", "data_sep",
-    ]
-    for field in compare_fields:
-        val_a = a.get(field, "<missing>")
-        val_b = b.get(field, "<missing>")
-        if val_a != val_b:
-            diff_line = f"    {field}: '{val_a}' in A, '{val_b}' in B"
-            diffs.append(_colorize(diff_line, AnsiColors.YELLOW, use_colors))
-    return diffs
+    keys = set()
+    for f in files:
+        keys.update(f.cells)
+    columns = [f.cells for f in files]
+    divergent = []
+    for key in sorted(keys):
+        row = [cells.get(key) for cells in columns]
+        first = row[0]
+        if all(v == first for v in row):
+            continue
+        classes: Dict[Optional[bytes], List[int]] = {}
+        for i, v in enumerate(row):
+            classes.setdefault(v, []).append(i)
+        divergent.append((key, list(classes.items())))
+    return CompareMatrix(files=files, key_count=len(keys), divergent=divergent)
 
 
-def compare_table_data(tag_a: Tagged, tag_b: Tagged, sf_id: int, use_colors: bool = False) -> Optional[str]:
+def compare_many(paths: Sequence[str], args: argparse.Namespace,
+                 max_workers: Optional[int] = None) -> CompareMatrix:
     """
-    Compare two table payloads (UCASE, LCASE, COLLATE, etc.) and return summary.
+    Parse several COUNTRY.SYS files in a process pool and build their matrix.
 
     Args:
-        tag_a: Tagged structure from file A
-        tag_b: Tagged structure from file B
-        sf_id: Subfunction ID (for naming in output)
-        use_colors: Whether to use ANSI colors in output
+        paths: Files to compare
+        args: Parsed command-line arguments (parse options for every file)
+        max_workers: Pool size (None = one per CPU, at most one per file)
 
     Returns:
-        Summary string if different, None if identical
+        CompareMatrix
 
-    Note:
-        Fast check: compare lengths first. If same, count differing bytes.
-        If only 1-2 adjacent lines (8 bytes each) differ, shows the actual
-        byte values in "db" format for easy comparison, with differing bytes
-        highlighted in color.
+    Raises:
+        OSError: If a file cannot be read
+        ValidationError: If a file is invalid (the message starts with its path)
     """
-    pa = tag_a.payload
-    pb = tag_b.payload
-    
-    if len(pa) != len(pb):
-        msg = f"    Table sizes differ: A={len(pa)} bytes, B={len(pb)} bytes"
-        return _colorize(msg, AnsiColors.RED, use_colors)
-    
-    # Find differing byte positions
-    diff_positions = [i for i in range(len(pa)) if pa[i] != pb[i]]
-    if not diff_positions:
-        return None
-    
-    table_name = SUBFUNC_NAMES.get(sf_id, f"sf{sf_id}")
-    diff_count = len(diff_positions)
-    
-    # Check if differences are in 1-2 adjacent lines (8 bytes per line)
-    # Group diff positions by line number
-    diff_lines = set(pos // 8 for pos in diff_positions)
-    
-    # Check if lines are adjacent (max 2 lines, consecutive)
-    if len(diff_lines) <= 2:
-        sorted_lines = sorted(diff_lines)
-        if len(sorted_lines) == 1 or (len(sorted_lines) == 2 and sorted_lines[1] - sorted_lines[0] == 1):
-            # Show detailed byte comparison for these lines
-            result = [_colorize(f"  {diff_count} byte(s) differ in {table_name}:", AnsiColors.YELLOW, use_colors)]
-            for line_num in sorted_lines:
-                start = line_num * 8
-                end = min(start + 8, len(pa))
-                row_a = pa[start:end]
-                row_b = pb[start:end]
-                
-                # Format as "db" lines with color highlighting for differing bytes
-                formatted_a_parts = []
-                formatted_b_parts = []
-                for i, (byte_a, byte_b) in enumerate(zip(row_a, row_b)):
-                    pos = start + i
-                    if pos in diff_positions:
-                        # Highlight differing bytes
-                        formatted_a_parts.append(_colorize(f"{byte_a:3d}", AnsiColors.RED, use_colors))
-                        formatted_b_parts.append(_colorize(f"{byte_b:3d}", AnsiColors.GREEN, use_colors))
-                    else:
-                        formatted_a_parts.append(f"{byte_a:3d}")
-                        formatted_b_parts.append(f"{byte_b:3d}")
-                
-                formatted_a = " ".join(formatted_a_parts)
-                formatted_b = " ".join(formatted_b_parts)
-                
-                result.append(_colorize(f"    Line {line_num} (bytes {start}-{end-1}):", AnsiColors.CYAN, use_colors))
-                result.append(f"      A: db {formatted_a}")
-                result.append(f"      B: db {formatted_b}")
-            
-            return "\n".join(result)
-    
-    # Default: just show count
-    msg = f"  {diff_count} byte(s) differ in {table_name}"
-    return _colorize(msg, AnsiColors.YELLOW, use_colors)
+    workers = max_workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1:
+        files = [_fingerprint_file(p, args) for p in paths]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            files = list(pool.map(_fingerprint_file, paths, itertools.repeat(args)))
+    return build_compare_matrix(files)
 
 
-def compare_country_sys(doc_a: ParsedCountrySys, doc_b: ParsedCountrySys, 
-                    file_a: str, file_b: str, country: Optional[int] = None, 
-                    codepage: Optional[int] = None) -> None:
+def print_compare_matrix(matrix: CompareMatrix) -> None:
     """
-    Compare two parsed COUNTRY.SYS files and print hierarchical diff summary.
+    Print the divergent keys of a CompareMatrix with their equivalence classes.
 
     Args:
-        doc_a: Parsed data from file A
-        doc_b: Parsed data from file B
-        file_a: Filename of A (for display)
-        file_b: Filename of B (for display)
-        country: Filter by country code (None = no filter)
-        codepage: Filter by codepage (None = no filter)
+        matrix: Result of build_compare_matrix()
 
     Note:
-        Compare summarizes by country/codepage key to highlight real divergences fast.
-        Groups by country, shows missing/extra codepages, then dives into subfunction
-        diffs for shared entries. Uses sets for O(1) lookups and clear set operations.
-        Output is hierarchical with bullets for easy scanning. Avoids exhaustive dumps
-        unless they improve understanding (e.g., CTYINFO field diffs are shown, but
-        256-byte COLLATE tables are summarized as "5 bytes differ").
-        Supports ANSI colors when output is to a TTY (not piped).
+        Classes are numbered per key in order of first file and labelled with
+        the first 8 hex digits of their block digest.
     """
     use_colors = _use_colors()
-    
-    print(_colorize(f"# Comparing COUNTRY.SYS files", AnsiColors.BOLD + AnsiColors.CYAN, use_colors))
-    print(f"# File A: {file_a} ({doc_a.file_size} bytes, {len(doc_a.entries)} entries)")
-    print(f"# File B: {file_b} ({doc_b.file_size} bytes, {len(doc_b.entries)} entries)")
-    
-    # Show filter info if active
-    if country is not None or codepage is not None:
-        filter_parts = []
-        if country is not None:
-            filter_parts.append(f"country={country}")
-        if codepage is not None:
-            filter_parts.append(f"codepage={codepage}")
-        print(_colorize(f"# Filter: {', '.join(filter_parts)}", AnsiColors.YELLOW, use_colors))
-    
+    files = matrix.files
+
+    print(_colorize(f"# Comparing {len(files)} COUNTRY.SYS files", AnsiColors.BOLD + AnsiColors.CYAN, use_colors))
+    for i, f in enumerate(files):
+        notes = f", {f.diagnostics} diagnostics" if f.diagnostics else ""
+        if f.partial:
+            notes += ", partial"
+        print(f"# [{i}] {f.path} ({f.file_size} bytes, {f.entry_count} entries{notes})")
     print()
 
-    # Apply filters to entries
-    entries_a = filter_entries(doc_a.entries, country, codepage)
-    entries_b = filter_entries(doc_b.entries, country, codepage)
-    
-    # Build lookup dicts: (country, codepage) -> CountryEntry
-    # O(1) lookups for fast comparison
-    map_a: Dict[Tuple[int, int], CountryEntry] = {(e.country, e.codepage): e for e in entries_a}
-    map_b: Dict[Tuple[int, int], CountryEntry] = {(e.country, e.codepage): e for e in entries_b}
-    
-    keys_a = set(map_a.keys())
-    keys_b = set(map_b.keys())
-    
-    only_a = keys_a - keys_b
-    only_b = keys_b - keys_a
-    shared = keys_a & keys_b
-    
-    # Report missing/extra entries
-    if only_a:
-        print(_colorize("## Entries only in A:", AnsiColors.BOLD + AnsiColors.RED, use_colors))
-        for country, codepage in sorted(only_a):
-            cname = _country_name(country)
-            cpname = _codepage_name(codepage)
-            print(f"  - {country}:{codepage} ({cname} / {cpname})")
-        print()
-    
-    if only_b:
-        print(_colorize("## Entries only in B:", AnsiColors.BOLD + AnsiColors.GREEN, use_colors))
-        for country, codepage in sorted(only_b):
-            cname = _country_name(country)
-            cpname = _codepage_name(codepage)
-            print(f"  - {country}:{codepage} ({cname} / {cpname})")
-        print()
-    
-    if not shared:
-        print(_colorize("## No shared entries to compare.", AnsiColors.YELLOW, use_colors))
+    if not matrix.divergent:
+        print(_colorize(f"## All {matrix.key_count} (country, codepage, subfunction) keys agree.",
+                        AnsiColors.GREEN, use_colors))
         return
-    
-    # Compare shared entries
-    print(_colorize(f"## Comparing {len(shared)} shared entries:", AnsiColors.BOLD + AnsiColors.BLUE, use_colors))
+
+    print(_colorize(f"## {len(matrix.divergent)} of {matrix.key_count} (country, codepage, subfunction) keys diverge:",
+                    AnsiColors.BOLD + AnsiColors.BLUE, use_colors))
     print()
-    
-    # Group by country for hierarchical output
-    # Aggregate codepages per country to show "Country X: A has [cp1,cp2], B has [cp1,cp2,cp3]"
-    countries_a: Dict[int, Set[int]] = {}
-    countries_b: Dict[int, Set[int]] = {}
-    for country, codepage in keys_a:
-        countries_a.setdefault(country, set()).add(codepage)
-    for country, codepage in keys_b:
-        countries_b.setdefault(country, set()).add(codepage)
-    
-    all_countries = sorted(set(countries_a.keys()) | set(countries_b.keys()))
-    
-    for country in all_countries:
-        cname = _country_name(country)
-        cps_a = countries_a.get(country, set())
-        cps_b = countries_b.get(country, set())
-        
-        # Check if codepage sets differ for this country
-        if cps_a != cps_b:
-            only_a_cps = cps_a - cps_b
-            only_b_cps = cps_b - cps_a
-            shared_cps = cps_a & cps_b
-            
-            print(_colorize(f"### Country {country} ({cname}):", AnsiColors.BOLD + AnsiColors.MAGENTA, use_colors))
-            if only_a_cps:
-                print(_colorize(f"  Codepages only in A: {sorted(only_a_cps)}", AnsiColors.RED, use_colors))
-            if only_b_cps:
-                print(_colorize(f"  Codepages only in B: {sorted(only_b_cps)}", AnsiColors.GREEN, use_colors))
-            if shared_cps:
-                print(f"  Shared codepages: {sorted(shared_cps)}")
-            print()
-        
-        # Compare subfunctions for shared (country, codepage) pairs
-        for codepage in sorted(cps_a & cps_b):
-            key = (country, codepage)
-            if key not in shared:
-                continue
-            
-            entry_a = map_a[key]
-            entry_b = map_b[key]
-            
-            # Build subfunction maps: sf_id -> SubfuncEntry
-            sf_map_a = {s.subfunc_id: s for s in entry_a.subfuncs if s.subfunc_id != 0}
-            sf_map_b = {s.subfunc_id: s for s in entry_b.subfuncs if s.subfunc_id != 0}
-            
-            sf_ids_a = set(sf_map_a.keys())
-            sf_ids_b = set(sf_map_b.keys())
-            
-            only_a_sf = sf_ids_a - sf_ids_b
-            only_b_sf = sf_ids_b - sf_ids_a
-            shared_sf = sf_ids_a & sf_ids_b
-            
-            # Check if there are any differences for this entry
-            has_diffs = bool(only_a_sf or only_b_sf)
-            
-            # Check for data diffs in shared subfunctions
-            data_diffs = []
-            for sf_id in sorted(shared_sf):
-                sf_a = sf_map_a[sf_id]
-                sf_b = sf_map_b[sf_id]
-                
-                # Compare CTYINFO fields
-                if sf_id == 1 and sf_a.decoded and sf_b.decoded:
-                    cty_diffs = compare_ctyinfo(sf_a.decoded, sf_b.decoded, use_colors)
-                    if cty_diffs:
-                        data_diffs.append((sf_id, "CTYINFO", cty_diffs))
-                
-                # Compare table data (UCASE, LCASE, COLLATE, etc.)
-                elif sf_id in (2, 3, 4, 6) and sf_a.tagged and sf_b.tagged:
-                    table_diff = compare_table_data(sf_a.tagged, sf_b.tagged, sf_id, use_colors)
-                    if table_diff:
-                        data_diffs.append((sf_id, SUBFUNC_NAMES.get(sf_id, f"sf{sf_id}"), [table_diff]))
-                
-                # Compare DBCS ranges
-                elif sf_id == 7 and sf_a.decoded and sf_b.decoded:
-                    ranges_a = sf_a.decoded.get("ranges", [])
-                    ranges_b = sf_b.decoded.get("ranges", [])
-                    if ranges_a != ranges_b:
-                        diff_line = f"  DBCS ranges differ: A={ranges_a}, B={ranges_b}"
-                        data_diffs.append((sf_id, "DBCS", [_colorize(diff_line, AnsiColors.YELLOW, use_colors)]))
-                
-                # Compare YESNO
-                elif sf_id == 35 and sf_a.decoded and sf_b.decoded:
-                    yes_a = sf_a.decoded.get("yes", "")
-                    yes_b = sf_b.decoded.get("yes", "")
-                    no_a = sf_a.decoded.get("no", "")
-                    no_b = sf_b.decoded.get("no", "")
-                    yesno_diffs = []
-                    if yes_a != yes_b:
-                        diff_line = f"  yes: '{yes_a}' in A, '{yes_b}' in B"
-                        yesno_diffs.append(_colorize(diff_line, AnsiColors.YELLOW, use_colors))
-                    if no_a != no_b:
-                        diff_line = f"  no: '{no_a}' in A, '{no_b}' in B"
-                        yesno_diffs.append(_colorize(diff_line, AnsiColors.YELLOW, use_colors))
-                    if yesno_diffs:
-                        data_diffs.append((sf_id, "YESNO", yesno_diffs))
-            
-            if data_diffs:
-                has_diffs = True
-            
-            # Only print entry header if there are differences
-            if not has_diffs:
-                continue
-            
-            cpname = _codepage_name(codepage)
-            entry_header = f"### [{country}:{codepage}] {cname} / {cpname}"
-            print(_colorize(entry_header, AnsiColors.BOLD + AnsiColors.CYAN, use_colors))
-            
-            if only_a_sf:
-                sf_names_a = [f"{sf_id} ({SUBFUNC_NAMES.get(sf_id, f'sf{sf_id}')})" for sf_id in sorted(only_a_sf)]
-                msg = f"  Subfunctions only in A: {', '.join(sf_names_a)}"
-                print(_colorize(msg, AnsiColors.RED, use_colors))
-            if only_b_sf:
-                sf_names_b = [f"{sf_id} ({SUBFUNC_NAMES.get(sf_id, f'sf{sf_id}')})" for sf_id in sorted(only_b_sf)]
-                msg = f"  Subfunctions only in B: {', '.join(sf_names_b)}"
-                print(_colorize(msg, AnsiColors.GREEN, use_colors))
-            
-            # Print data diffs
-            for sf_id, sf_name, diffs in data_diffs:
-                diff_header = f"  Subfunction {sf_id} ({sf_name}) differs:"
-                print(_colorize(diff_header, AnsiColors.MAGENTA, use_colors))
-                for diff in diffs:
-                    print(diff)
-            
-            print()
-    
-    # Print warnings if any
-    if doc_a.warnings or doc_b.warnings:
-        print(_colorize("## Warnings:", AnsiColors.BOLD + AnsiColors.YELLOW, use_colors))
-        if doc_a.warnings:
-            print(f"### File A ({file_a}):")
-            for w in doc_a.warnings:
-                print(f"  - {w}")
-        if doc_b.warnings:
-            print(f"### File B ({file_b}):")
-            for w in doc_b.warnings:
-                print(f"  - {w}")
+    for (country, codepage, sf_id), classes in matrix.divergent:
+        sf_name = SUBFUNC_NAMES.get(sf_id, f"sf{sf_id}")
+        header = f"### [{country}:{codepage}] subfunction {sf_id} ({sf_name})"
+        print(_colorize(header, AnsiColors.BOLD + AnsiColors.CYAN, use_colors))
+        n = 0
+        for digest, members in classes:
+            names = ", ".join(f"[{i}] {files[i].path}" for i in members)
+            if digest is None:
+                print(_colorize(f"  - absent: {names}", AnsiColors.RED, use_colors))
+            else:
+                n += 1
+                print(f"  - class {n} ({digest.hex()[:8]}): {names}")
+        print()
+
+
+def _matrix_records(matrix: CompareMatrix) -> Dict[str, Any]:
+    """JSON-ready parts of a CompareMatrix, shared by the JSON and JSONL renderers."""
+    def file(i: int, f: FileFingerprint) -> Dict[str, Any]:
+        return {"index": i, "path": f.path, "file_size": f.file_size, "entries": f.entry_count,
+                "diagnostics": f.diagnostics, "partial": f.partial}
+
+    def key(item: Tuple[MatrixKey, List[Tuple[Optional[bytes], List[int]]]]) -> Dict[str, Any]:
+        (country, codepage, sf_id), classes = item
+        return {"country": country, "codepage": codepage, "id": sf_id,
+                "name": SUBFUNC_NAMES.get(sf_id, f"sf{sf_id}"),
+                "classes": [{"digest": digest.hex() if digest is not None else None, "files": members}
+                            for digest, members in classes]}
+
+    return {
+        "files": itertools.starmap(file, enumerate(matrix.files)),
+        "key_count": matrix.key_count,
+        "divergent_count": len(matrix.divergent),
+        "divergent": map(key, matrix.divergent),
+    }
+
+
+def write_compare_matrix_json(matrix: CompareMatrix, write: Callable[[str], Any]) -> None:
+    """
+    Write a CompareMatrix as one JSON document (2-space indent), streamed.
+
+    Args:
+        matrix: Result of build_compare_matrix()
+        write: Output function, e.g. sys.stdout.write
+
+    Note:
+        Each divergent key lists its classes in order of first file; a
+        class with digest null is the files the key is absent from.
+    """
+    _write_json(write, _matrix_records(matrix))
+    write("\n")
+
+
+def write_compare_matrix_jsonl(matrix: CompareMatrix, write: Callable[[str], Any]) -> None:
+    """
+    Write a CompareMatrix as JSON Lines: one "file" record per input, one
+    "key" record per divergent key, then a "summary" record.
+    """
+    rec = _matrix_records(matrix)
+
+    def emit(kind: str, body: Dict[str, Any]) -> None:
+        write(json.dumps({"type": kind, **body}) + "\n")
+
+    for f in rec["files"]:
+        emit("file", f)
+    for k in rec["divergent"]:
+        emit("key", k)
+    emit("summary", {"key_count": rec["key_count"], "divergent_count": rec["divergent_count"]})
 
 
 # ====
 # Output
 # ====
 
-def to_jsonable(doc: ParsedCountrySys) -> Dict[str, Any]:
+# Choices of --payload-encoding (see PayloadEncoder)
+PAYLOAD_ENCODINGS = ("hex", "base64", "none", "ref")
+
+
+class PayloadEncoder:
+    """
+    Encodes tagged block payloads for JSON output.
+
+    Modes:
+        hex: payload_hex/magic_raw_hex inline, as "0x01 0x02 ..." (default)
+        base64: payload_base64/magic_raw_base64 inline
+        none: no payload bytes at all (magic_raw_hex stays)
+        ref: magic_raw_hex inline, payload_ref = content hash of the
+            payload; each distinct payload is stored once in blocks
+
+    Note:
+        Only the raw payload bytes change between modes; the decoded fields
+        (character tables, DBCS ranges, ...) and the document structure are
+        written in full regardless, and usually dominate the output. Even
+        none shrinks a typical dump by well under half.
+
+    Attributes:
+        mode: One of PAYLOAD_ENCODINGS
+        blocks: ref mode: content hash (hex) -> {"size", "offsets",
+            "payload_base64"}, in order of first reference
+    """
+    __slots__ = ("mode", "blocks", "_new")
+
+    def __init__(self, mode: str = "hex") -> None:
+        if mode not in PAYLOAD_ENCODINGS:
+            raise ValueError(f"Unknown payload encoding: {mode!r}")
+        self.mode = mode
+        self.blocks: Dict[str, Dict[str, Any]] = {}
+        self._new: List[str] = []
+
+    def tagged_record(self, t: Tagged) -> Dict[str, Any]:
+        """JSON-ready "tagged" record of a subfunction, payload in this mode."""
+        rec: Dict[str, Any] = {"offset": t.offset, "tag": t.tag, "magic": t.magic}
+        if self.mode == "base64":
+            rec["magic_raw_base64"] = base64.b64encode(t.magic_raw).decode("ascii")
+        else:
+            rec["magic_raw_hex"] = _hex(t.magic_raw)
+        rec["size"] = t.size
+        rec.update(self._payload_fields(t))
+        rec["dbcs_dummy_word"] = t.dbcs_dummy_word
+        return rec
+
+    def _payload_fields(self, t: Tagged) -> Dict[str, Any]:
+        mode = self.mode
+        if mode == "hex":
+            return {"payload_hex": _hex(t.payload)}
+        if mode == "base64":
+            return {"payload_base64": base64.b64encode(t.payload).decode("ascii")}
+        if mode == "none":
+            return {}
+        key = (t.digest or payload_digest(t.payload)).hex()
+        block = self.blocks.get(key)
+        if block is None:
+            block = self.blocks[key] = {"size": len(t.payload), "offsets": [],
+                                        "payload_base64": base64.b64encode(t.payload).decode("ascii")}
+            self._new.append(key)
+        if t.offset not in block["offsets"]:
+            block["offsets"].append(t.offset)
+        return {"payload_ref": key}
+
+    def take_new_blocks(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """ref mode: (key, block) of the blocks first referenced since the last call."""
+        new = [(key, self.blocks[key]) for key in self._new]
+        self._new.clear()
+        return new
+
+
+def _ptr_jsonable(p: FarPtr) -> Dict[str, Any]:
+    return {"raw_u32": p.raw_u32, "seg": p.seg, "off": p.off, "linear": p.linear}
+
+
+def _subfunc_jsonable(s: SubfuncEntry, payloads: PayloadEncoder) -> Dict[str, Any]:
+    """JSON-ready record of one subfunction entry, payload encoded by payloads."""
+    sj = {
+        "offset": s.offset, "entry_len": s.entry_len, "id": s.subfunc_id,
+        "data_ptr": _ptr_jsonable(s.data_ptr), "tagged": None,
+        "decoded": dict(s.decoded) if s.decoded is not None else None,
+    }
+    if s.tagged:
+        sj["tagged"] = payloads.tagged_record(s.tagged)
+    return sj
+
+
+def _entry_jsonable(e: CountryEntry, payloads: PayloadEncoder) -> Dict[str, Any]:
+    """JSON-ready record of one country/codepage entry and its subfunctions."""
+    return {
+        "offset": e.offset, "header_len": e.header_len, "country": e.country,
+        "codepage": e.codepage, "subfunc_header_ptr": _ptr_jsonable(e.subfunc_header_ptr),
+        "subfuncs": [_subfunc_jsonable(s, payloads) for s in e.subfuncs],
+    }
+
+
+def _header_jsonable(doc: ParsedCountrySys) -> Dict[str, Any]:
+    return {
+        "file_size": doc.file_size, "entry_table_count": doc.entry_table_count,
+        "pointer_info_type": doc.pointer_info_type,
+        "entry_table_ptrs": [_ptr_jsonable(p) for p in doc.entry_table_ptrs],
+    }
+
+
+def _orphan_jsonable(b: CensusBlock) -> Dict[str, Any]:
+    return {"offset": b.offset, "tag": b.tag, "magic": b.magic, "size": b.size}
+
+
+def _tail_jsonable(doc: ParsedCountrySys, payloads: PayloadEncoder) -> Dict[str, Any]:
+    """Fields after "entries"; built once the entries are converted."""
+    tail: Dict[str, Any] = {}
+    if payloads.mode == "ref":
+        tail["blocks"] = payloads.blocks
+    tail.update({
+        "warnings": doc.warnings, "diagnostics": doc.diagnostics.to_jsonable(), "partial": doc.partial,
+        "orphan_blocks": map(_orphan_jsonable, doc.orphan_blocks),
+    })
+    return tail
+
+
+def to_jsonable(doc: ParsedCountrySys, payload_encoding: str = "hex") -> Dict[str, Any]:
     """
     Convert ParsedCountrySys to JSON-serializable dictionary.
 
     Args:
         doc: Parsed COUNTRY.SYS data
+        payload_encoding: How tagged payloads are written, see PayloadEncoder
 
     Returns:
         Dictionary suitable for json.dumps()
 
     Note:
         Converts all dataclass instances to plain dicts. Useful for
-        debugging, archiving, or feeding to other tools.
+        debugging, archiving, or feeding to other tools. For large files
+        prefer write_country_sys_json(), which never holds more than one
+        entry's records at a time.
     """
-    def ptr(p: FarPtr) -> Dict[str, Any]:
-        return {"raw_u32": p.raw_u32, "seg": p.seg, "off": p.off, "linear": p.linear}
-    
-    out = {
-        "file_size": doc.file_size, "entry_table_count": doc.entry_table_count,
-        "pointer_info_type": doc.pointer_info_type,
-        "entry_table_ptrs": [ptr(p) for p in doc.entry_table_ptrs],
-        "entries": [], "warnings": doc.warnings,
-    }
-    
+    payloads = PayloadEncoder(payload_encoding)
+    entries = [_entry_jsonable(e, payloads) for e in doc.entries]
+    tail = _tail_jsonable(doc, payloads)
+    tail["orphan_blocks"] = list(tail["orphan_blocks"])
+    return {**_header_jsonable(doc), "entries": entries, **tail}
+
+
+def write_country_sys_json(doc: ParsedCountrySys, write: Callable[[str], Any],
+                           payload_encoding: str = "hex") -> None:
+    """
+    Write a ParsedCountrySys as one JSON document (2-space indent), streamed.
+
+    Args:
+        doc: Parsed COUNTRY.SYS data
+        write: Output function, e.g. sys.stdout.write
+        payload_encoding: How tagged payloads are written, see PayloadEncoder
+
+    Note:
+        Same document as json.dumps(to_jsonable(doc), indent=2), but the
+        header goes out first and entries are converted and written one at
+        a time. Warnings and diagnostics follow the entries, so with a lazy
+        document they include everything decoding the entries reported;
+        in ref mode the blocks table follows them too.
+    """
+    payloads = PayloadEncoder(payload_encoding)
+    write("{")
+    sep = "\n  "
+    for key, value in _header_jsonable(doc).items():
+        write(f"{sep}{json.dumps(key)}: ")
+        _write_json(write, value, 1)
+        sep = ",\n  "
+    write(sep + '"entries": ')
+    _write_json(write, map(functools.partial(_entry_jsonable, payloads=payloads), doc.entries), 1)
+    for key, value in _tail_jsonable(doc, payloads).items():
+        write(f"{sep}{json.dumps(key)}: ")
+        _write_json(write, value, 1)
+    write("\n}\n")
+
+
+def write_country_sys_jsonl(doc: ParsedCountrySys, write: Callable[[str], Any],
+                            per_subfunc: bool = False, payload_encoding: str = "hex") -> None:
+    """
+    Write a ParsedCountrySys as JSON Lines, one record per line.
+
+    Args:
+        doc: Parsed COUNTRY.SYS data
+        write: Output function, e.g. sys.stdout.write
+        per_subfunc: One "subfunc" record per subfunction (tagged with its
+            entry's country/codepage/offset) instead of one "entry" record
+            per entry
+        payload_encoding: How tagged payloads are written, see PayloadEncoder
+
+    Note:
+        Records are tagged with "type": header, entry or subfunc,
+        orphan_block, warning and summary (always last, with the
+        diagnostics and the partial flag). Records use the same fields as
+        write_country_sys_json(). In ref mode a "block" record (its "key"
+        plus the fields of a blocks table entry) precedes the first record
+        that refers to it; its "offsets" only list the references so far.
+    """
+    payloads = PayloadEncoder(payload_encoding)
+
+    def emit(kind: str, body: Dict[str, Any]) -> None:
+        write(json.dumps({"type": kind, **body}) + "\n")
+
+    def emit_with_blocks(kind: str, body: Dict[str, Any]) -> None:
+        for key, block in payloads.take_new_blocks():
+            emit("block", {"key": key, **block})
+        emit(kind, body)
+
+    flt = doc.entry_filter
+    emit("header", {**_header_jsonable(doc), "filter": flt.describe() if flt is not None else [],
+                    "filtered_out": doc.filtered_out})
     for e in doc.entries:
-        ent = {
-            "offset": e.offset, "header_len": e.header_len, "country": e.country,
-            "codepage": e.codepage, "subfunc_header_ptr": ptr(e.subfunc_header_ptr),
-            "subfuncs": [],
-        }
-        for s in e.subfuncs:
-            sj = {
-                "offset": s.offset, "entry_len": s.entry_len, "id": s.subfunc_id,
-                "data_ptr": ptr(s.data_ptr), "tagged": None, "decoded": s.decoded,
-            }
-            if s.tagged:
-                sj["tagged"] = {
-                    "offset": s.tagged.offset, "tag": s.tagged.tag, "magic": s.tagged.magic,
-                    "magic_raw_hex": _hex(s.tagged.magic_raw), "size": s.tagged.size,
-                    "payload_hex": _hex(s.tagged.payload),
-                    "dbcs_dummy_word": s.tagged.dbcs_dummy_word,
-                }
-            ent["subfuncs"].append(sj)
-        out["entries"].append(ent)
-    
-    return out
+        if per_subfunc:
+            for s in e.subfuncs:
+                emit_with_blocks("subfunc", {"country": e.country, "codepage": e.codepage,
+                                             "entry_offset": e.offset, **_subfunc_jsonable(s, payloads)})
+        else:
+            emit_with_blocks("entry", _entry_jsonable(e, payloads))
+    for b in doc.orphan_blocks:
+        emit("orphan_block", _orphan_jsonable(b))
+    for w in doc.warnings:
+        emit("warning", {"message": w})
+    emit("summary", {"entries": len(doc.entries), "diagnostics": doc.diagnostics.to_jsonable(),
+                     "partial": doc.partial})
 
 
 def filter_entries(entries: List[CountryEntry], country: Optional[int], codepage: Optional[int]) -> List[CountryEntry]:
@@ -1416,8 +4282,45 @@ def filter_entries(entries: List[CountryEntry], country: Optional[int], codepage
     return filtered
 
 
+def select_entries(doc: ParsedCountrySys, country: Optional[int], codepage: Optional[int],
+                   *, sort: bool = False) -> List[CountryEntry]:
+    """
+    Filter (and optionally sort) a document's entries via its columnar index.
+
+    Args:
+        doc: Parsed COUNTRY.SYS data
+        country: Country code to filter by (None = no filter)
+        codepage: Codepage to filter by (None = no filter)
+        sort: If True, order by (country, codepage); stable for duplicates
+
+    Returns:
+        New list of the matching entries
+
+    Note:
+        Same result as filter_entries (plus the sort), but the scan and sort
+        run over doc.columns, and only the selected entries are looked up.
+    """
+    cols = doc.columns
+    rows = cols.select(country, codepage)
+    if sort:
+        rows = cols.sort(rows)
+    entries = doc.entries
+    return [entries[i] for i in rows]
+
+
+def _print_file_header(emit: LineWriter, doc: ParsedCountrySys, total: int) -> None:
+    emit("# COUNTRY.SYS File Header")
+    emit(f"# File size: {doc.file_size} bytes")
+    emit(f"# entry_table_count: {doc.entry_table_count}")
+    emit(f"# pointer_info_type: {doc.pointer_info_type}")
+    for i, p in enumerate(doc.entry_table_ptrs):
+        emit(f"# entry_table[{i}] offset: {p.linear:#06x}")
+    emit(f"# Total entries: {total}\n")
+
+
 def print_summary(doc: ParsedCountrySys, *, unsorted: bool, no_offsets: bool,
-                  country: Optional[int], codepage: Optional[int]) -> None:
+                  country: Optional[int], codepage: Optional[int],
+                  write: Optional[Callable[[str], Any]] = None) -> None:
     """
     Print a concise summary of COUNTRY.SYS entries.
 
@@ -1427,47 +4330,42 @@ def print_summary(doc: ParsedCountrySys, *, unsorted: bool, no_offsets: bool,
         no_offsets: If True, suppress file offset information
         country: Filter by country code (None = no filter)
         codepage: Filter by codepage (None = no filter)
+        write: Output function (default: sys.stdout.write), fed in large
+            chunks through a LineWriter
 
     Note:
         Summary format shows compact one line per entry with 
         country:codepage, names, and list of subfunction IDs.
     """
-    entries = filter_entries(doc.entries, country, codepage)
-    if not unsorted:
-        # Sort entries by (country, codepage) for predictable output
-        entries.sort(key=lambda e: (e.country, e.codepage))
+    # Sort entries by (country, codepage) for predictable output
+    entries = select_entries(doc, country, codepage, sort=not unsorted)
 
-    # File header info
-    print(f"# COUNTRY.SYS File Header")
-    print(f"# File size: {doc.file_size} bytes")
-    print(f"# entry_table_count: {doc.entry_table_count}")
-    print(f"# pointer_info_type: {doc.pointer_info_type}")
-    for i, p in enumerate(doc.entry_table_ptrs):
-        print(f"# entry_table[{i}] offset: {p.linear:#06x}")
-    print(f"# Total entries: {len(entries)}\n")
+    with LineWriter(write or sys.stdout.write) as emit:
+        _print_file_header(emit, doc, len(entries))
 
-    for e in entries:
-        cname = _country_name(e.country)
-        cpname = _codepage_name(e.codepage)
-        
-        # Sort subfunctions by ID for consistent display (unless --unsorted)
-        subfuncs = e.subfuncs if unsorted else sorted(e.subfuncs, key=lambda s: s.subfunc_id)
-        sf_ids = [s.subfunc_id for s in subfuncs if s.subfunc_id != 0]
-        sf_ids_str = ",".join(str(i) for i in sf_ids)
-        
-        line = f"{e.country:3d}:{e.codepage:4d}  {cname} / {cpname}  subfuncs=[{sf_ids_str}]"
-        print(line)
-        if not no_offsets:
-            print(f"  entry_off={e.offset:#06x}  subfunc_hdr={e.subfunc_header_ptr.linear:#06x}")
+        for e in entries:
+            cname = _country_name(e.country)
+            cpname = _codepage_name(e.codepage)
 
-    if doc.warnings:
-        print("\n# WARNINGS:")
-        for w in doc.warnings:
-            print(f"# {w}")
+            # Sort subfunctions by ID for consistent display (unless --unsorted)
+            subfuncs = e.subfuncs if unsorted else sorted(e.subfuncs, key=lambda s: s.subfunc_id)
+            sf_ids = [s.subfunc_id for s in subfuncs if s.subfunc_id != 0]
+            sf_ids_str = ",".join(str(i) for i in sf_ids)
+
+            emit(f"{e.country:3d}:{e.codepage:4d}  {cname} / {cpname}  subfuncs=[{sf_ids_str}]")
+            if not no_offsets:
+                emit(f"  entry_off={e.offset:#06x}  subfunc_hdr={e.subfunc_header_ptr.linear:#06x}")
+
+        warnings = doc.warnings
+        if warnings:
+            emit("\n# WARNINGS:")
+            for w in warnings:
+                emit(f"# {w}")
 
 
 def print_default(doc: ParsedCountrySys, *, unsorted: bool, no_offsets: bool,
-                  country: Optional[int], codepage: Optional[int]) -> None:
+                  country: Optional[int], codepage: Optional[int],
+                  write: Optional[Callable[[str], Any]] = None) -> None:
     """
     Print detailed information about COUNTRY.SYS entries.
 
@@ -1477,113 +4375,198 @@ def print_default(doc: ParsedCountrySys, *, unsorted: bool, no_offsets: bool,
         no_offsets: If True, suppress file offset information
         country: Filter by country code (None = no filter)
         codepage: Filter by codepage (None = no filter)
+        write: Output function (default: sys.stdout.write), fed in large
+            chunks through a LineWriter
 
     Note:
         Default format shows full details for each entry including all
         subfunction data, tagged structures, and decoded information.
-        Case/collate tables are displayed as decimal byte tables.
+        Case/collate tables are displayed as decimal byte tables; each
+        distinct table is formatted once, however many entries share it.
         By default, subfunctions are sorted numerically by ID for easier
         scanning and diffing; use --unsorted to preserve original file order
         (useful for validating file structure or debugging).
     """
-    entries = filter_entries(doc.entries, country, codepage)
-    if not unsorted:
-        # Sort entries by (country, codepage) for predictable output
-        entries.sort(key=lambda e: (e.country, e.codepage))
-
-    # File header info
-    print(f"# COUNTRY.SYS File Header")
-    print(f"# File size: {doc.file_size} bytes")
-    print(f"# entry_table_count: {doc.entry_table_count}")
-    print(f"# pointer_info_type: {doc.pointer_info_type}")
-    for i, p in enumerate(doc.entry_table_ptrs):
-        print(f"# entry_table[{i}] offset: {p.linear:#06x}")
-    print(f"# Total entries: {len(entries)}\n")
-
-    for e in entries:
-        cname = _country_name(e.country)
-        cpname = _codepage_name(e.codepage)
-        print(f"[{e.country}:{e.codepage}]  # {cname} / {cpname}")
-        if not no_offsets:
-            print(f"  entry_offset={e.offset:#06x}")
-            print(f"  subfunc_header_ptr={e.subfunc_header_ptr.linear:#06x}")
-
-        # Sort subfunctions by ID for consistent display (unless --unsorted)
-        # Python's sorted() is stable: if two subfunctions share an ID (rare/malformed),
-        # original order is preserved. This makes diffs cleaner and grep easier.
-        subfuncs = e.subfuncs if unsorted else sorted(e.subfuncs, key=lambda s: s.subfunc_id)
-        
-        for s in subfuncs:
-            if s.subfunc_id == 0:
-                continue
-            
-            title = SUBFUNC_NAMES.get(s.subfunc_id, f"Subfunction {s.subfunc_id}")
-            print(f"  sf {s.subfunc_id}: {title}")
+    # Sort entries by (country, codepage) for predictable output
+    entries = select_entries(doc, country, codepage, sort=not unsorted)
+    # Payload digest -> formatted byte table
+    tables: Dict[bytes, str] = {}
+
+    with LineWriter(write or sys.stdout.write) as emit:
+        _print_file_header(emit, doc, len(entries))
+
+        for e in entries:
+            cname = _country_name(e.country)
+            cpname = _codepage_name(e.codepage)
+            emit(f"[{e.country}:{e.codepage}]  # {cname} / {cpname}")
             if not no_offsets:
-                print(f"    sf_entry_off={s.offset:#06x}  data_ptr={s.data_ptr.linear:#06x}")
-            
-            if s.tagged:
-                print(f"    tagged: tag={s.tagged.tag:#04x} magic=\'{s.tagged.magic}\' size={s.tagged.size:#x}")
-                if s.tagged.magic == "DBCS" and s.tagged.size == 0 and s.tagged.dbcs_dummy_word is not None:
-                    print(f"    DBCS dummy_word={s.tagged.dbcs_dummy_word:#06x}")
-
-                # Print byte tables for case/collate tables
-                if s.subfunc_id in (2, 3, 4, 6) and s.tagged.payload:
-                    print(f"    {s.tagged.magic} table ({len(s.tagged.payload)} bytes):")
-                    print(_format_byte_table(s.tagged.payload))
-                
-                # Print raw bytes for CTYINFO section
-                #if s.subfunc_id == 1 and s.tagged.payload:
-                #    print(f"    {s.tagged.magic} raw bytes ({len(s.tagged.payload)} bytes):")
-                #    print(_format_byte_table(s.tagged.payload))
-
-            if s.decoded:
-                for k, v in s.decoded.items():
-                    print(f"    {k} = {v}")
-        print()
-
-    if doc.warnings:
-        print("# WARNINGS:")
-        for w in doc.warnings:
-            print(f"# {w}")
+                emit(f"  entry_offset={e.offset:#06x}")
+                emit(f"  subfunc_header_ptr={e.subfunc_header_ptr.linear:#06x}")
+
+            # Sort subfunctions by ID for consistent display (unless --unsorted)
+            # Python's sorted() is stable: if two subfunctions share an ID (rare/malformed),
+            # original order is preserved. This makes diffs cleaner and grep easier.
+            subfuncs = e.subfuncs if unsorted else sorted(e.subfuncs, key=lambda s: s.subfunc_id)
+
+            for s in subfuncs:
+                if s.subfunc_id == 0:
+                    continue
+
+                title = SUBFUNC_NAMES.get(s.subfunc_id, f"Subfunction {s.subfunc_id}")
+                emit(f"  sf {s.subfunc_id}: {title}")
+                if not no_offsets:
+                    emit(f"    sf_entry_off={s.offset:#06x}  data_ptr={s.data_ptr.linear:#06x}")
+
+                tagged = s.tagged
+                if tagged:
+                    emit(f"    tagged: tag={tagged.tag:#04x} magic=\'{tagged.magic}\' size={tagged.size:#x}")
+                    if tagged.magic == "DBCS" and tagged.size == 0 and tagged.dbcs_dummy_word is not None:
+                        emit(f"    DBCS dummy_word={tagged.dbcs_dummy_word:#06x}")
+
+                    # Print byte tables for case/collate tables
+                    if s.subfunc_id in (2, 3, 4, 6) and tagged.payload:
+                        emit(f"    {tagged.magic} table ({len(tagged.payload)} bytes):")
+                        digest = tagged.digest or payload_digest(tagged.payload)
+                        try:
+                            emit(tables[digest])
+                        except KeyError:
+                            emit(tables.setdefault(digest, _format_byte_table(tagged.payload)))
+
+                if s.decoded:
+                    for k, v in s.decoded.items():
+                        emit(f"    {k} = {v}")
+            emit()
+
+        warnings = doc.warnings
+        if warnings:
+            emit("# WARNINGS:")
+            for w in warnings:
+                emit(f"# {w}")
 
 
 # ====
 # HTML Generation
 # ====
 
+# Map DOS codepage numbers to Python codec names (anything else: cp437)
+CODEPAGE_CODECS: Dict[int, str] = {
+    437: 'cp437', 720: 'cp720', 737: 'cp737', 775: 'cp775',
+    850: 'cp850', 852: 'cp852', 855: 'cp855', 857: 'cp857',
+    858: 'cp858', 860: 'cp860', 861: 'cp861', 862: 'cp862',
+    863: 'cp863', 864: 'cp864', 865: 'cp865', 866: 'cp866',
+    869: 'cp869', 874: 'cp874', 932: 'cp932', 936: 'cp936',
+    949: 'cp949', 950: 'cp950', 1250: 'cp1250', 1251: 'cp1251',
+    1252: 'cp1252',
+}
+
+_ALL_BYTES = bytes(range(256))
+
+
+def _decode_codepage(codepage_number: int) -> str:
+    """
+    The 256 characters of a codepage, each byte decoded on its own.
+
+    Bytes the codepage's codec cannot decode alone (undefined positions,
+    DBCS lead bytes) fall back to CP437, like unknown codepages.
+    """
+    codec_name = CODEPAGE_CODECS.get(codepage_number, 'cp437')
+    try:
+        chars = _ALL_BYTES.decode(codec_name)
+        if len(chars) == 256:
+            return chars
+    except (UnicodeDecodeError, LookupError):
+        pass
+    # Multi-byte codec or undefined bytes: decode byte by byte
+    cp437 = _ALL_BYTES.decode('cp437')
+    out = []
+    for b in range(256):
+        try:
+            out.append(bytes([b]).decode(codec_name))
+        except (UnicodeDecodeError, LookupError):
+            out.append(cp437[b])
+    return ''.join(out)
+
+
+@dataclass(frozen=True, slots=True)
+class CodepageChar:
+    """
+    Display metadata of one byte of a codepage, see codepage_chars().
+
+    Attributes:
+        char: Unicode character of the byte
+        name: Character name (see get_char_name())
+        html: char as HTML (see _char_to_html_entity())
+        glyph_html: What the HTML pages show for the byte: the control
+            glyph for 0x00-0x1F and 0x7F, html otherwise
+        glyph_class: CSS class of glyph_html ("control-char" or "glyph")
+        display: char for the CTYINFO/YESNO summary: its name if invisible,
+            html otherwise (see _format_display_value())
+        title: Escaped tooltip text "Dec: ..., Hex: ..., Name: ..."
+    """
+    char: str
+    name: str
+    html: str
+    glyph_html: str
+    glyph_class: str
+    display: str
+    title: str
+
+
+@functools.lru_cache(maxsize=None)
+def codepage_chars(codepage_number: int) -> Tuple[CodepageChar, ...]:
+    """
+    Display metadata for all 256 bytes of a codepage, indexed by byte value.
+
+    Args:
+        codepage_number: DOS codepage number (e.g., 437, 850)
+
+    Returns:
+        Tuple of 256 CodepageChar records
+
+    Note:
+        Built once per codepage and process: one decode of all 256 bytes
+        and one unicodedata lookup per byte, shared by every entry and page
+        using the codepage.
+    """
+    chars = _decode_codepage(codepage_number)
+    table = []
+    for b, char in enumerate(chars):
+        if b < 0x20:
+            name = CONTROL_CHAR_NAMES[b]
+        elif b == 0x20:
+            name = "SPACE"
+        elif b == 0x7F:
+            name = "DELETE"
+        else:
+            name = unicodedata.name(char, None) or (f"ASCII {b:#04x}" if b < 0x80 else f"UNDEFINED ({b:#04x})")
+        char_html = _char_to_html_entity(char)
+        if b < 0x20:
+            glyph_html, glyph_class = _glyph_to_html_entity(get_control_char_glyph(b)), 'control-char'
+        elif b == 0x7F:
+            glyph_html, glyph_class = '&#9249;', 'control-char'
+        else:
+            glyph_html, glyph_class = char_html, 'glyph'
+        table.append(CodepageChar(
+            char=char, name=name, html=char_html, glyph_html=glyph_html, glyph_class=glyph_class,
+            display=_char_display_html(char),
+            title=html.escape(f"Dec: {b}, Hex: 0x{b:02X}, Name: {name}"),
+        ))
+    return tuple(table)
+
+
 def codepage_byte_to_unicode(byte_value: int, codepage_number: int) -> str:
     """
     Convert a byte value to its Unicode character using the specified codepage.
     
     Args:
         byte_value: Byte value (0-255)
-        codepage_number: DOS codepage number (e.g., 437, 850)
-    
-    Returns:
-        Unicode character string, or replacement character if conversion fails
-    """
-    # Map DOS codepage numbers to Python codec names
-    codec_map = {
-        437: 'cp437', 720: 'cp720', 737: 'cp737', 775: 'cp775',
-        850: 'cp850', 852: 'cp852', 855: 'cp855', 857: 'cp857',
-        858: 'cp858', 860: 'cp860', 861: 'cp861', 862: 'cp862',
-        863: 'cp863', 864: 'cp864', 865: 'cp865', 866: 'cp866',
-        869: 'cp869', 874: 'cp874', 932: 'cp932', 936: 'cp936',
-        949: 'cp949', 950: 'cp950', 1250: 'cp1250', 1251: 'cp1251',
-        1252: 'cp1252',
-    }
-    
-    codec_name = codec_map.get(codepage_number, 'cp437')
+        codepage_number: DOS codepage number (e.g., 437, 850)
     
-    try:
-        return bytes([byte_value]).decode(codec_name)
-    except (UnicodeDecodeError, LookupError):
-        # Fallback to CP437 for unknown codepages
-        try:
-            return bytes([byte_value]).decode('cp437')
-        except UnicodeDecodeError:
-            return '\uFFFD'  # Replacement character
+    Returns:
+        Unicode character string (CP437's if the codepage cannot decode
+        the byte on its own, or is unknown)
+    """
+    return codepage_chars(codepage_number)[byte_value].char
 
 
 def get_control_char_glyph(byte_value: int) -> str:
@@ -1610,31 +4593,10 @@ def get_char_name(byte_value: int, codepage_number: int) -> str:
         codepage_number: DOS codepage number
     
     Returns:
-        Character name string
+        Character name string: control character names for 0x00-0x1F,
+        SPACE, DELETE, else the Unicode name of the decoded character
     """
-    # Control characters
-    if byte_value < 0x20:
-        return CONTROL_CHAR_NAMES[byte_value]
-    
-    # Space
-    if byte_value == 0x20:
-        return "SPACE"
-    
-    # DEL
-    if byte_value == 0x7F:
-        return "DELETE"
-    
-    # Get Unicode character
-    char = codepage_byte_to_unicode(byte_value, codepage_number)
-    
-    try:
-        name = unicodedata.name(char)
-        return name
-    except ValueError:
-        # No name available
-        if byte_value < 0x80:
-            return f"ASCII {byte_value:#04x}"
-        return f"UNDEFINED ({byte_value:#04x})"
+    return codepage_chars(codepage_number)[byte_value].name
 
 
 def _glyph_to_html_entity(glyph: str) -> str:
@@ -1757,6 +4719,14 @@ def _get_char_display_name(char: str) -> str:
     return unicodedata.name(char, 'UNKNOWN')
 
 
+@functools.lru_cache(maxsize=1024)
+def _char_display_html(char: str) -> str:
+    """A character for the HTML summary: its name if invisible, else an HTML entity."""
+    if _is_invisible_char(char):
+        return _get_char_display_name(char)
+    return _char_to_html_entity(char)
+
+
 def _format_display_value(value: str, codepage: int) -> str:
     """
     Format a value from CTYINFO/YESNO for display in HTML summary section.
@@ -1791,114 +4761,33 @@ def _format_display_value(value: str, codepage: int) -> str:
     
     result_parts = []
     i = 0
+    n = len(value)
+    chars = None
     
-    while i < len(value):
+    while i < n:
         # Check for escaped sequence like \xE0
-        if value[i:i+2] == '\\x' and i + 4 <= len(value):
-            hex_chars = value[i+2:i+4]
+        if value.startswith('\\x', i) and i + 4 <= n:
             try:
-                byte_val = int(hex_chars, 16)
-                # Convert byte to character using codepage
-                char = codepage_byte_to_unicode(byte_val, codepage)
-                
-                # Check if the Unicode character is invisible AFTER conversion
-                if _is_invisible_char(char):
-                    result_parts.append(_get_char_display_name(char))
-                else:
-                    # Visible character - use HTML entity
-                    result_parts.append(_char_to_html_entity(char))
+                byte_val = int(value[i+2:i+4], 16)
+            except ValueError:
+                byte_val = -1  # Not a valid hex escape, treat as literal
+            if byte_val >= 0:
+                # Converted with the codepage, then checked for invisibility
+                if chars is None:
+                    chars = codepage_chars(codepage)
+                result_parts.append(chars[byte_val].display)
                 i += 4
                 continue
-            except ValueError:
-                pass  # Not a valid hex escape, treat as literal
         
         # Regular character
-        char = value[i]
-        
-        # Check if the Unicode character is invisible
-        if _is_invisible_char(char):
-            result_parts.append(_get_char_display_name(char))
-        else:
-            # Visible character - use HTML entity
-            result_parts.append(_char_to_html_entity(char))
-        
+        result_parts.append(_char_display_html(value[i]))
         i += 1
     
     return ''.join(result_parts)
 
 
-def generate_html_file(entry: CountryEntry, output_dir: str) -> Tuple[int, str, int, str]:
-    """
-    Generate an HTML file for a country/codepage entry.
-    
-    Args:
-        entry: CountryEntry object with parsed data
-        output_dir: Directory to write HTML file to
-    
-    Returns:
-        Tuple of (country_code, country_name, codepage, filename) for index generation
-    """
-    country_code = entry.country
-    codepage = entry.codepage
-    
-    # Get ISO code for filename
-    iso_code = _country_iso_code(country_code)
-    country_name = _country_name(country_code)
-    codepage_name_str = _codepage_name(codepage)
-    
-    # Generate filename: AA###-###.html
-    filename = f"{iso_code}{country_code:03d}-{codepage:03d}.html"
-    filepath = os.path.join(output_dir, filename)
-    
-    # Extract subfunction data
-    ctyinfo_data = None
-    ucase_payload = None
-    collate_payload = None
-    yesno_data = None
-    
-    for sf in entry.subfuncs:
-        if sf.subfunc_id == 1 and sf.decoded:
-            ctyinfo_data = sf.decoded
-        elif sf.subfunc_id == 2 and sf.tagged:
-            ucase_payload = sf.tagged.payload
-        elif sf.subfunc_id == 6 and sf.tagged:
-            collate_payload = sf.tagged.payload
-        elif sf.subfunc_id == 35 and sf.decoded:
-            yesno_data = sf.decoded
-    
-    # Build HTML content
-    html_content = _build_html(
-        country_code=country_code,
-        country_name=country_name,
-        iso_code=iso_code,
-        codepage=codepage,
-        codepage_name=codepage_name_str,
-        ctyinfo=ctyinfo_data,
-        ucase_payload=ucase_payload,
-        collate_payload=collate_payload,
-        yesno=yesno_data
-    )
-    
-    # Write file
-    with open(filepath, 'w', encoding='utf-8', newline='\r\n') as f:
-        f.write(html_content)
-    
-    return (country_code, country_name, codepage, filename)
-
-
-def _build_html(country_code: int, country_name: str, iso_code: str,
-                codepage: int, codepage_name: str,
-                ctyinfo: Optional[Dict[str, Any]],
-                ucase_payload: Optional[bytes],
-                collate_payload: Optional[bytes],
-                yesno: Optional[Dict[str, Any]]) -> str:
-    """
-    Build the complete HTML document content.
-    """
-    title = f"{country_name} (CP{codepage})"
-    
-    # CSS styles
-    css = '''
+# Stylesheet of the country/codepage pages
+HTML_PAGE_CSS = '''
 :root {
     --bg-color: #f8f9fa;
     --text-color: #212529;
@@ -2116,8 +5005,108 @@ footer {
 }
 '''
 
-    # JavaScript for theme toggle
-    js = '''
+# Stylesheet of index.html
+HTML_INDEX_CSS = '''
+:root {
+    --bg-color: #f8f9fa;
+    --text-color: #212529;
+    --heading-color: #495057;
+    --table-border: #dee2e6;
+    --table-header-bg: #e9ecef;
+    --table-hover: #f1f3f5;
+    --link-color: #0d6efd;
+}
+
+[data-theme="dark"] {
+    --bg-color: #1a1a2e;
+    --text-color: #e9ecef;
+    --heading-color: #adb5bd;
+    --table-border: #495057;
+    --table-header-bg: #343a40;
+    --table-hover: #2d2d44;
+    --link-color: #6ea8fe;
+}
+
+* {
+    box-sizing: border-box;
+}
+
+body {
+    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+    background-color: var(--bg-color);
+    color: var(--text-color);
+    line-height: 1.6;
+    margin: 0;
+    padding: 20px;
+    max-width: 1200px;
+    margin: 0 auto;
+}
+
+h1 {
+    color: var(--heading-color);
+    border-bottom: 2px solid var(--table-border);
+    padding-bottom: 10px;
+}
+
+.theme-toggle {
+    position: fixed;
+    top: 20px;
+    right: 20px;
+    padding: 8px 16px;
+    background: var(--table-header-bg);
+    border: 1px solid var(--table-border);
+    border-radius: 4px;
+    cursor: pointer;
+    color: var(--text-color);
+    font-size: 14px;
+}
+
+.theme-toggle:hover {
+    background: var(--table-hover);
+}
+
+table {
+    border-collapse: collapse;
+    width: 100%;
+    margin: 1em 0;
+    background: var(--bg-color);
+}
+
+th, td {
+    border: 1px solid var(--table-border);
+    padding: 10px 15px;
+    text-align: left;
+}
+
+th {
+    background: var(--table-header-bg);
+    font-weight: 600;
+}
+
+tr:hover td {
+    background: var(--table-hover);
+}
+
+a {
+    color: var(--link-color);
+    text-decoration: none;
+}
+
+a:hover {
+    text-decoration: underline;
+}
+
+footer {
+    margin-top: 3em;
+    padding-top: 1em;
+    border-top: 1px solid var(--table-border);
+    color: var(--heading-color);
+    font-size: 12px;
+}
+'''
+
+# Light/dark theme toggle, shared by all pages
+HTML_THEME_JS = '''
 function toggleTheme() {
     const html = document.documentElement;
     const currentTheme = html.getAttribute('data-theme');
@@ -2127,17 +5116,395 @@ function toggleTheme() {
     updateToggleButton(newTheme);
 }
 
-function updateToggleButton(theme) {
-    const btn = document.getElementById('theme-toggle');
-    btn.textContent = theme === 'dark' ? '☀️ Light Mode' : '🌙 Dark Mode';
-}
+function updateToggleButton(theme) {
+    const btn = document.getElementById('theme-toggle');
+    btn.textContent = theme === 'dark' ? '☀️ Light Mode' : '🌙 Dark Mode';
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const savedTheme = localStorage.getItem('theme') || 'light';
+    document.documentElement.setAttribute('data-theme', savedTheme);
+    updateToggleButton(savedTheme);
+});
+'''
+
+
+@dataclass(frozen=True, slots=True)
+class HtmlAssets:
+    """
+    Shared asset files that pages link to instead of inlining CSS/JS.
+
+    Attributes:
+        css: File name of the page stylesheet (style.<hash>.css)
+        js: File name of the theme script (theme.<hash>.js)
+    """
+    css: str
+    js: str
+
+    @classmethod
+    def fingerprinted(cls) -> HtmlAssets:
+        """Asset names for the current HTML_PAGE_CSS and HTML_THEME_JS."""
+        return cls(css=f"style.{_text_fingerprint(HTML_PAGE_CSS)}.css",
+                   js=f"theme.{_text_fingerprint(HTML_THEME_JS)}.js")
+
+    def contents(self) -> Dict[str, str]:
+        """File name -> text of each asset."""
+        return {self.css: HTML_PAGE_CSS, self.js: HTML_THEME_JS}
+
+
+def _text_fingerprint(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _style_html(css: str, assets: Optional[HtmlAssets]) -> str:
+    """<style> element with css, or a <link> to the shared stylesheet."""
+    if assets is None:
+        return f'<style>{css}</style>'
+    return f'<link rel="stylesheet" href="{html.escape(assets.css)}">'
+
+
+def _script_html(assets: Optional[HtmlAssets]) -> str:
+    """<script> element with the theme toggle, inline or from the shared file."""
+    if assets is None:
+        return f'<script>{HTML_THEME_JS}</script>'
+    return f'<script src="{html.escape(assets.js)}"></script>'
+
+
+# Bump whenever page or index rendering changes, so that incremental
+# --html runs rebuild everything (see generate_html_files())
+HTML_GENERATOR_VERSION = "1"
+
+# Incremental build manifest in --output-dir: output file -> input hash
+HTML_MANIFEST_NAME = ".cntrydump-manifest.json"
+
+
+@dataclass(frozen=True, slots=True)
+class HtmlPage:
+    """
+    Everything one (country, codepage) HTML page is rendered from.
+
+    Plain, picklable data, so pages can be rendered in worker processes
+    without the parsed document (see generate_html_files()).
+
+    Attributes:
+        country: Country code
+        codepage: Codepage number
+        ctyinfo: Decoded CTYINFO fields (None if missing)
+        ucase_payload: UCASE table (None if missing)
+        collate_payload: COLLATE table (None if missing)
+        yesno: Decoded YESNO fields (None if missing)
+    """
+    country: int
+    codepage: int
+    ctyinfo: Optional[Dict[str, Any]]
+    ucase_payload: Optional[bytes]
+    collate_payload: Optional[bytes]
+    yesno: Optional[Dict[str, Any]]
+
+    @classmethod
+    def from_entry(cls, entry: CountryEntry) -> HtmlPage:
+        """Extract the subfunction data a page shows from an entry."""
+        ctyinfo_data = None
+        ucase_payload = None
+        collate_payload = None
+        yesno_data = None
+        
+        for sf in entry.subfuncs:
+            if sf.subfunc_id == 1 and sf.decoded:
+                ctyinfo_data = dict(sf.decoded)
+            elif sf.subfunc_id == 2 and sf.tagged:
+                ucase_payload = bytes(sf.tagged.payload)
+            elif sf.subfunc_id == 6 and sf.tagged:
+                collate_payload = bytes(sf.tagged.payload)
+            elif sf.subfunc_id == 35 and sf.decoded:
+                yesno_data = dict(sf.decoded)
+        
+        return cls(country=entry.country, codepage=entry.codepage, ctyinfo=ctyinfo_data,
+                   ucase_payload=ucase_payload, collate_payload=collate_payload, yesno=yesno_data)
+
+    @property
+    def filename(self) -> str:
+        """Page file name: AA###-###.html"""
+        return f"{_country_iso_code(self.country)}{self.country:03d}-{self.codepage:03d}.html"
+
+    def index_info(self) -> Tuple[int, str, int, str]:
+        """(country_code, country_name, codepage, filename) for generate_index_html()."""
+        return (self.country, _country_name(self.country), self.codepage, self.filename)
+
+    def input_hash(self, assets: Optional[HtmlAssets] = None) -> str:
+        """
+        Hash of everything the page is rendered from, including
+        HTML_GENERATOR_VERSION and the linked asset files; equal hashes
+        mean identical pages.
+        """
+        def digest(payload: Optional[bytes]) -> Optional[str]:
+            return payload_digest(payload).hex() if payload is not None else None
+
+        inputs = [HTML_GENERATOR_VERSION, self.country, self.codepage, self.ctyinfo, self.yesno,
+                  digest(self.ucase_payload), digest(self.collate_payload),
+                  [assets.css, assets.js] if assets is not None else None]
+        return _json_hash(inputs)
+
+
+def _json_hash(value: Any) -> str:
+    """Hex BLAKE2b hash of a JSON-serializable value (canonical key order)."""
+    text = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _load_html_manifest(output_dir: str) -> Dict[str, str]:
+    """Output file -> input hash from a previous run (empty if none or unreadable)."""
+    try:
+        with open(os.path.join(output_dir, HTML_MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+        files = manifest["files"]
+        if manifest.get("generator") == HTML_GENERATOR_VERSION and isinstance(files, dict):
+            return files
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return {}
+
+
+def _save_html_manifest(output_dir: str, files: Dict[str, str]) -> None:
+    path = os.path.join(output_dir, HTML_MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"generator": HTML_GENERATOR_VERSION, "files": dict(sorted(files.items()))}, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def render_html_page(page: HtmlPage, assets: Optional[HtmlAssets] = None) -> str:
+    """
+    Render the HTML document of a page.
+
+    Args:
+        page: Page data (see HtmlPage.from_entry())
+        assets: Shared asset files to link (None = inline CSS/JS)
+
+    Returns:
+        HTML document text
+    """
+    return _build_html(
+        country_code=page.country,
+        country_name=_country_name(page.country),
+        iso_code=_country_iso_code(page.country),
+        codepage=page.codepage,
+        codepage_name=_codepage_name(page.codepage),
+        ctyinfo=page.ctyinfo,
+        ucase_payload=page.ucase_payload,
+        collate_payload=page.collate_payload,
+        yesno=page.yesno,
+        assets=assets
+    )
+
+
+@dataclass
+class Precompressor:
+    """
+    Writes gzip-compressed .gz siblings of generated files (--precompress).
+
+    Every file goes through its own zlib compressobj with the same
+    settings, in chunks, right when it is written; static hosts can serve
+    the .gz files directly.
+
+    Attributes:
+        replace: Write only the .gz file, not the uncompressed one
+        level: zlib compression level
+        files: Files compressed so far
+        raw_bytes: Their uncompressed size
+        gz_bytes: Their compressed size
+    """
+    replace: bool = False
+    level: int = 9
+    files: int = 0
+    raw_bytes: int = 0
+    gz_bytes: int = 0
+
+    # Bytes handed to the compressor at a time
+    CHUNK = 1 << 16
+
+    def compressobj(self) -> Any:
+        """A compressor producing the gzip format (wbits 16 + MAX_WBITS)."""
+        return zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS, 9)
+
+    def write(self, filepath: str, data: bytes) -> None:
+        """Write data compressed to filepath + ".gz"."""
+        comp = self.compressobj()
+        size = 0
+        with open(filepath + ".gz", "wb") as f:
+            for i in range(0, len(data), self.CHUNK):
+                chunk = comp.compress(data[i:i + self.CHUNK])
+                size += len(chunk)
+                f.write(chunk)
+            chunk = comp.flush()
+            size += len(chunk)
+            f.write(chunk)
+        self.files += 1
+        self.raw_bytes += len(data)
+        self.gz_bytes += size
+
+    def summary(self) -> str:
+        """One-line compression ratio summary."""
+        if not self.raw_bytes:
+            return f"Precompressed: {self.files} file(s)"
+        ratio = self.gz_bytes / self.raw_bytes
+        return (f"Precompressed: {self.files} file(s), {self.raw_bytes} -> {self.gz_bytes} bytes "
+                f"({ratio:.1%} of original)")
+
+
+def _write_output(filepath: str, text: str, newline: str,
+                  precompress: Optional[Precompressor] = None) -> None:
+    """
+    Write a generated text file (UTF-8, "\\n" written as newline) and/or
+    its .gz sibling, removing whichever of the two is not wanted so no
+    outdated copy is left behind.
+    """
+    data = (text.replace("\n", newline) if newline != "\n" else text).encode("utf-8")
+    if precompress is None or not precompress.replace:
+        with open(filepath, "wb") as f:
+            f.write(data)
+    elif os.path.exists(filepath):
+        os.remove(filepath)
+    if precompress is not None:
+        precompress.write(filepath, data)
+    elif os.path.exists(filepath + ".gz"):
+        os.remove(filepath + ".gz")
+
+
+def _output_exists(filepath: str, precompress: Optional[Precompressor]) -> bool:
+    """Whether the files _write_output() would write for filepath exist."""
+    if precompress is None:
+        return os.path.exists(filepath)
+    gz = os.path.exists(filepath + ".gz")
+    return gz if precompress.replace else gz and os.path.exists(filepath)
+
+
+def _write_html_page(filepath: str, html_content: str,
+                     precompress: Optional[Precompressor] = None) -> None:
+    _write_output(filepath, html_content, "\r\n", precompress)
+
+
+def generate_html_file(entry: CountryEntry, output_dir: str) -> Tuple[int, str, int, str]:
+    """
+    Generate an HTML file for a country/codepage entry.
+    
+    Args:
+        entry: CountryEntry object with parsed data
+        output_dir: Directory to write HTML file to
+    
+    Returns:
+        Tuple of (country_code, country_name, codepage, filename) for index generation
+    """
+    page = HtmlPage.from_entry(entry)
+    _write_html_page(os.path.join(output_dir, page.filename), render_html_page(page))
+    return page.index_info()
+
+
+# The page sections below depend only on the codepage and (for the
+# collation and UCASE tables) a table payload; pages that share them reuse
+# the rendered fragment.
+
+@functools.lru_cache(maxsize=None)
+def _codepage_grid_html(codepage: int) -> str:
+    """HTML section with the 16x16 character map of a codepage (memoized)."""
+    parts = ['    <div class="section">\n',
+             '    <h2>Codepage Character Map (Codepoint Order)</h2>\n',
+             '    <p>16×16 grid showing all 256 byte values (0x00-0xFF)</p>\n']
+    
+    parts.append('    <div class="grid-16x16">\n')
+    # Header row
+    parts.append('    <div class="header"></div>\n')
+    for col in range(16):
+        parts.append(f'    <div class="header">_{col:X}</div>\n')
+    
+    # Data rows
+    chars = codepage_chars(codepage)
+    for row in range(16):
+        parts.append(f'    <div class="row-header">{row:X}_</div>\n')
+        for c in chars[row * 16:row * 16 + 16]:
+            parts.append(f'    <div class="{c.glyph_class}" title="{c.title}">{c.glyph_html}</div>\n')
+    
+    parts.append('    </div>\n')
+    parts.append('    </div>\n')
+    return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=256)
+def _collation_table_html(codepage: int, collate_payload: bytes) -> str:
+    """HTML section listing a codepage in the order of a 256-byte COLLATE table (memoized)."""
+    parts = ['    <div class="section">\n',
+             '    <h2>Codepage in Collation Order</h2>\n',
+             '    <p>Characters sorted by their collation weight (sort order)</p>\n']
+    
+    # Build list of (byte_value, collation_weight)
+    collation_order = [(i, collate_payload[i]) for i in range(256)]
+    # Sort by collation weight, then by byte value for stability
+    collation_order.sort(key=lambda x: (x[1], x[0]))
+    
+    parts.append('    <table class="codepage-grid">\n')
+    parts.append('    <tr><th>Weight</th><th>Dec</th><th>Hex</th><th>Glyph</th><th>Character Name</th></tr>\n')
+    
+    chars = codepage_chars(codepage)
+    for byte_val, weight in collation_order:
+        c = chars[byte_val]
+        parts.append(f'    <tr><td>{weight}</td><td>{byte_val}</td><td>{byte_val:02X}</td>'
+                    f'<td class="{c.glyph_class}">{c.glyph_html}</td>'
+                    f'<td class="char-name">{html.escape(c.name)}</td></tr>\n')
+    
+    parts.append('    </table>\n')
+    parts.append('    </div>\n')
+    return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=256)
+def _ucase_table_html(codepage: int, upper: bytes) -> str:
+    """HTML section with the changed mappings of a UCASE table for 0x80-0xFF (memoized)."""
+    parts = ['    <div class="section">\n',
+             '    <h2>Uppercase Mappings (UCASE)</h2>\n',
+             '    <p>Maps characters 0x80-0xFF to their uppercase equivalents</p>\n']
+    
+    parts.append('    <table class="char-table ucase-table">\n')
+    parts.append('    <tr><th>From (Dec)</th><th>From (Hex)</th><th>Lowercase</th>'
+                '<th></th><th>Uppercase</th><th>To (Hex)</th><th>To (Dec)</th></tr>\n')
+    
+    chars = codepage_chars(codepage)
+    for i, upper_byte in enumerate(upper):
+        lower_byte = 0x80 + i
+        
+        # Only show if there's a mapping change
+        if lower_byte != upper_byte:
+            lower_html = chars[lower_byte].html
+            upper_html = chars[upper_byte].html
+            parts.append(f'    <tr>\n'
+                        f'        <td>{lower_byte}</td>\n'
+                        f'        <td>{lower_byte:02X}</td>\n'
+                        f'        <td class="glyph">{lower_html}</td>\n'
+                        f'        <td class="arrow">&rarr;</td>\n'
+                        f'        <td class="glyph">{upper_html}</td>\n'
+                        f'        <td>{upper_byte:02X}</td>\n'
+                        f'        <td>{upper_byte}</td>\n'
+                        f'    </tr>\n')
+    
+    parts.append('    </table>\n')
+    parts.append('    </div>\n')
+    return ''.join(parts)
+
 
-document.addEventListener('DOMContentLoaded', function() {
-    const savedTheme = localStorage.getItem('theme') || 'light';
-    document.documentElement.setAttribute('data-theme', savedTheme);
-    updateToggleButton(savedTheme);
-});
-'''
+def _build_html(country_code: int, country_name: str, iso_code: str,
+                codepage: int, codepage_name: str,
+                ctyinfo: Optional[Mapping],
+                ucase_payload: Optional[bytes],
+                collate_payload: Optional[bytes],
+                yesno: Optional[Mapping],
+                assets: Optional[HtmlAssets] = None) -> str:
+    """
+    Build the complete HTML document content.
+
+    CSS and JavaScript are inlined, or linked from the shared asset files
+    if assets is given.
+    """
+    title = f"{country_name} (CP{codepage})"
 
     # Build HTML
     parts = [f'''<!DOCTYPE html>
@@ -2146,7 +5513,7 @@ document.addEventListener('DOMContentLoaded', function() {
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{html.escape(title)} - DOS Codepage Reference</title>
-    <style>{css}</style>
+    {_style_html(HTML_PAGE_CSS, assets)}
 </head>
 <body>
     <button id="theme-toggle" class="theme-toggle" onclick="toggleTheme()">🌙 Dark Mode</button>
@@ -2210,103 +5577,15 @@ document.addEventListener('DOMContentLoaded', function() {
     parts.append('    </div>\n')
 
     # Codepage table in codepoint order (16x16 grid)
-    parts.append('    <div class="section">\n')
-    parts.append('    <h2>Codepage Character Map (Codepoint Order)</h2>\n')
-    parts.append('    <p>16×16 grid showing all 256 byte values (0x00-0xFF)</p>\n')
-    
-    parts.append('    <div class="grid-16x16">\n')
-    # Header row
-    parts.append('    <div class="header"></div>\n')
-    for col in range(16):
-        parts.append(f'    <div class="header">_{col:X}</div>\n')
-    
-    # Data rows
-    for row in range(16):
-        parts.append(f'    <div class="row-header">{row:X}_</div>\n')
-        for col in range(16):
-            byte_val = row * 16 + col
-            char_name = get_char_name(byte_val, codepage)
-            tooltip = f"Dec: {byte_val}, Hex: 0x{byte_val:02X}, Name: {char_name}"
-            if byte_val < 0x20:
-                glyph = get_control_char_glyph(byte_val)
-                glyph_html = _glyph_to_html_entity(glyph)
-                parts.append(f'    <div class="control-char" title="{html.escape(tooltip)}">{glyph_html}</div>\n')
-            elif byte_val == 0x7F:
-                parts.append(f'    <div class="control-char" title="{html.escape(tooltip)}">&#9249;</div>\n')
-            else:
-                char = codepage_byte_to_unicode(byte_val, codepage)
-                char_html = _char_to_html_entity(char)
-                parts.append(f'    <div class="glyph" title="{html.escape(tooltip)}">{char_html}</div>\n')
-    
-    parts.append('    </div>\n')
-    parts.append('    </div>\n')
+    parts.append(_codepage_grid_html(codepage))
 
     # Collation order table
     if collate_payload and len(collate_payload) == 256:
-        parts.append('    <div class="section">\n')
-        parts.append('    <h2>Codepage in Collation Order</h2>\n')
-        parts.append('    <p>Characters sorted by their collation weight (sort order)</p>\n')
-        
-        # Build list of (byte_value, collation_weight)
-        collation_order = [(i, collate_payload[i]) for i in range(256)]
-        # Sort by collation weight, then by byte value for stability
-        collation_order.sort(key=lambda x: (x[1], x[0]))
-        
-        parts.append('    <table class="codepage-grid">\n')
-        parts.append('    <tr><th>Weight</th><th>Dec</th><th>Hex</th><th>Glyph</th><th>Character Name</th></tr>\n')
-        
-        for byte_val, weight in collation_order:
-            if byte_val < 0x20:
-                glyph = get_control_char_glyph(byte_val)
-                glyph_html = _glyph_to_html_entity(glyph)
-                glyph_class = 'control-char'
-            elif byte_val == 0x7F:
-                glyph_html = '&#9249;'
-                glyph_class = 'control-char'
-            else:
-                glyph = codepage_byte_to_unicode(byte_val, codepage)
-                glyph_html = _char_to_html_entity(glyph)
-                glyph_class = 'glyph'
-            
-            char_name = get_char_name(byte_val, codepage)
-            parts.append(f'    <tr><td>{weight}</td><td>{byte_val}</td><td>{byte_val:02X}</td>'
-                        f'<td class="{glyph_class}">{glyph_html}</td>'
-                        f'<td class="char-name">{html.escape(char_name)}</td></tr>\n')
-        
-        parts.append('    </table>\n')
-        parts.append('    </div>\n')
+        parts.append(_collation_table_html(codepage, bytes(collate_payload)))
 
     # UCASE mappings table
     if ucase_payload and len(ucase_payload) >= 128:
-        parts.append('    <div class="section">\n')
-        parts.append('    <h2>Uppercase Mappings (UCASE)</h2>\n')
-        parts.append('    <p>Maps characters 0x80-0xFF to their uppercase equivalents</p>\n')
-        
-        parts.append('    <table class="char-table ucase-table">\n')
-        parts.append('    <tr><th>From (Dec)</th><th>From (Hex)</th><th>Lowercase</th>'
-                    '<th></th><th>Uppercase</th><th>To (Hex)</th><th>To (Dec)</th></tr>\n')
-        
-        for i, upper_byte in enumerate(ucase_payload[:128]):
-            lower_byte = 0x80 + i
-            lower_char = codepage_byte_to_unicode(lower_byte, codepage)
-            upper_char = codepage_byte_to_unicode(upper_byte, codepage)
-            
-            # Only show if there's a mapping change
-            if lower_byte != upper_byte:
-                lower_html = _char_to_html_entity(lower_char)
-                upper_html = _char_to_html_entity(upper_char)
-                parts.append(f'    <tr>\n'
-                            f'        <td>{lower_byte}</td>\n'
-                            f'        <td>{lower_byte:02X}</td>\n'
-                            f'        <td class="glyph">{lower_html}</td>\n'
-                            f'        <td class="arrow">&rarr;</td>\n'
-                            f'        <td class="glyph">{upper_html}</td>\n'
-                            f'        <td>{upper_byte:02X}</td>\n'
-                            f'        <td>{upper_byte}</td>\n'
-                            f'    </tr>\n')
-        
-        parts.append('    </table>\n')
-        parts.append('    </div>\n')
+        parts.append(_ucase_table_html(codepage, bytes(ucase_payload[:128])))
 
     # Footer
     parts.append(f'''
@@ -2315,7 +5594,7 @@ document.addEventListener('DOMContentLoaded', function() {
         <p>Country: {country_code} ({html.escape(country_name)}) | Codepage: {codepage} ({html.escape(codepage_name)})</p>
     </footer>
     
-    <script>{js}</script>
+    {_script_html(assets)}
 </body>
 </html>
 ''')
@@ -2323,142 +5602,24 @@ document.addEventListener('DOMContentLoaded', function() {
     return ''.join(parts)
 
 
-def generate_index_html(entries: List[Tuple[int, str, int, str]], output_dir: str) -> str:
+def generate_index_html(entries: List[Tuple[int, str, int, str]], output_dir: str,
+                        assets: Optional[HtmlAssets] = None,
+                        precompress: Optional[Precompressor] = None) -> str:
     """
     Generate an index.html file listing all country/codepage HTML files.
     
     Args:
         entries: List of (country_num, country_name, codepage, filename) tuples
         output_dir: Directory to write index.html to
+        assets: Shared asset files to link the theme script from (None =
+            inline); the index stylesheet is always inline
+        precompress: Also (or only) write index.html.gz
     
     Returns:
         Path to the generated index.html file
     """
     # Sort entries by country number
     sorted_entries = sorted(entries, key=lambda x: (x[0], x[2]))
-    
-    # CSS styles (same as individual pages)
-    css = '''
-:root {
-    --bg-color: #f8f9fa;
-    --text-color: #212529;
-    --heading-color: #495057;
-    --table-border: #dee2e6;
-    --table-header-bg: #e9ecef;
-    --table-hover: #f1f3f5;
-    --link-color: #0d6efd;
-}
-
-[data-theme="dark"] {
-    --bg-color: #1a1a2e;
-    --text-color: #e9ecef;
-    --heading-color: #adb5bd;
-    --table-border: #495057;
-    --table-header-bg: #343a40;
-    --table-hover: #2d2d44;
-    --link-color: #6ea8fe;
-}
-
-* {
-    box-sizing: border-box;
-}
-
-body {
-    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-    background-color: var(--bg-color);
-    color: var(--text-color);
-    line-height: 1.6;
-    margin: 0;
-    padding: 20px;
-    max-width: 1200px;
-    margin: 0 auto;
-}
-
-h1 {
-    color: var(--heading-color);
-    border-bottom: 2px solid var(--table-border);
-    padding-bottom: 10px;
-}
-
-.theme-toggle {
-    position: fixed;
-    top: 20px;
-    right: 20px;
-    padding: 8px 16px;
-    background: var(--table-header-bg);
-    border: 1px solid var(--table-border);
-    border-radius: 4px;
-    cursor: pointer;
-    color: var(--text-color);
-    font-size: 14px;
-}
-
-.theme-toggle:hover {
-    background: var(--table-hover);
-}
-
-table {
-    border-collapse: collapse;
-    width: 100%;
-    margin: 1em 0;
-    background: var(--bg-color);
-}
-
-th, td {
-    border: 1px solid var(--table-border);
-    padding: 10px 15px;
-    text-align: left;
-}
-
-th {
-    background: var(--table-header-bg);
-    font-weight: 600;
-}
-
-tr:hover td {
-    background: var(--table-hover);
-}
-
-a {
-    color: var(--link-color);
-    text-decoration: none;
-}
-
-a:hover {
-    text-decoration: underline;
-}
-
-footer {
-    margin-top: 3em;
-    padding-top: 1em;
-    border-top: 1px solid var(--table-border);
-    color: var(--heading-color);
-    font-size: 12px;
-}
-'''
-
-    # JavaScript for theme toggle
-    js = '''
-function toggleTheme() {
-    const html = document.documentElement;
-    const currentTheme = html.getAttribute('data-theme');
-    const newTheme = currentTheme === 'dark' ? 'light' : 'dark';
-    html.setAttribute('data-theme', newTheme);
-    localStorage.setItem('theme', newTheme);
-    updateToggleButton(newTheme);
-}
-
-function updateToggleButton(theme) {
-    const btn = document.getElementById('theme-toggle');
-    btn.textContent = theme === 'dark' ? '☀️ Light Mode' : '🌙 Dark Mode';
-}
-
-document.addEventListener('DOMContentLoaded', function() {
-    const savedTheme = localStorage.getItem('theme') || 'light';
-    document.documentElement.setAttribute('data-theme', savedTheme);
-    updateToggleButton(savedTheme);
-});
-'''
 
     # Build HTML
     parts = [f'''<!DOCTYPE html>
@@ -2467,7 +5628,7 @@ document.addEventListener('DOMContentLoaded', function() {
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>DOS Codepage Reference - Index</title>
-    <style>{css}</style>
+    {_style_html(HTML_INDEX_CSS, None)}
 </head>
 <body>
     <button id="theme-toggle" class="theme-toggle" onclick="toggleTheme()">🌙 Dark Mode</button>
@@ -2500,20 +5661,106 @@ document.addEventListener('DOMContentLoaded', function() {
         <p>Total entries: {len(sorted_entries)}</p>
     </footer>
     
-    <script>{js}</script>
+    {_script_html(assets)}
 </body>
 </html>
 ''')
 
     filepath = os.path.join(output_dir, 'index.html')
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(''.join(parts))
+    _write_output(filepath, ''.join(parts), os.linesep, precompress)
     
     return filepath
 
 
+class _PageWriter:
+    """
+    Writes rendered pages on a background thread, through a bounded queue.
+
+    put() blocks while the queue is full, so together with the render
+    window of _render_pages() no more than maxsize + window rendered pages
+    are held in memory. A write error is raised again by close().
+    """
+
+    def __init__(self, maxsize: int, precompress: Optional[Precompressor] = None) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._precompress = precompress
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="html-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is None:
+                try:
+                    _write_html_page(*item, self._precompress)
+                except BaseException as e:
+                    self._error = e
+
+    def put(self, filepath: str, html_content: str) -> None:
+        """Queue a page for writing."""
+        self._queue.put((filepath, html_content))
+
+    def close(self) -> None:
+        """Wait until all queued pages are written."""
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def _render_pages(pages: List[HtmlPage], assets: Optional[HtmlAssets], jobs: int,
+                  window: int) -> Iterator[str]:
+    """
+    Render pages in order, in a process pool of jobs workers if jobs > 1.
+
+    Args:
+        pages: Pages to render
+        assets: Shared asset files to link (None = inline CSS/JS)
+        jobs: Worker processes (1 = render in this process)
+        window: Most pages submitted to the pool ahead of the one being
+            consumed; the next page is only submitted once one is taken
+
+    Returns:
+        Iterator of the rendered documents, in the order of pages
+    """
+    if jobs <= 1 or len(pages) <= 1:
+        for page in pages:
+            yield render_html_page(page, assets)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(pages))) as pool:
+        todo = iter(pages)
+        pending = collections.deque(pool.submit(render_html_page, page, assets)
+                                    for page in itertools.islice(todo, window))
+        while pending:
+            html_content = pending.popleft().result()
+            for page in itertools.islice(todo, 1):
+                pending.append(pool.submit(render_html_page, page, assets))
+            yield html_content
+
+
+@dataclass
+class HtmlOutput:
+    """
+    Files written by generate_html_files().
+
+    Attributes:
+        pages: HTML files written (country/codepage pages and index.html)
+        assets: Shared CSS/JS files written (external assets only)
+        unchanged: HTML files skipped because their inputs are unchanged
+    """
+    pages: List[str] = field(default_factory=list)
+    assets: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+
 def generate_html_files(doc: ParsedCountrySys, output_dir: str,
-                       country: Optional[int], codepage: Optional[int]) -> List[str]:
+                       country: Optional[int], codepage: Optional[int],
+                       jobs: int = 1, incremental: bool = True,
+                       external_assets: bool = False,
+                       precompress: Optional[Precompressor] = None) -> HtmlOutput:
     """
     Generate HTML files for all (filtered) country/codepage entries.
     
@@ -2522,32 +5769,118 @@ def generate_html_files(doc: ParsedCountrySys, output_dir: str,
         output_dir: Directory to write HTML files to
         country: Filter by country code (None = no filter)
         codepage: Filter by codepage (None = no filter)
+        jobs: Worker processes rendering pages (1 = render in this process)
+        incremental: Skip files whose inputs are unchanged since the last
+            run (False = rewrite everything; stale pages are deleted either
+            way)
+        external_assets: Write the page CSS and theme JavaScript once, as
+            fingerprinted style.<hash>.css and theme.<hash>.js files that
+            every page links (False = inline them into every page)
+        precompress: Write a gzip .gz sibling of (or instead of) each file,
+            and print a compression summary at the end
     
     Returns:
-        List of generated file paths
+        HtmlOutput with the written page and asset paths (.gz paths when
+        precompress replaces the uncompressed files) and the number of
+        pages skipped as unchanged
+
+    Note:
+        With jobs > 1, each worker gets only the HtmlPage data of its pages
+        and returns the rendered text; pages are written by one writer
+        thread, in entry order. At most 2 * jobs pages are rendering and
+        2 * jobs waiting for the writer at any time. The files are
+        identical to a serial run.
+
+        Every run records the input hash of each output file (see
+        HtmlPage.input_hash()) in HTML_MANIFEST_NAME in output_dir. Only
+        files listed there are ever deleted as stale, and only by runs
+        without a country/codepage/entry filter.
     """
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
     
-    entries = filter_entries(doc.entries, country, codepage)
-    generated_files = []
+    # One page per (country, codepage); a repeated pair would overwrite the
+    # page of its first entry, so only the first occurrence is rendered
+    by_key = doc.entries_for(country, codepage)
+    output = HtmlOutput()
     index_entries = []
     
-    for entry in entries:
-        entry_info = generate_html_file(entry, output_dir)
-        country_num, country_name, cp, filename = entry_info
-        filepath = os.path.join(output_dir, filename)
-        generated_files.append(filepath)
-        index_entries.append(entry_info)
-        print(f"Generated: {filepath}")
+    for key, shadowed in doc.duplicate_keys.items():
+        if key in by_key:
+            for e in shadowed:
+                print(f"Skipped duplicate: {key[0]}:{key[1]} at {e.offset:#06x}")
+    
+    pages = [HtmlPage.from_entry(entry) for entry in by_key.values()]
+    old_manifest = _load_html_manifest(output_dir)
+    filtered = country is not None or codepage is not None or doc.entry_filter is not None
+    # A filtered run leaves the pages it does not generate alone
+    manifest = dict(old_manifest) if filtered else {}
+    # Which files exist depends on the precompress mode, so it is hashed too
+    variant = None if precompress is None else ("gz" if precompress.replace else "html+gz")
+    suffix = ".gz" if precompress is not None and precompress.replace else ""
+
+    def up_to_date(name: str, digest: str) -> bool:
+        manifest[name] = digest = _json_hash([digest, variant]) if variant else digest
+        # A rebuild rewrites every file but still tracks (and removes) stale ones
+        return (incremental and old_manifest.get(name) == digest
+                and _output_exists(os.path.join(output_dir, name), precompress))
+
+    assets = HtmlAssets.fingerprinted() if external_assets and pages else None
+    if assets is not None:
+        # Content-addressed names: an existing file is already up to date
+        for name, text in assets.contents().items():
+            if not up_to_date(name, _text_fingerprint(text)):
+                filepath = os.path.join(output_dir, name)
+                _write_output(filepath, text, "\n", precompress)
+                output.assets.append(filepath + suffix)
+                print(f"Generated: {filepath + suffix}")
+    todo = []
+    for page in pages:
+        index_entries.append(page.index_info())
+        if not up_to_date(page.filename, page.input_hash(assets)):
+            todo.append(page)
+    output.unchanged = len(pages) - len(todo)
+
+    window = 2 * max(jobs, 1)
+    writer = _PageWriter(maxsize=window, precompress=precompress)
+    rendered = _render_pages(todo, assets, jobs, window)
+    try:
+        # Rendered in submission order, so output order is deterministic
+        for page, html_content in zip(todo, rendered):
+            filepath = os.path.join(output_dir, page.filename)
+            writer.put(filepath, html_content)
+            output.pages.append(filepath + suffix)
+            print(f"Generated: {filepath + suffix}")
+    finally:
+        rendered.close()
+        writer.close()
     
     # Generate index.html
     if index_entries:
-        index_path = generate_index_html(index_entries, output_dir)
-        generated_files.append(index_path)
-        print(f"Generated: {index_path}")
+        index_hash = _json_hash(
+            [HTML_GENERATOR_VERSION, sorted(index_entries, key=lambda x: (x[0], x[2])),
+             assets.js if assets is not None else None])
+        if not up_to_date("index.html", index_hash):
+            index_path = generate_index_html(index_entries, output_dir, assets, precompress) + suffix
+            output.pages.append(index_path)
+            print(f"Generated: {index_path}")
+        else:
+            output.unchanged += 1
+
+    # Pages of entries that are gone
+    for name in sorted(old_manifest.keys() - manifest.keys()):
+        if os.path.basename(name) != name:
+            continue
+        for filepath in (os.path.join(output_dir, name), os.path.join(output_dir, name + ".gz")):
+            if os.path.isfile(filepath):
+                os.remove(filepath)
+                print(f"Removed stale: {filepath}")
+
+    _save_html_manifest(output_dir, manifest)
+    if precompress is not None:
+        print(precompress.summary())
     
-    return generated_files
+    return output
 
 
 # ====
@@ -2568,58 +5901,132 @@ def main(argv: Optional[List[str]] = None) -> int:
         description="Parse and compare DOS COUNTRY.SYS files (MS-DOS family format).",
         epilog="By default, entries and subfunctions are sorted for consistent output. "
                "Use --unsorted to preserve original file order. "
-               "Use --compare to diff two COUNTRY.SYS files. "
+               "Use --compare to diff two COUNTRY.SYS files, --compare-many for more. "
                "Use --html to generate HTML output files."
     )
     ap.add_argument("file", nargs='?', help="Path to COUNTRY.SYS (for single-file display)")
     ap.add_argument("--compare", nargs=2, metavar=("FILE1", "FILE2"),
                     help="Compare two COUNTRY.SYS files")
+    ap.add_argument("--compare-many", nargs="+", metavar="FILE",
+                    help="Compare two or more COUNTRY.SYS files by block content hash, "
+                         "showing only diverging (country, codepage, subfunction) keys; "
+                         "honours --json/--jsonl")
     ap.add_argument("--summary", action="store_true", help="Print a concise entry list")
     ap.add_argument("--json", action="store_true", help="Emit JSON")
+    ap.add_argument("--jsonl", action="store_true",
+                    help="Emit JSON Lines, one record per line (one per entry, or per diff "
+                         "record with --compare)")
+    ap.add_argument("--jsonl-per-subfunc", action="store_true",
+                    help="With --jsonl (single file): one record per subfunction instead of per entry")
+    ap.add_argument("--payload-encoding", choices=PAYLOAD_ENCODINGS,
+                    help="With --json/--jsonl (single file): write tagged payloads as hex (default), "
+                         "base64, not at all (none), or once per distinct block in a \"blocks\" "
+                         "table that subfunctions refer to by content hash (ref)")
+    ap.add_argument("--max-diffs", type=_non_negative_int_arg, metavar="N",
+                    help="With --compare --json/--jsonl: emit at most N items per diff list "
+                         "(totals are still reported)")
     ap.add_argument("--html", action="store_true", help="Generate HTML output files")
     ap.add_argument("--output-dir", default=".", metavar="DIR",
                     help="Output directory for HTML files (default: current directory)")
+    ap.add_argument("--rebuild", action="store_true",
+                    help="With --html: rewrite all files, even those unchanged since the last run")
+    ap.add_argument("--html-assets", choices=("inline", "external"), default="inline",
+                    help="With --html: inline CSS/JS into every page (default), or write them once "
+                         "as fingerprinted style.<hash>.css/theme.<hash>.js files that pages link")
+    ap.add_argument("--precompress", action="store_true",
+                    help="With --html: gzip every written file to a .gz sibling and print the compression ratio")
+    ap.add_argument("--precompress-mode", choices=("alongside", "replace"),
+                    help="With --precompress: keep the uncompressed files next to the .gz files "
+                         "(alongside, default) or write only the .gz files (replace)")
+    ap.add_argument("--jobs", type=_positive_int_arg, default=1, metavar="N",
+                    help="With --html: render pages in N worker processes (default: 1)")
     ap.add_argument("--unsorted", action="store_true",
                     help="Preserve original file order (default: sort by country/codepage and subfunction ID)")
     ap.add_argument("--no-offsets", action="store_true", help="Suppress offsets in output")
     ap.add_argument("--strict", action="store_true", help="Treat validation issues as fatal where possible")
-    ap.add_argument("--country", type=int, help="Filter by country code")
-    ap.add_argument("--codepage", type=int, help="Filter by codepage")
+    ap.add_argument("--mmap", action="store_true",
+                    help="Memory-map input file(s) and parse without copying table payloads")
+    ap.add_argument("--lazy", action="store_true",
+                    help="Decode subfunctions only when the output needs them "
+                         "(warnings then only cover what was decoded)")
+    ap.add_argument("--diag-level", choices=list(DIAG_LEVELS), default="info",
+                    help="Only report diagnostics at or above this level (default: info)")
+    ap.add_argument("--budget", action="store_true",
+                    help="Bound parse work and diagnostics in proportion to the file size "
+                         "(for untrusted input); output may then be partial")
+    ap.add_argument("--max-structures", type=_non_negative_int_arg, metavar="N",
+                    help="Cap on entries/subfunctions/tagged references visited (implies --budget)")
+    ap.add_argument("--max-bytes", type=_non_negative_int_arg, metavar="N",
+                    help="Cap on bytes of records and payloads decoded (implies --budget)")
+    ap.add_argument("--max-diagnostics", type=_non_negative_int_arg, metavar="N",
+                    help="Cap on distinct diagnostics kept (implies --budget)")
+    ap.add_argument("--country", type=_int_ranges_arg, metavar="LIST",
+                    help="Filter by country code(s), e.g. 49 or 1,33,40-49")
+    ap.add_argument("--codepage", type=_int_ranges_arg, metavar="LIST",
+                    help="Filter by codepage(s), e.g. 850 or 437,850-860")
+    ap.add_argument("--subfunc", type=_int_ranges_arg, metavar="LIST",
+                    help="Only parse and show these subfunction IDs, e.g. 1,35")
     args = ap.parse_args(argv)
+    if args.payload_encoding is not None and (args.compare or args.compare_many or args.html
+                                              or not (args.json or args.jsonl)):
+        ap.error("--payload-encoding only applies to single-file --json/--jsonl output")
+    if args.precompress_mode is not None and not args.precompress:
+        ap.error("--precompress-mode requires --precompress")
+
+    # Determine mode: compare, N-way compare or single-file display
+    if args.compare_many:
+        if len(args.compare_many) < 2:
+            ap.error("--compare-many needs at least two files")
+        for fpath in args.compare_many:
+            error = _input_file_error(fpath)
+            if error:
+                print(f"Error: {error}", file=sys.stderr)
+                return 1
+        try:
+            matrix = compare_many(args.compare_many, args)
+        except (OSError, ValidationError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        if args.jsonl:
+            write_compare_matrix_jsonl(matrix, sys.stdout.write)
+        elif args.json:
+            write_compare_matrix_json(matrix, sys.stdout.write)
+        else:
+            print_compare_matrix(matrix)
+        return 0
 
-    # Determine mode: compare or single-file display
-    if args.compare:
+    elif args.compare:
         # Compare mode
         file_a, file_b = args.compare
         
         # Validate both files
         for fpath in [file_a, file_b]:
-            path = Path(fpath)
-            if not path.exists():
-                print(f"Error: File not found: {fpath}", file=sys.stderr)
-                return 1
-            if not path.is_file():
-                print(f"Error: Not a regular file: {fpath}", file=sys.stderr)
-                return 1
-            if path.stat().st_size == 0:
-                print(f"Error: File is empty: {fpath}", file=sys.stderr)
+            error = _input_file_error(fpath)
+            if error:
+                print(f"Error: {error}", file=sys.stderr)
                 return 1
         
         # Parse both files
-        try:
-            with open(file_a, "rb") as f:
-                buf_a = f.read()
-            doc_a = parse_country_sys(buf_a, strict=args.strict)
+        with contextlib.ExitStack() as stack:
+            try:
+                doc_a = _load_country_sys(stack, file_a, args)
+                doc_b = _load_country_sys(stack, file_b, args)
+            except (OSError, ValidationError) as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
             
-            with open(file_b, "rb") as f:
-                buf_b = f.read()
-            doc_b = parse_country_sys(buf_b, strict=args.strict)
-        except (OSError, ValidationError) as e:
-            print(f"Error: {e}", file=sys.stderr)
-            return 1
-        
-        # Compare and output
-        compare_country_sys(doc_a, doc_b, file_a, file_b, args.country, args.codepage)
+            # Compare and output (filters were applied while parsing)
+            try:
+                if args.json or args.jsonl:
+                    diff = diff_country_sys(doc_a, doc_b, file_a, file_b)
+                    render = write_compare_jsonl if args.jsonl else write_compare_json
+                    render(diff, sys.stdout.write, args.max_diffs)
+                else:
+                    compare_country_sys(doc_a, doc_b, file_a, file_b)
+            except ValidationError as e:
+                # Only reachable with --lazy --strict
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
         return 0
     
     else:
@@ -2629,55 +6036,157 @@ def main(argv: Optional[List[str]] = None) -> int:
         
         # Input validation: check file exists, is a regular file, and is not empty
         file_path = Path(args.file)
-        if not file_path.exists():
-            print(f"Error: File not found: {args.file}", file=sys.stderr)
-            return 1
-        if not file_path.is_file():
-            print(f"Error: Not a regular file: {args.file}", file=sys.stderr)
-            return 1
-        if file_path.stat().st_size == 0:
-            print(f"Error: File is empty: {args.file}", file=sys.stderr)
+        error = _input_file_error(args.file)
+        if error:
+            print(f"Error: {error}", file=sys.stderr)
             return 1
 
         # Read and parse file
-        try:
-            with open(file_path, "rb") as f:
-                buf = f.read()
-            doc = parse_country_sys(buf, strict=args.strict)
-        except (OSError, ValidationError) as e:
-            print(f"Error: {e}", file=sys.stderr)
-            return 1
+        with contextlib.ExitStack() as stack:
+            try:
+                doc = _load_country_sys(stack, file_path, args)
+            except (OSError, ValidationError) as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
+            try:
+                return _output_single(doc, args)
+            except ValidationError as e:
+                # Only reachable with --lazy --strict
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
 
-        # HTML output mode
-        if args.html:
-            generated = generate_html_files(doc, args.output_dir, args.country, args.codepage)
-            print(f"\nGenerated {len(generated)} HTML file(s) in {args.output_dir}")
-            return 0
 
-        # Output in requested format
-        if args.json:
-            print(json.dumps(to_jsonable(doc), indent=2))
-            return 0
+def _input_file_error(fpath: str) -> Optional[str]:
+    """Return why fpath cannot be used as input (missing, not a file, empty), or None."""
+    path = Path(fpath)
+    if not path.exists():
+        return f"File not found: {fpath}"
+    if not path.is_file():
+        return f"Not a regular file: {fpath}"
+    if path.stat().st_size == 0:
+        return f"File is empty: {fpath}"
+    return None
 
-        if args.summary:
-            print_summary(doc, unsorted=args.unsorted, no_offsets=args.no_offsets,
-                          country=args.country, codepage=args.codepage)
-        else:
-            print_default(doc, unsorted=args.unsorted, no_offsets=args.no_offsets,
-                          country=args.country, codepage=args.codepage)
-
-        # Copyright / Version detection and display
-        copyright_info = find_copyright_and_version(buf)
-        if copyright_info:
-            print("\n# ====")
-            print("# End of file string (copyright/version data)")
-            print("#")
-            print(f"# COPYRIGHT: {copyright_info['copyright']}")
-            if "version" in copyright_info:
-                print(f"# VERSION: {copyright_info['version']}")
 
+def _non_negative_int_arg(text: str) -> int:
+    """argparse type for counts and caps: an integer >= 0."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {text!r}") from None
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be >= 0, got {value}")
+    return value
+
+
+def _positive_int_arg(text: str) -> int:
+    """argparse type for worker counts: an integer >= 1."""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {text!r}") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be >= 1, got {value}")
+    return value
+
+
+def _int_ranges_arg(text: str) -> Tuple[Tuple[int, int], ...]:
+    """argparse type for --country/--codepage/--subfunc (see parse_int_ranges)."""
+    try:
+        return parse_int_ranges(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _load_country_sys(stack: contextlib.ExitStack, path: Union[str, os.PathLike],
+                      args: argparse.Namespace) -> ParsedCountrySys:
+    """
+    Parse a COUNTRY.SYS file for the CLI, honoring --mmap, --lazy, --diag-level,
+    --budget and the --country/--codepage/--subfunc filters (applied while parsing).
+
+    Args:
+        stack: ExitStack that owns the file mapping (if any)
+        path: Path to COUNTRY.SYS
+        args: Parsed command-line arguments
+
+    Returns:
+        ParsedCountrySys for the file
+    """
+    diagnostics = Diagnostics(args.diag_level)
+    entry_filter = None
+    if args.country is not None or args.codepage is not None or args.subfunc is not None:
+        entry_filter = EntryFilter(countries=args.country, codepages=args.codepage, subfuncs=args.subfunc)
+    budget = None
+    # An explicit cap turns the budget on: it is never silently ignored
+    caps = {name: getattr(args, name) for name in ("max_structures", "max_bytes", "max_diagnostics")
+            if getattr(args, name) is not None}
+    if args.budget or caps:
+        budget = replace(ParseBudget.for_size(os.stat(path).st_size), **caps)
+    if args.mmap:
+        return stack.enter_context(open_country_sys(path, strict=args.strict, lazy=args.lazy,
+                                                    diagnostics=diagnostics, budget=budget,
+                                                    entry_filter=entry_filter))
+    with open(path, "rb") as f:
+        buf = f.read()
+    parse = parse_country_sys_lazy if args.lazy else parse_country_sys
+    return parse(buf, strict=args.strict, diagnostics=diagnostics, budget=budget, entry_filter=entry_filter)
+
+
+def _output_single(doc: ParsedCountrySys, args: argparse.Namespace) -> int:
+    """
+    Emit single-file output in the format selected on the command line.
+
+    Args:
+        doc: Parsed COUNTRY.SYS data
+        args: Parsed command-line arguments
+
+    Returns:
+        Exit code (0 = success)
+    """
+    # HTML output mode
+    # Filters were applied while parsing, so doc only holds the selected entries
+    if args.html:
+        external_assets = args.html_assets == "external"
+        generated = generate_html_files(doc, args.output_dir, None, None, jobs=args.jobs,
+                                        incremental=not args.rebuild,
+                                        external_assets=external_assets,
+                                        precompress=Precompressor(replace=args.precompress_mode == "replace")
+                                        if args.precompress else None)
+        counts = [f"{len(generated.pages)} HTML file(s)"]
+        if external_assets:
+            counts.append(f"{len(generated.assets)} asset(s)")
+        counts.append(f"{generated.unchanged} unchanged")
+        print(f"\nGenerated {', '.join(counts)} in {args.output_dir}")
+        return 0
+
+    # Output in requested format
+    if args.jsonl:
+        write_country_sys_jsonl(doc, sys.stdout.write, per_subfunc=args.jsonl_per_subfunc,
+                                payload_encoding=args.payload_encoding or "hex")
+        return 0
+    if args.json:
+        write_country_sys_json(doc, sys.stdout.write, payload_encoding=args.payload_encoding or "hex")
         return 0
 
+    if args.summary:
+        print_summary(doc, unsorted=args.unsorted, no_offsets=args.no_offsets,
+                      country=None, codepage=None)
+    else:
+        print_default(doc, unsorted=args.unsorted, no_offsets=args.no_offsets,
+                      country=None, codepage=None)
+
+    # Copyright / Version detection and display
+    copyright_info = doc.census.trailer
+    if copyright_info:
+        print("\n# ====")
+        print("# End of file string (copyright/version data)")
+        print("#")
+        print(f"# COPYRIGHT: {copyright_info['copyright']}")
+        if "version" in copyright_info:
+            print(f"# VERSION: {copyright_info['version']}")
+
+    return 0
+
 
 if __name__ == "__main__":
     raise SystemExit(main())
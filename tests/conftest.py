@@ -0,0 +1,85 @@
+"""
+Shared fixtures: small synthetic COUNTRY.SYS files built with
+tools/synthcountry.py, so the tests run without nasm.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools")]
+
+import synthcountry  # noqa: E402
+from synthcountry import build_country_sys, standard_subfuncs  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+GERMAN = dict(date_format=1, currency=b"EUR", thousands=b".", decimal=b",", date_sep=b".",
+              time_format=1, data_sep=b";")
+
+
+def fixture_entries():
+    """US/437, NL/437, DE/850 and DE/437; the tables are shared as in country.asm."""
+    return [
+        (1, 437, standard_subfuncs(1, 437)),
+        (31, 437, standard_subfuncs(31, 437, date_format=1, currency=b"EUR")),
+        (49, 850, standard_subfuncs(49, 850, **GERMAN)),
+        (49, 437, standard_subfuncs(49, 437, **GERMAN)),
+    ]
+
+
+def fixture_entries_b():
+    """
+    fixture_entries() as changed in a later build: NL/437 gone, FR/850
+    new, one UCASE byte of US/437 changed, DE/850 with a different date
+    separator, a swapped pair of COLLATE weights and "S" for yes.
+    """
+    entries = fixture_entries()
+    us = dict(entries[0][2])
+    ucase = bytearray(synthcountry.UCASE_437)
+    ucase[3] = 0x41 + 1
+    us[2] = ("UCASE", bytes(ucase))
+    de = dict(standard_subfuncs(49, 850, **dict(GERMAN, date_sep=b"/")))
+    collate = bytearray(synthcountry.COLLATE_850)
+    collate[0x41], collate[0x42] = collate[0x42], collate[0x41]
+    de[6] = ("COLLATE", bytes(collate))
+    de[35] = ("YESNO", b"S\x00N\x00")
+    return [
+        (1, 437, us),
+        (49, 850, de),
+        (49, 437, entries[3][2]),
+        (33, 850, standard_subfuncs(33, 850, date_format=1, currency=b"EUR")),
+    ]
+
+
+@pytest.fixture
+def country_sys():
+    """Contents of the synthetic test file."""
+    return build_country_sys(fixture_entries())
+
+
+@pytest.fixture
+def country_sys_b():
+    """Contents of the changed build of the synthetic test file."""
+    return build_country_sys(fixture_entries_b())
+
+
+@pytest.fixture
+def country_sys_path(tmp_path, country_sys):
+    path = tmp_path / "country.sys"
+    path.write_bytes(country_sys)
+    return path
+
+
+@pytest.fixture
+def country_sys_b_path(tmp_path, country_sys_b):
+    path = tmp_path / "country_b.sys"
+    path.write_bytes(country_sys_b)
+    return path
+
+
+def read_data(name):
+    with open(os.path.join(DATA_DIR, name), encoding="utf-8", newline="") as f:
+        return f.read()
@@ -0,0 +1,25 @@
+"""Offset-keyed tagged block cache (TaggedBlockCache)."""
+
+from cntrydump import parse_country_sys
+
+
+def test_shared_blocks_parse_once(country_sys):
+    doc = parse_country_sys(country_sys)
+    stats = doc.cache_stats
+    assert stats.references == 4 * 7
+    # 4 CTYINFO, UCASE 437/850, FCHAR, COLLATE 437/850, DBCS, YESNO Y/N and J/N
+    assert stats.unique_blocks == 12
+    assert stats.hits == stats.references - stats.unique_blocks
+    us, nl = doc.entries[0], doc.entries[1]
+    assert us.subfuncs[1].tagged is nl.subfuncs[1].tagged
+    # Same block as sf 2 and sf 4: parsed once, decoded per subfunction ID
+    assert us.subfuncs[1].tagged is us.subfuncs[2].tagged
+
+
+def test_shared_block_diagnostics_are_counted_per_reference(country_sys):
+    bad = country_sys.replace(b"\xffFCHAR  ", b"\xffFCHAX  ")
+    doc = parse_country_sys(bad)
+    mismatches = [d for d in doc.diagnostics if d.code == "magic-mismatch"]
+    assert len(mismatches) == 1
+    assert mismatches[0].count == 4
+    assert doc.warnings[0].endswith("(4 references)")
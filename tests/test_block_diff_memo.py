@@ -0,0 +1,43 @@
+"""Memoized table comparisons (BlockDiffMemo) in diff_country_sys()."""
+
+from cntrydump import BlockDiffMemo, diff_country_sys, parse_country_sys
+
+
+def sf(doc, row, sf_id):
+    return next(s.tagged for s in doc.entries[row].subfuncs if s.subfunc_id == sf_id)
+
+
+def test_identical_digests_are_skipped(country_sys):
+    doc = parse_country_sys(country_sys)
+    memo = BlockDiffMemo()
+    assert memo.compare_table(2, sf(doc, 0, 2), sf(doc, 1, 2), (1, 437)) is None
+    assert (memo.comparisons, memo.identical, memo.pairs) == (1, 1, {})
+
+
+def test_pairs_are_shared_between_entries(country_sys, country_sys_b):
+    a, b = parse_country_sys(country_sys), parse_country_sys(country_sys_b)
+    memo = BlockDiffMemo()
+    first = memo.compare_table(6, sf(a, 2, 6), sf(b, 1, 6), (49, 850))
+    again = memo.compare_table(6, sf(a, 2, 6), sf(b, 1, 6), (50, 850))
+    assert again is first
+    assert first.entries == [(49, 850), (50, 850)]
+    assert first.diff.spans == ((0x41, 0x43),)
+    assert [m[0] for m in first.collation.moved] == [0x41, 0x42]
+    # The same blocks compared as another subfunction: a separate pair, same ByteDiff
+    other = memo.compare_table(2, sf(a, 2, 6), sf(b, 1, 6), (49, 850))
+    assert other is not first
+    assert other.diff is first.diff
+    assert other.collation is None
+    assert memo.comparisons == 3 and memo.identical == 0 and len(memo.pairs) == 2
+
+
+def test_size_change_has_no_byte_diff(country_sys):
+    doc = parse_country_sys(country_sys)
+    pair = BlockDiffMemo().compare_table(2, sf(doc, 0, 2), sf(doc, 0, 5), (1, 437))
+    assert (pair.size_a, pair.size_b, pair.diff) == (128, 22, None)
+
+
+def test_diff_country_sys_tables(country_sys, country_sys_b):
+    diff = diff_country_sys(parse_country_sys(country_sys), parse_country_sys(country_sys_b), "a", "b")
+    assert [(t.sf_id, t.entries) for t in diff.tables] == [(2, [(1, 437)]), (6, [(49, 850)])]
+    assert diff.table_comparisons > len(diff.tables)
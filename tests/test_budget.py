@@ -0,0 +1,116 @@
+"""Work budget (ParseBudget) and the region map of a budgeted parse."""
+
+import json
+import struct
+
+import pytest
+
+import cntrydump
+from cntrydump import Diagnostics, ParseBudget, _BudgetExhausted, _ParseGuard, parse_country_sys
+
+# First subfunction entry of the synthetic file: after the 0x17-byte file
+# header, the entry table (count WORD + 4 * 14 bytes) and the count WORD of
+# the first subfunction header
+SF_DATA_PTR = 0x17 + 2 + 4 * 14 + 2 + 4
+
+
+def set_first_data_ptr(buf, linear):
+    out = bytearray(buf)
+    struct.pack_into("<I", out, SF_DATA_PTR, linear)
+    return bytes(out)
+
+
+def test_charge():
+    diag = Diagnostics()
+    guard = _ParseGuard(ParseBudget(max_structures=3, max_bytes=100), diag)
+    guard.charge(3, 100)
+    assert not guard.exhausted
+    with pytest.raises(_BudgetExhausted):
+        guard.charge(1, 0)
+    assert guard.exhausted
+    with pytest.raises(_BudgetExhausted):
+        guard.charge(0, 1)
+    # Reported once, whichever cap is hit later
+    assert diag.messages() == ["parse budget exceeded: more than 3 structures; result is partial"]
+
+
+def test_claim():
+    diag = Diagnostics()
+    guard = _ParseGuard(ParseBudget(), diag)
+    guard.claim("file header", 0, 0x17)
+    guard.claim("subfunc header", 0x100, 0x110)
+    guard.claim("tagged block", 0x200, 0x300)
+    guard.claim("tagged block", 0x200, 0x300)  # shared block
+    assert len(diag) == 0
+    guard.claim("tagged block", 0x280, 0x290)
+    guard.claim("tagged block", 0x10, 0x20)
+    guard.claim("tagged block", 0xF0, 0x108)
+    assert [(d.code, d.args["other_offset"]) for d in diag] == [
+        ("ptr-overlap", 0x200), ("ptr-cycle", 0), ("ptr-cycle", 0x100)]
+
+
+def test_for_size_is_enough_for_wellformed_files(country_sys):
+    doc = parse_country_sys(country_sys, budget=ParseBudget.for_size(len(country_sys)))
+    assert not doc.partial
+    assert not doc.warnings
+    assert len(doc.entries) == 4
+
+
+def test_pointer_cycle(country_sys):
+    bad = set_first_data_ptr(country_sys, 0)
+    doc = parse_country_sys(bad, budget=ParseBudget.for_size(len(bad)))
+    assert doc.diagnostics.counts_by_code()["ptr-cycle"] == 1
+    assert doc.warnings[0] == "tagged block at 0x0 points back into file header at 0x0"
+    # Without a budget there is no region map
+    assert "ptr-cycle" not in parse_country_sys(bad).diagnostics.counts_by_code()
+
+
+def test_pointer_overlap(country_sys):
+    second = struct.unpack_from("<I", country_sys, SF_DATA_PTR + 8)[0]
+    bad = set_first_data_ptr(country_sys, second + 4)
+    doc = parse_country_sys(bad, budget=ParseBudget.for_size(len(bad)))
+    assert "ptr-overlap" in doc.diagnostics.counts_by_code()
+    assert len(doc.entries) == 4
+
+
+@pytest.mark.parametrize("budget, what", [(ParseBudget(max_structures=20), "structures"),
+                                          (ParseBudget(max_bytes=100), "bytes")])
+def test_exhausted_budget_gives_partial_result(country_sys, budget, what):
+    doc = parse_country_sys(country_sys, budget=budget)
+    assert doc.partial
+    assert len(doc.entries) < 4
+    assert doc.diagnostics.counts_by_code() == {"budget-exceeded": 1}
+    assert what in doc.warnings[0]
+
+
+def test_max_diagnostics(country_sys):
+    second = struct.unpack_from("<I", country_sys, SF_DATA_PTR + 8)[0]
+    bad = set_first_data_ptr(country_sys, second + 4)
+    doc = parse_country_sys(bad, budget=ParseBudget(max_diagnostics=2))
+    assert [d.code for d in doc.diagnostics][-1] == "diag-limit"
+    assert len(doc.diagnostics) == 3
+
+
+@pytest.mark.parametrize("options", [["--budget", "--max-structures", "20"], ["--max-structures", "20"],
+                                     ["--max-bytes", "100"]])
+def test_cli_budget(country_sys_path, capsys, options):
+    assert cntrydump.main([str(country_sys_path), "--summary", *options]) == 0
+    captured = capsys.readouterr()
+    assert "parse budget exceeded" in captured.out + captured.err
+
+
+def test_cli_max_diagnostics_alone_enables_budget(country_sys, tmp_path, capsys):
+    second = struct.unpack_from("<I", country_sys, SF_DATA_PTR + 8)[0]
+    path = tmp_path / "bad.sys"
+    path.write_bytes(set_first_data_ptr(country_sys, second + 4))
+    assert cntrydump.main([str(path), "--json", "--max-diagnostics", "1"]) == 0
+    codes = [d["code"] for d in json.loads(capsys.readouterr().out)["diagnostics"]]
+    assert codes[-1] == "diag-limit"
+
+
+@pytest.mark.parametrize("option", ["--max-structures", "--max-bytes", "--max-diagnostics", "--max-diffs"])
+def test_cli_rejects_negative_caps(country_sys_path, option, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cntrydump.main([str(country_sys_path), "--budget", option, "-1"])
+    assert exc.value.code == 2
+    assert "must be >= 0" in capsys.readouterr().err
@@ -0,0 +1,62 @@
+"""Bulk byte diff (diff_bytes) and the "db" row rendering."""
+
+import pytest
+
+from cntrydump import diff_bytes, format_db_diff
+
+
+def naive_positions(a, b):
+    n = min(len(a), len(b))
+    return [i for i in range(n) if a[i] != b[i]] + list(range(n, max(len(a), len(b))))
+
+
+@pytest.mark.parametrize("a, b, spans", [
+    (b"", b"", ()),
+    (b"abc", b"abc", ()),
+    (b"abc", b"abd", ((2, 3),)),
+    (b"\x00bc\x00", b"\x01bd\x00", ((0, 1), (2, 3))),
+    (b"abcdef", b"aXYdef", ((1, 3),)),
+    (b"ab", b"abcd", ((2, 4),)),
+    (b"xbcd", b"ab", ((0, 1), (2, 4))),
+])
+def test_spans(a, b, spans):
+    diff = diff_bytes(a, b)
+    assert diff.spans == spans
+    assert bool(diff) == bool(spans)
+    assert diff.count == len(naive_positions(a, b))
+    assert diff.positions(0, max(len(a), len(b))) == naive_positions(a, b)
+
+
+def test_memoryview_input():
+    a = bytes(range(256))
+    b = bytearray(a)
+    b[7] ^= 0xFF
+    b[200:203] = b"xyz"
+    diff = diff_bytes(memoryview(a), memoryview(bytes(b)))
+    assert diff.spans == ((7, 8), (200, 203))
+    assert diff.size_a == diff.size_b == 256
+
+
+def test_rows_and_positions():
+    a = bytes(32)
+    b = bytearray(a)
+    for i in (3, 7, 8, 30):
+        b[i] = 1
+    diff = diff_bytes(a, bytes(b))
+    assert diff.rows() == [0, 1, 3]
+    assert diff.rows(limit=2) == [0, 1]
+    assert diff.rows(per_row=16) == [0, 1]
+    assert diff.positions(4, 9) == [7, 8]
+    assert diff.positions(9, 30) == []
+
+
+def test_format_db_diff():
+    a = bytes(range(16))
+    b = a[:9] + b"\xff" + a[10:]
+    diff = diff_bytes(a, b)
+    lines = format_db_diff(a, b, diff, diff.rows())
+    assert lines == [
+        "    Line 1 (bytes 8-15):",
+        "      A: db   8   9  10  11  12  13  14  15",
+        "      B: db   8 255  10  11  12  13  14  15",
+    ]
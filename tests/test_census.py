@@ -0,0 +1,49 @@
+"""Tagged block census: signature scan, trailer and orphan blocks."""
+
+from synthcountry import tagged
+
+from cntrydump import EntryFilter, census_tagged_blocks, find_copyright_and_version, parse_country_sys
+
+
+def test_census_finds_every_block(country_sys):
+    census = census_tagged_blocks(country_sys)
+    magics = [b.magic for b in census.blocks]
+    assert magics.count("CTYINFO") == 4
+    assert magics.count("UCASE") == 2
+    assert magics[-1] == "VERSION"
+    assert len(census.blocks) == 13
+    assert not any(b.truncated for b in census.blocks)
+    assert census.trailer == {"copyright": "FreeDOS", "version": "2.0"}
+    assert census.trailer == find_copyright_and_version(memoryview(country_sys))
+    assert census == census_tagged_blocks(memoryview(country_sys))
+
+
+def test_orphans(country_sys):
+    doc = parse_country_sys(country_sys)
+    assert [b.magic for b in doc.orphan_blocks] == ["VERSION"]
+    extra = tagged("UCASE", bytes(range(128, 256)) + b"x")
+    version = doc.census.blocks[-1].offset
+    doc = parse_country_sys(country_sys[:version] + extra + country_sys[version:])
+    assert [(b.offset, b.magic) for b in doc.orphan_blocks] == [(version, "UCASE"), (version + len(extra), "VERSION")]
+    assert doc.census.trailer["version"] == "2.0"
+
+
+def test_orphans_with_filter(country_sys):
+    doc = parse_country_sys(country_sys, entry_filter=EntryFilter.parse(country="1"))
+    # CTYINFO of the three skipped entries, the 850 tables and YESNO J/N
+    assert sorted(b.magic for b in doc.orphan_blocks) == ["COLLATE", "CTYINFO", "CTYINFO", "CTYINFO",
+                                                          "UCASE", "VERSION", "YESNO"]
+
+
+def test_truncated_and_aramode_blocks():
+    buf = tagged("DBCS", b"") + b"\x00\x00" + tagged("ARAMODE", b"\x01\x00", tag=0x00) + tagged("YESNO", b"Y", size=4)
+    census = census_tagged_blocks(buf)
+    assert [(b.magic, b.tag) for b in census.blocks] == [("DBCS", 0xFF), ("ARAMODE", 0x00), ("YESNO", 0xFF)]
+    assert census.blocks[-1].truncated
+    assert census.blocks[-1].end == len(buf)
+    assert census.trailer is None or "version" not in census.trailer
+
+
+def test_no_trailer():
+    assert census_tagged_blocks(b"").trailer is None
+    assert census_tagged_blocks(b"\x01" * 64).trailer is None
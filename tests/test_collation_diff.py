@@ -0,0 +1,84 @@
+"""COLLATE tables compared as orderings (diff_collation) and --max-diffs."""
+
+import json
+import random
+
+import pytest
+
+import cntrydump
+from cntrydump import (collation_order, diff_collation, diff_country_sys, format_collation_diff,
+                       parse_country_sys, write_compare_json, write_compare_jsonl)
+
+
+def naive_inversions(wa, wb):
+    n = len(wa)
+    return sum(1 for i in range(n) for j in range(i + 1, n)
+               if (wa[i] - wa[j]) * (wb[i] - wb[j]) < 0)
+
+
+def test_collation_order():
+    perm, ranks, ties = collation_order(bytes([3, 1, 3, 0]))
+    assert perm == [3, 1, 0, 2]
+    assert ranks == [2, 1, 2, 0]
+    assert ties == [[0, 2]]
+
+
+def test_same_ordering_is_no_difference():
+    a = bytes(range(0, 200, 2))
+    assert not diff_collation(a, bytes(w + 1 for w in a))
+    assert not diff_collation(a, a)
+    assert diff_collation(a, a[:-1]) is None
+
+
+def test_swap():
+    a = bytes(range(8))
+    b = bytes([0, 1, 3, 2, 4, 5, 6, 7])
+    cd = diff_collation(a, b)
+    assert cd.moved == [(2, 2, 3), (3, 3, 2)]
+    assert cd.inversions == 1
+    assert cd.tau_distance == 1 / 28
+    assert (cd.ties_created, cd.ties_broken) == ([], [])
+
+
+def test_ties():
+    a = bytes([0, 1, 2, 3])
+    b = bytes([0, 1, 1, 3])
+    cd = diff_collation(a, b)
+    assert cd.ties_created == [[1, 2]]
+    assert cd.tied_pairs_created == 1 and cd.tied_pairs_broken == 0
+    # A new tie is not an inversion
+    assert cd.inversions == 0
+    back = diff_collation(b, a)
+    assert back.ties_broken == [[1, 2]]
+    assert format_collation_diff(cd)[0].startswith("Collation: 1 character(s) moved rank, 1 tied pair(s) created")
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_inversions_match_pairwise_count(seed):
+    rng = random.Random(seed)
+    a = bytes(rng.randrange(40) for _ in range(97))
+    b = bytes(rng.randrange(40) for _ in range(97))
+    assert diff_collation(a, b).inversions == naive_inversions(a, b)
+
+
+def test_max_diffs_keeps_table_references_valid(country_sys, country_sys_b):
+    diff = diff_country_sys(parse_country_sys(country_sys), parse_country_sys(country_sys_b), "a", "b")
+    out = []
+    write_compare_json(diff, out.append, max_diffs=1)
+    doc = json.loads("".join(out))
+    assert len(doc["tables"]) == 1
+    # DE/850 refers to table 1, which was cut; US/437 (table 0) is kept
+    assert [(e["country"], e["codepage"]) for e in doc["entries"]] == [(1, 437)]
+    assert doc["counts"]["entries_dropped"] == 1
+    assert doc["counts"]["truncated"]
+    out = []
+    write_compare_jsonl(diff, out.append, max_diffs=1)
+    records = [json.loads(line) for line in "".join(out).splitlines()]
+    tables = {r["index"] for r in records if r["type"] == "table"}
+    refs = {s["table"] for r in records if r["type"] == "entry" for s in r["subfuncs"] if "table" in s}
+    assert refs <= tables
+
+
+def test_cli_compare_reports_collation(country_sys_path, country_sys_b_path, capsys):
+    assert cntrydump.main(["--compare", str(country_sys_path), str(country_sys_b_path)]) == 0
+    assert "Moved: 0x41 'A' 65->67, 0x42 'B' 67->65" in capsys.readouterr().out
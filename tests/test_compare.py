@@ -0,0 +1,74 @@
+"""Two-file comparison: diff model, text report and JSON/JSONL renderers."""
+
+import json
+
+import pytest
+
+import cntrydump
+from conftest import read_data
+from cntrydump import diff_country_sys, parse_country_sys, write_compare_json, write_compare_jsonl
+
+
+@pytest.fixture
+def diff(country_sys, country_sys_b):
+    return diff_country_sys(parse_country_sys(country_sys), parse_country_sys(country_sys_b), "a", "b")
+
+
+def test_diff_model(diff):
+    assert diff.only_a == [(31, 437)]
+    assert diff.only_b == [(33, 850)]
+    assert diff.shared == 3
+    assert [(c.country, c.only_a, c.only_b) for c in diff.codepage_sets] == [(31, [437], []), (33, [], [850])]
+    assert [(e.country, e.codepage, [s.sf_id for s in e.subfuncs]) for e in diff.entries] == [
+        (1, 437, [2]), (49, 850, [1, 6, 35])]
+    ctyinfo = diff.entries[1].subfuncs[0]
+    assert (ctyinfo.kind, ctyinfo.changes) == ("ctyinfo", [("date_sep", ".", "/")])
+    assert diff.entries[1].subfuncs[1].table is diff.tables[1]
+
+
+def test_filtered_diff(country_sys, country_sys_b):
+    diff = diff_country_sys(parse_country_sys(country_sys), parse_country_sys(country_sys_b), "a", "b",
+                            country=49)
+    assert diff.filter == ["country=49"]
+    assert (diff.only_a, diff.only_b, diff.shared) == ([], [], 2)
+
+
+def test_json(diff):
+    out = []
+    write_compare_json(diff, out.append)
+    doc = json.loads("".join(out))
+    assert doc["file_a"] == {"path": "a", "file_size": diff.size_a, "entries": 4}
+    assert doc["only_in_a"] == [{"country": 31, "codepage": 437}]
+    assert [s["table"] for s in doc["entries"][1]["subfuncs"] if "table" in s] == [1]
+    assert doc["tables"][0]["spans"] == [[3, 4]]
+    assert doc["counts"] == {"only_in_a": 1, "only_in_b": 1, "codepage_sets": 2, "entries": 2,
+                             "subfunc_diffs": 4, "tables": 2, "entries_dropped": 0,
+                             "max_diffs": None, "truncated": False}
+
+
+def test_jsonl(diff):
+    out = []
+    write_compare_jsonl(diff, out.append)
+    records = [json.loads(line) for line in "".join(out).splitlines()]
+    assert [r["type"] for r in records] == ["header", "only_in", "only_in", "codepage_set", "codepage_set",
+                                            "entry", "entry", "table", "table", "summary"]
+    assert records[-1]["table_comparisons"] == diff.table_comparisons
+
+
+def test_cli_text_matches_baseline(country_sys_path, country_sys_b_path, capsys):
+    assert cntrydump.main(["--compare", str(country_sys_path), str(country_sys_b_path)]) == 0
+    out = capsys.readouterr().out
+    # The report before the table summary is unchanged from the original tool
+    head, sep, _ = out.partition("## Distinct table differences")
+    assert sep
+    expected = read_data("baseline_compare.txt").replace("/tmp/fxb.sys", str(country_sys_b_path))
+    assert head == expected.replace("/tmp/fx.sys", str(country_sys_path))
+
+
+def test_cli_json_and_jsonl_agree(country_sys_path, country_sys_b_path, capsys):
+    files = [str(country_sys_path), str(country_sys_b_path)]
+    assert cntrydump.main(["--compare", *files, "--json"]) == 0
+    doc = json.loads(capsys.readouterr().out)
+    assert cntrydump.main(["--compare", *files, "--jsonl"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r for r in records if r["type"] == "table"] == [dict(t, type="table") for t in doc["tables"]]
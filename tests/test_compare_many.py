@@ -0,0 +1,94 @@
+"""N-way comparison by block hash (--compare-many)."""
+
+import argparse
+import json
+
+import pytest
+
+import cntrydump
+from cntrydump import (FileFingerprint, build_compare_matrix, compare_many, fingerprint_country_sys,
+                       parse_country_sys)
+
+
+def fp(path, cells):
+    return FileFingerprint(path=path, file_size=0, entry_count=0, cells=cells, diagnostics=0, partial=False)
+
+
+def test_build_compare_matrix():
+    matrix = build_compare_matrix([
+        fp("a", {(1, 437, 1): b"x", (1, 437, 2): b"u"}),
+        fp("b", {(1, 437, 1): b"y", (1, 437, 2): b"u"}),
+        fp("c", {(1, 437, 1): b"x"}),
+    ])
+    assert matrix.key_count == 2
+    assert matrix.divergent == [
+        ((1, 437, 1), [(b"x", [0, 2]), (b"y", [1])]),
+        ((1, 437, 2), [(b"u", [0, 1]), (None, [2])]),
+    ]
+
+
+def test_fingerprint(country_sys):
+    f = fingerprint_country_sys(parse_country_sys(country_sys), "a")
+    assert len(f.cells) == 4 * 7
+    assert f.cells[(1, 437, 2)] == f.cells[(31, 437, 4)]
+    assert f.entry_count == 4 and not f.partial
+
+
+@pytest.fixture
+def three_files(country_sys_path, country_sys_b_path, tmp_path, country_sys):
+    copy = tmp_path / "copy.sys"
+    copy.write_bytes(country_sys)
+    return [str(country_sys_path), str(country_sys_b_path), str(copy)]
+
+
+def test_compare_many(three_files):
+    args = argparse.Namespace(
+        strict=False, lazy=False, mmap=False, diag_level="info", budget=False,
+        max_structures=None, max_bytes=None, max_diagnostics=None, country=None, codepage=None, subfunc=None)
+    matrix = compare_many(three_files, args, max_workers=1)
+    assert matrix.key_count == 5 * 7
+    # NL/437 and FR/850 (7 keys each), US/437 UCASE, DE/850 CTYINFO, COLLATE and YESNO
+    assert len(matrix.divergent) == 18
+    assert dict(matrix.divergent)[(1, 437, 2)][1][1] == [1]
+    assert dict(matrix.divergent)[(33, 850, 1)][0] == (None, [0, 2])
+    assert compare_many(three_files, args, max_workers=2) == matrix
+
+
+def test_cli_compare_many_json(three_files, capsys):
+    assert cntrydump.main(["--compare-many", *three_files, "--json"]) == 0
+    doc = json.loads(capsys.readouterr().out)
+    assert [f["path"] for f in doc["files"]] == three_files
+    assert doc["key_count"] == 35
+    assert doc["divergent_count"] == 18
+    first = doc["divergent"][0]
+    assert (first["country"], first["codepage"], first["id"]) == (1, 437, 2)
+    assert [c["files"] for c in first["classes"]] == [[0, 2], [1]]
+
+
+def test_cli_compare_many_jsonl(three_files, capsys):
+    assert cntrydump.main(["--compare-many", *three_files, "--json"]) == 0
+    doc = json.loads(capsys.readouterr().out)
+    assert cntrydump.main(["--compare-many", *three_files, "--jsonl"]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [r.pop("type") for r in records] == ["file"] * 3 + ["key"] * 18 + ["summary"]
+    assert records[:3] == doc["files"]
+    assert records[3:-1] == doc["divergent"]
+    assert records[-1] == {"key_count": 35, "divergent_count": 18}
+
+
+def test_cli_compare_many_text(three_files, capsys):
+    assert cntrydump.main(["--compare-many", *three_files[:1], three_files[2]]) == 0
+    assert "keys agree" in capsys.readouterr().out
+
+
+def test_cli_compare_many_needs_two_files(country_sys_path, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cntrydump.main(["--compare-many", str(country_sys_path)])
+    assert exc.value.code == 2
+
+
+def test_cli_compare_many_names_bad_file(three_files, tmp_path, capsys):
+    bad = tmp_path / "bad.sys"
+    bad.write_bytes(b"\xffCOUNTRX" + bytes(0x20))
+    assert cntrydump.main(["--compare-many", three_files[0], str(bad)]) == 1
+    assert str(bad) in capsys.readouterr().err
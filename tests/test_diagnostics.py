@@ -0,0 +1,87 @@
+"""Structured, aggregated parse diagnostics."""
+
+import json
+
+import cntrydump
+from cntrydump import DIAG_LEVELS, Diagnostics, parse_country_sys
+
+
+def test_add_aggregates_identical_records():
+    diag = Diagnostics()
+    diag.add("tagged-truncated", offset=0x40)
+    diag.add("tagged-truncated", offset=0x40)
+    diag.add("tagged-truncated", offset=0x50)
+    assert len(diag) == 2
+    assert [d.count for d in diag] == [2, 1]
+    assert diag.counts_by_code() == {"tagged-truncated": 3}
+    assert diag.messages() == ["tagged header truncated at 0x40 (2 references)",
+                               "tagged header truncated at 0x50"]
+
+
+def test_context_is_formatted_on_render():
+    diag = Diagnostics()
+    diag.add("payload-truncated", 12, offset=0x20, ctx=("entry[{}:{}].sf[{}]", 49, 850, 2))
+    [d] = diag
+    assert d.context == "entry[49:850].sf[2]"
+    assert d.args == {"size": 12}
+    assert d.level_name == "error"
+    assert d.message == "entry[49:850].sf[2]: payload truncated (wanted 12 bytes) at 0x20"
+
+
+def test_level_threshold():
+    diag = Diagnostics(level="warning")
+    assert not diag.enabled("tag-unusual")
+    assert diag.enabled("magic-mismatch")
+    diag.add("tag-unusual", 0xFE, offset=0x10)
+    assert len(diag) == 0
+    assert Diagnostics(level=DIAG_LEVELS["error"]).level == 40
+
+
+def test_limit_suppresses_and_reports_once():
+    diag = Diagnostics(limit=2)
+    for offset in range(5):
+        diag.add("tagged-truncated", offset=offset)
+    assert diag.suppressed == 3
+    assert [d.code for d in diag] == ["tagged-truncated", "tagged-truncated", "diag-limit"]
+    # A budget stop is always recorded
+    diag.add("budget-exceeded", "bytes", 10)
+    assert list(diag)[-1].code == "budget-exceeded"
+
+
+def test_mark_since_repeat():
+    diag = Diagnostics()
+    diag.add("tagged-truncated", offset=1)
+    mark = diag.mark()
+    diag.add("tagged-truncated", offset=2)
+    keys = diag.since(mark)
+    diag.repeat(keys)
+    assert [d.count for d in diag] == [1, 2]
+
+
+def test_to_jsonable_is_serializable():
+    diag = Diagnostics()
+    diag.add("magic-mismatch", 6, "COLLATX", ("COLLATE",), offset=0x100, ctx="entry[1:437].sf[6]")
+    [record] = json.loads(json.dumps(diag.to_jsonable()))
+    assert record["code"] == "magic-mismatch"
+    assert record["level"] == "warning"
+    assert record["args"]["expected"] == ["COLLATE"]
+    assert record["count"] == 1
+    assert record["message"].startswith("entry[1:437].sf[6]: sf 6: magic mismatch")
+
+
+def test_parse_reports_unusual_tag(country_sys):
+    bad = country_sys.replace(b"\xffFCHAR  ", b"\xfeFCHAR  ")
+    assert {d.code for d in parse_country_sys(bad).diagnostics} == {"tag-unusual"}
+    quiet = parse_country_sys(bad, diagnostics=Diagnostics(level="warning"))
+    assert not quiet.warnings
+
+
+def test_cli_diag_level(tmp_path, country_sys, capsys):
+    path = tmp_path / "country.sys"
+    path.write_bytes(country_sys.replace(b"\xffFCHAR  ", b"\xfeFCHAR  "))
+    assert cntrydump.main([str(path), "--json"]) == 0
+    doc = json.loads(capsys.readouterr().out)
+    assert [d["code"] for d in doc["diagnostics"]] == ["tag-unusual"]
+    assert doc["diagnostics"][0]["count"] == 4
+    assert cntrydump.main([str(path), "--json", "--diag-level", "warning"]) == 0
+    assert json.loads(capsys.readouterr().out)["diagnostics"] == []
@@ -0,0 +1,65 @@
+"""Entry filters (EntryFilter, parse_int_ranges) and --country/--codepage/--subfunc."""
+
+import struct
+
+import pytest
+
+import cntrydump
+from cntrydump import EntryFilter, parse_country_sys, parse_country_sys_lazy, parse_int_ranges
+
+
+def test_parse_int_ranges():
+    assert parse_int_ranges("49") == ((49, 49),)
+    assert parse_int_ranges("1, 33,40-49") == ((1, 1), (33, 33), (40, 49))
+    assert parse_int_ranges("850-850") == ((850, 850),)
+
+
+@pytest.mark.parametrize("text, message", [("", "invalid"), ("x", "invalid"), ("1-", "invalid"),
+                                           ("1,,2", "invalid"), ("49-40", "empty range")])
+def test_parse_int_ranges_rejects(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_int_ranges(text)
+
+
+def test_entry_filter():
+    f = EntryFilter.parse(country="40-49", subfunc="1,35")
+    assert f.matches(49, 850)
+    assert not f.matches(1, 437)
+    assert f.wants_subfunc(35)
+    assert not f.wants_subfunc(2)
+    assert f.describe() == ["country=40-49", "subfunc=1,35"]
+    assert EntryFilter().matches(1, 437)
+    assert EntryFilter().describe() == []
+
+
+@pytest.mark.parametrize("parse", [parse_country_sys, parse_country_sys_lazy])
+def test_filtered_parse(country_sys, parse):
+    doc = parse(country_sys, entry_filter=EntryFilter.parse(country="40-49", subfunc="1,35"))
+    assert [(e.country, e.codepage) for e in doc.entries] == [(49, 850), (49, 437)]
+    assert [s.subfunc_id for s in doc.entries[0].subfuncs] == [1, 35]
+    assert doc.filtered_out == 2
+
+
+def test_skipped_entries_are_not_validated(country_sys):
+    # Point the first subfunction of US/437 at the file header
+    bad = bytearray(country_sys)
+    struct.pack_into("<I", bad, 0x17 + 2 + 4 * 14 + 2 + 4, 0)
+    assert parse_country_sys(bytes(bad)).warnings
+    doc = parse_country_sys(bytes(bad), entry_filter=EntryFilter.parse(country="49"))
+    assert not doc.warnings
+
+
+def test_cli_filters(country_sys_path, capsys):
+    assert cntrydump.main([str(country_sys_path), "--summary", "--codepage", "850"]) == 0
+    out = capsys.readouterr().out
+    assert "Total entries: 1" in out
+    assert " 49: 850  Germany" in out
+    assert "Netherlands" not in out and "United States" not in out
+
+
+@pytest.mark.parametrize("option", ["--country", "--codepage", "--subfunc"])
+def test_cli_rejects_bad_range(country_sys_path, option, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cntrydump.main([str(country_sys_path), option, "49-40"])
+    assert exc.value.code == 2
+    assert "empty range: '49-40'" in capsys.readouterr().err
@@ -0,0 +1,257 @@
+"""HTML output: character metadata, page sections and generate_html_files()."""
+
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+
+import cntrydump
+from conftest import read_data
+from cntrydump import codepage_byte_to_unicode, codepage_chars, generate_html_files, get_char_name
+
+# index.html is written with os.linesep line endings
+posix_only = pytest.mark.skipif(os.linesep != "\n", reason="baseline index.html uses \\n line endings")
+
+
+def generate(buf, output_dir, **kwargs):
+    doc = cntrydump.parse_country_sys(buf)
+    return generate_html_files(doc, str(output_dir), None, None, **kwargs)
+
+
+def page_hashes(output_dir):
+    """SHA-256 of every .html file in output_dir."""
+    out = {}
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(output_dir, name), "rb") as f:
+                out[name] = hashlib.sha256(f.read()).hexdigest()
+    return out
+
+
+def test_codepage_chars():
+    chars = codepage_chars(437)
+    assert len(chars) == 256
+    assert codepage_chars(437) is chars
+    assert chars[0x41].char == "A"
+    assert chars[0x41].title == "Dec: 65, Hex: 0x41, Name: LATIN CAPITAL LETTER A"
+    assert chars[0x80].name == "LATIN CAPITAL LETTER C WITH CEDILLA"
+    assert (chars[0x01].glyph_class, chars[0x01].glyph_html) == ("control-char", "&#9786;")
+    assert (chars[0x7F].name, chars[0x7F].glyph_class) == ("DELETE", "control-char")
+    assert (chars[0x20].name, chars[0x20].display) == ("SPACE", "SPACE")
+    assert chars[ord("<")].html == "&lt;"
+
+
+def test_codepages_differ():
+    assert codepage_chars(850)[0x9B].char == "ø"
+    assert codepage_chars(437)[0x9B].char == "¢"
+    assert codepage_byte_to_unicode(0x9B, 850) == "ø"
+    assert get_char_name(0x9B, 850) == "LATIN SMALL LETTER O WITH STROKE"
+
+
+def test_display_values():
+    fmt = cntrydump._format_display_value
+    assert fmt(" ", 437) == "SPACE"
+    assert fmt("$", 437) == "$"
+    assert fmt("\\xA0", 437) == "&#225;"
+    assert fmt("\\xFF", 850) == "NO-BREAK SPACE"
+    assert fmt("<unspecified>", 437) == "<unspecified>"
+
+
+def test_sections_are_rendered_once():
+    collate = bytes(range(256))
+    assert cntrydump._codepage_grid_html(850) is cntrydump._codepage_grid_html(850)
+    assert cntrydump._collation_table_html(437, collate) is cntrydump._collation_table_html(437, collate)
+    ucase = cntrydump._ucase_table_html(437, bytes(range(128, 256)))
+    assert "<td>" not in ucase  # no changed mappings, header only
+
+
+def test_pages_share_sections(country_sys):
+    doc = cntrydump.parse_country_sys(country_sys)
+    us, nl = (cntrydump.HtmlPage.from_entry(e) for e in doc.entries[:2])
+    grid = cntrydump._codepage_grid_html(437)
+    assert grid in cntrydump.render_html_page(us)
+    assert grid in cntrydump.render_html_page(nl)
+    assert cntrydump._ucase_table_html(437, us.ucase_payload) in cntrydump.render_html_page(us)
+
+
+@posix_only
+def test_html_matches_baseline(country_sys, tmp_path, capsys):
+    generate(country_sys, tmp_path / "out")
+    assert page_hashes(tmp_path / "out") == json.loads(read_data("baseline_html.json"))
+
+
+def test_jobs_match_serial(country_sys, tmp_path, capsys):
+    serial = generate(country_sys, tmp_path / "serial")
+    pooled = generate(country_sys, tmp_path / "pooled", jobs=2)
+    assert page_hashes(tmp_path / "pooled") == page_hashes(tmp_path / "serial")
+    # Same files, written in entry order
+    assert [os.path.basename(p) for p in pooled.pages] == [os.path.basename(p) for p in serial.pages]
+
+
+def test_render_window_bounds_pages_in_flight(country_sys, monkeypatch):
+    submitted = []
+
+    class Pool(concurrent.futures.ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            submitted.append(args[0])
+            return super().submit(fn, *args)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", Pool)
+    pages = [cntrydump.HtmlPage.from_entry(e) for e in cntrydump.parse_country_sys(country_sys).entries]
+    rendered = cntrydump._render_pages(pages, None, jobs=2, window=2)
+    assert submitted == []
+    first = next(rendered)
+    # The first two, plus one more once the first was taken
+    assert submitted == pages[:3]
+    assert first == cntrydump.render_html_page(pages[0])
+    assert list(rendered) == [cntrydump.render_html_page(p) for p in pages[1:]]
+    assert submitted == pages
+
+
+@posix_only
+def test_cli_jobs_matches_baseline(country_sys_path, tmp_path, capsys):
+    out = tmp_path / "out"
+    assert cntrydump.main([str(country_sys_path), "--html", "--output-dir", str(out), "--jobs", "3"]) == 0
+    assert page_hashes(out) == json.loads(read_data("baseline_html.json"))
+
+
+def test_cli_rejects_jobs_below_one(country_sys_path, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cntrydump.main([str(country_sys_path), "--html", "--output-dir", str(tmp_path), "--jobs", "0"])
+    assert exc.value.code == 2
+    assert "--jobs" in capsys.readouterr().err
+
+
+def test_manifest_and_incremental_run(country_sys, tmp_path, capsys):
+    out = tmp_path / "out"
+    first = generate(country_sys, out)
+    assert (len(first.pages), first.unchanged) == (5, 0)
+    with open(out / cntrydump.HTML_MANIFEST_NAME, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert sorted(manifest["files"]) == sorted(page_hashes(out))
+    mtimes = {name: os.stat(out / name).st_mtime_ns for name in manifest["files"]}
+
+    again = generate(country_sys, out)
+    assert (again.pages, again.unchanged) == ([], 5)
+    assert {name: os.stat(out / name).st_mtime_ns for name in manifest["files"]} == mtimes
+
+    rebuilt = generate(country_sys, out, incremental=False)
+    assert (len(rebuilt.pages), rebuilt.unchanged) == (5, 0)
+    assert (out / cntrydump.HTML_MANIFEST_NAME).is_file()
+
+
+def test_changed_input_rewrites_changed_pages(country_sys, country_sys_b, tmp_path, capsys):
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / "notes.html").write_text("not generated")
+    generate(country_sys, out)
+    capsys.readouterr()
+    changed = generate(country_sys_b, out)
+    assert sorted(os.path.basename(p) for p in changed.pages) == [
+        "DE049-850.html", "FR033-850.html", "US001-437.html", "index.html"]
+    assert changed.unchanged == 1
+    assert f"Removed stale: {out / 'NL031-437.html'}" in capsys.readouterr().out
+    assert not (out / "NL031-437.html").exists()
+    # Files the manifest does not list are never removed
+    assert (out / "notes.html").read_text() == "not generated"
+    assert page_hashes(out).keys() == {"DE049-437.html", "DE049-850.html", "FR033-850.html",
+                                       "US001-437.html", "index.html", "notes.html"}
+
+
+def test_filtered_run_keeps_other_pages(country_sys, country_sys_b, tmp_path, capsys):
+    out = tmp_path / "out"
+    generate(country_sys, out)
+    doc = cntrydump.parse_country_sys(country_sys_b)
+    generate_html_files(doc, str(out), 49, None)
+    assert (out / "NL031-437.html").exists()
+    # and the next unfiltered run still knows about them
+    generate(country_sys_b, out)
+    assert not (out / "NL031-437.html").exists()
+
+
+def test_cli_reports_unchanged(country_sys_path, tmp_path, capsys):
+    out = tmp_path / "out"
+    args = [str(country_sys_path), "--html", "--output-dir", str(out)]
+    assert cntrydump.main(args) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == f"Generated 5 HTML file(s), 0 unchanged in {out}"
+    assert cntrydump.main(args) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == f"Generated 0 HTML file(s), 5 unchanged in {out}"
+    assert cntrydump.main(args + ["--rebuild"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == f"Generated 5 HTML file(s), 0 unchanged in {out}"
+
+
+def test_external_assets(country_sys, tmp_path, capsys):
+    out = tmp_path / "out"
+    generated = generate(country_sys, out, external_assets=True)
+    assets = cntrydump.HtmlAssets.fingerprinted()
+    assert sorted(os.path.basename(p) for p in generated.assets) == sorted([assets.css, assets.js])
+    assert len(generated.pages) == 5
+    assert (out / assets.css).read_text(encoding="utf-8") == cntrydump.HTML_PAGE_CSS
+    page = (out / "US001-437.html").read_text(encoding="utf-8")
+    assert f'<link rel="stylesheet" href="{assets.css}">' in page
+    assert "<style>" not in page
+    assert f'<script src="{assets.js}"></script>' in (out / "index.html").read_text(encoding="utf-8")
+    again = generate(country_sys, out, external_assets=True)
+    assert (again.assets, again.pages, again.unchanged) == ([], [], 5)
+
+
+def test_switching_asset_mode_rewrites_pages(country_sys, tmp_path, capsys):
+    out = tmp_path / "out"
+    generate(country_sys, out, external_assets=True)
+    inline = generate(country_sys, out)
+    assert (len(inline.pages), inline.assets) == (5, [])
+    assert not [name for name in os.listdir(out) if name.endswith((".css", ".js"))]
+
+
+def test_cli_counts_assets(country_sys_path, tmp_path, capsys):
+    out = tmp_path / "out"
+    assert cntrydump.main([str(country_sys_path), "--html", "--output-dir", str(out),
+                           "--html-assets", "external"]) == 0
+    assert capsys.readouterr().out.splitlines()[-1] == f"Generated 5 HTML file(s), 2 asset(s), 0 unchanged in {out}"
+
+
+def test_precompress_alongside(country_sys, tmp_path, capsys):
+    out = tmp_path / "out"
+    pre = cntrydump.Precompressor()
+    generated = generate(country_sys, out, precompress=pre)
+    assert pre.files == 5
+    assert "Precompressed: 5 file(s)" in capsys.readouterr().out
+    for path in generated.pages:
+        with open(path, "rb") as f, gzip.open(path + ".gz") as gz:
+            assert gz.read() == f.read()
+    again = generate(country_sys, out, precompress=cntrydump.Precompressor())
+    assert again.unchanged == 5
+
+
+def test_precompress_replace(country_sys, tmp_path, capsys):
+    out = tmp_path / "out"
+    generate(country_sys, out)
+    replaced = generate(country_sys, out, precompress=cntrydump.Precompressor(replace=True))
+    assert all(p.endswith(".html.gz") for p in replaced.pages)
+    assert not [name for name in os.listdir(out) if name.endswith(".html")]
+    # Back to plain output: the .gz files go, the pages come back
+    plain = generate(country_sys, out)
+    assert len(plain.pages) == 5
+    assert not [name for name in os.listdir(out) if name.endswith(".gz")]
+    assert page_hashes(out).keys() == json.loads(read_data("baseline_html.json")).keys()
+
+
+def test_cli_precompress_before_file(country_sys_path, tmp_path, capsys):
+    out = tmp_path / "out"
+    assert cntrydump.main(["--html", "--precompress", str(country_sys_path), "--output-dir", str(out)]) == 0
+    assert "Precompressed: 5 file(s)" in capsys.readouterr().out
+    assert (out / "index.html").is_file() and (out / "index.html.gz").is_file()
+    assert cntrydump.main(["--html", "--precompress", "--precompress-mode", "replace", str(country_sys_path),
+                           "--output-dir", str(out)]) == 0
+    assert not (out / "index.html").exists()
+
+
+def test_cli_precompress_mode_requires_precompress(country_sys_path, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cntrydump.main(["--html", "--precompress-mode", "replace", str(country_sys_path),
+                        "--output-dir", str(tmp_path)])
+    assert exc.value.code == 2
+    assert "--precompress-mode requires --precompress" in capsys.readouterr().err
@@ -0,0 +1,77 @@
+"""Columnar entry index (EntryColumns) and the lookup indexes built on it."""
+
+from conftest import fixture_entries
+from synthcountry import build_country_sys, standard_subfuncs
+
+from cntrydump import EntryColumns, parse_country_sys, parse_country_sys_lazy
+
+
+def test_columns(country_sys):
+    doc = parse_country_sys(country_sys)
+    cols = doc.columns
+    assert isinstance(cols, EntryColumns)
+    assert len(cols) == 4
+    assert list(cols.country) == [1, 31, 49, 49]
+    assert list(cols.codepage) == [437, 437, 850, 437]
+    assert list(cols.offset) == [e.offset for e in doc.entries]
+    assert list(cols.sf_start) == [0, 7, 14, 21, 28]
+    assert list(cols.subfunc_ids(2)) == [1, 2, 4, 5, 6, 7, 35]
+    assert list(cols.sf_data[7:14]) == [s.data_ptr.linear for s in doc.entries[1].subfuncs]
+
+
+def test_select(country_sys):
+    cols = parse_country_sys(country_sys).columns
+    assert cols.select() == [0, 1, 2, 3]
+    assert cols.select(country=49) == [2, 3]
+    assert cols.select(codepage=437) == [0, 1, 3]
+    assert cols.select(country=49, codepage=437) == [3]
+    assert cols.select(subfunc=35) == [0, 1, 2, 3]
+    assert cols.select(subfunc=3) == []
+    assert cols.select(country=49, rows=[3, 0, 2]) == [3, 2]
+    # Out of the column's range: no match rather than an OverflowError
+    assert cols.select(country=0x10000) == []
+
+
+def test_select_ignores_straddling_matches():
+    cols = EntryColumns([])
+    # 0x0100, 0x0001 as 'H' on little endian contain b"\x01\x00" at byte 1
+    cols.country.extend([0x0100, 0x0001])
+    assert cols._where(cols.country, 1, (), True) == [1]
+
+
+def test_sort_and_group(country_sys):
+    cols = parse_country_sys(country_sys).columns
+    assert cols.sort() == [0, 1, 3, 2]
+    assert cols.sort([2, 3]) == [3, 2]
+    assert cols.group_by_country() == {1: [0], 31: [1], 49: [2, 3]}
+    assert cols.group_by_codepage([1, 2, 3]) == {437: [1, 3], 850: [2]}
+    assert cols.group_by_subfunc([0, 2])[6] == [0, 2]
+
+
+def test_lazy_columns_leave_subfunctions_unparsed(country_sys):
+    doc = parse_country_sys_lazy(country_sys)
+    assert doc.columns.select(country=49, codepage=850) == [2]
+    assert doc.cache_stats.references == 0
+
+
+def test_lookup_indexes(country_sys):
+    doc = parse_country_sys(country_sys)
+    assert list(doc.by_key) == [(1, 437), (31, 437), (49, 850), (49, 437)]
+    assert doc.find_entry(49, 437) is doc.entries[3]
+    assert doc.find_entry(49, 852) is None
+    assert doc.duplicate_keys == {}
+    assert doc.codepages_by_country == {1: [437], 31: [437], 49: [437, 850]}
+    assert doc.countries_by_codepage == {437: [1, 31, 49], 850: [49]}
+    assert list(doc.entries_by_subfunc) == [1, 2, 4, 5, 6, 7, 35]
+    assert list(doc.entries_for(country=49)) == [(49, 850), (49, 437)]
+    assert doc.entries_for() is doc.by_key
+
+
+def test_duplicate_keys_first_entry_wins():
+    entries = fixture_entries()
+    dup = (1, 437, standard_subfuncs(1, 437, currency=b"USD"))
+    doc = parse_country_sys(build_country_sys(entries + [dup]))
+    assert len(doc.entries) == 5
+    assert doc.by_key[(1, 437)] is doc.entries[0]
+    assert doc.duplicate_keys == {(1, 437): [doc.entries[4]]}
+    assert list(doc.entries_for(country=1)) == [(1, 437)]
@@ -0,0 +1,61 @@
+"""Streamed --json and --jsonl output of a single file."""
+
+import json
+
+import cntrydump
+from conftest import read_data
+from cntrydump import (parse_country_sys, parse_country_sys_lazy, to_jsonable, write_country_sys_json,
+                       write_country_sys_jsonl)
+
+# Keys added to the --json document since the baseline output in tests/data
+NEW_KEYS = {"diagnostics", "partial", "orphan_blocks"}
+
+
+def render(writer, doc, **kwargs):
+    out = []
+    writer(doc, out.append, **kwargs)
+    return "".join(out)
+
+
+def test_streamed_json_matches_to_jsonable(country_sys):
+    doc = parse_country_sys(country_sys)
+    assert render(write_country_sys_json, doc) == json.dumps(to_jsonable(doc), indent=2) + "\n"
+
+
+def test_json_matches_baseline(country_sys):
+    doc = json.loads(render(write_country_sys_json, parse_country_sys(country_sys)))
+    assert set(doc) - NEW_KEYS == {"file_size", "entry_table_count", "pointer_info_type",
+                                   "entry_table_ptrs", "entries", "warnings"}
+    assert {k: v for k, v in doc.items() if k not in NEW_KEYS} == json.loads(read_data("baseline.json"))
+    assert [b["magic"] for b in doc["orphan_blocks"]] == ["VERSION"]
+
+
+def test_lazy_json_matches_eager(country_sys):
+    expected = render(write_country_sys_json, parse_country_sys(country_sys))
+    assert render(write_country_sys_json, parse_country_sys_lazy(country_sys)) == expected
+
+
+def test_jsonl(country_sys):
+    doc = parse_country_sys(country_sys)
+    full = json.loads(render(write_country_sys_json, doc))
+    records = [json.loads(line) for line in render(write_country_sys_jsonl, doc).splitlines()]
+    assert [r["type"] for r in records] == ["header"] + ["entry"] * 4 + ["orphan_block", "summary"]
+    assert [dict(r) for r in records[1:5]] == [dict(e, type="entry") for e in full["entries"]]
+    assert records[-1] == {"type": "summary", "entries": 4, "diagnostics": [], "partial": False}
+
+
+def test_jsonl_per_subfunc(country_sys):
+    records = [json.loads(line) for line in
+               render(write_country_sys_jsonl, parse_country_sys(country_sys), per_subfunc=True).splitlines()]
+    subfuncs = [r for r in records if r["type"] == "subfunc"]
+    assert len(subfuncs) == 28
+    assert (subfuncs[-1]["country"], subfuncs[-1]["codepage"], subfuncs[-1]["id"]) == (49, 437, 35)
+
+
+def test_cli_json_and_jsonl(country_sys_path, capsys):
+    assert cntrydump.main([str(country_sys_path), "--json"]) == 0
+    doc = json.loads(capsys.readouterr().out)
+    assert len(doc["entries"]) == 4
+    assert cntrydump.main([str(country_sys_path), "--jsonl", "--country", "49"]) == 0
+    header = json.loads(capsys.readouterr().out.splitlines()[0])
+    assert (header["filter"], header["filtered_out"]) == (["country=49"], 2)
@@ -0,0 +1,205 @@
+"""Parse modes: bytes, memoryview, mmap (zero-copy) and lazy; malformed input."""
+
+import os
+import struct
+
+import pytest
+
+import cntrydump
+from cntrydump import ValidationError, open_country_sys, parse_country_sys
+
+
+def dump(doc, **kwargs):
+    out = []
+    cntrydump.print_default(doc, unsorted=False, no_offsets=False, country=None, codepage=None,
+                            write=out.append, **kwargs)
+    return "".join(out)
+
+
+def test_parse_entries(country_sys):
+    doc = parse_country_sys(country_sys)
+    assert [(e.country, e.codepage) for e in doc.entries] == [(1, 437), (31, 437), (49, 850), (49, 437)]
+    assert [s.subfunc_id for s in doc.entries[0].subfuncs] == [1, 2, 4, 5, 6, 7, 35]
+    assert doc.entries[2].subfuncs[0].decoded["date_sep"] == "."
+    assert doc.entries[2].subfuncs[-1].decoded["yes"] == "J"
+    assert not doc.warnings
+    assert not doc.partial
+
+
+def test_memoryview_payloads_are_views(country_sys):
+    doc = parse_country_sys(memoryview(country_sys))
+    payload = doc.entries[0].subfuncs[1].tagged.payload
+    assert isinstance(payload, memoryview)
+    assert payload.obj is country_sys
+    assert dump(doc) == dump(parse_country_sys(country_sys))
+
+
+def test_open_country_sys_matches_bytes_parse(country_sys_path, country_sys):
+    expected = dump(parse_country_sys(country_sys))
+    with open_country_sys(country_sys_path) as doc:
+        assert isinstance(doc.entries[0].subfuncs[1].tagged.payload, memoryview)
+        assert dump(doc) == expected
+
+
+def test_open_country_sys_survives_escaped_views(country_sys_path):
+    with open_country_sys(country_sys_path) as doc:
+        payload = doc.entries[0].subfuncs[1].tagged.payload
+    # The mapping is kept alive by the view instead of being unmapped under it
+    assert bytes(payload[:2]) == bytes([128, 154])
+
+
+def test_open_country_sys_empty_file(tmp_path):
+    path = tmp_path / "empty.sys"
+    path.write_bytes(b"")
+    with pytest.raises(ValidationError, match="too short"):
+        with open_country_sys(path):
+            pass
+
+
+@pytest.mark.parametrize("size", [0, 1, 8, 0x16])
+def test_truncated_header(country_sys, size):
+    with pytest.raises(ValidationError, match="too short"):
+        parse_country_sys(country_sys[:size])
+
+
+def test_bad_signature(country_sys):
+    with pytest.raises(ValidationError, match="signature"):
+        parse_country_sys(b"\xfeCOUNTRX" + country_sys[8:])
+
+
+@pytest.mark.parametrize("size", [0x19, 0x40, 0x60, 0x200])
+def test_truncated_body_is_reported(country_sys, size):
+    doc = parse_country_sys(country_sys[:size])
+    codes = {d.code for d in doc.diagnostics}
+    assert codes & {"entry-truncated", "entry-beyond-eof", "ptr-beyond-eof", "subfunc-truncated",
+                    "tagged-truncated", "payload-truncated"}
+    # Every entry that was read is still dumpable
+    dump(doc)
+
+
+# Subfunction header pointer of entry 0, and data pointer of its first subfunction
+ENTRY0_SUBFUNC_PTR = 0x17 + 2 + 10
+SF0_DATA_PTR = 0x17 + 2 + 4 * 14 + 2 + 4
+
+
+@pytest.mark.parametrize("at", [ENTRY0_SUBFUNC_PTR, SF0_DATA_PTR])
+def test_segment_pointer_in_large_file(country_sys, at):
+    # Past 64 KiB a pointer with a non-zero segment can still be <= the
+    # file length; the bulk decoders must not take it for a near pointer
+    buf = bytearray(country_sys + b" " * 0x10000)
+    off = struct.unpack_from("<I", buf, at)[0]
+    raw = 0x10000 | off
+    struct.pack_into("<I", buf, at, raw)
+    doc = parse_country_sys(bytes(buf))
+    expected_diag = cntrydump.Diagnostics()
+    expected = cntrydump.decode_far_ptr(raw, len(buf), expected_diag, "ptr")
+    ptr = (doc.entries[0].subfunc_header_ptr if at == ENTRY0_SUBFUNC_PTR
+           else doc.entries[0].subfuncs[0].data_ptr)
+    assert ptr == expected == cntrydump.FarPtr(raw_u32=raw, seg=1, off=off, linear=off)
+    [want] = expected_diag
+    [got] = [d for d in doc.diagnostics if d.code == "ptr-mismatch"]
+    assert (got.args, got.level) == (want.args, want.level)
+    # linear falls back to the offset, so the entry still parses
+    assert dump(doc).split("# WARNINGS")[0] == dump(parse_country_sys(country_sys + b" " * 0x10000))
+
+
+def test_bulk_pointers_match_decode_far_ptr(country_sys):
+    doc = parse_country_sys(country_sys)
+    for e in doc.entries:
+        p = e.subfunc_header_ptr
+        assert p == cntrydump.decode_far_ptr(p.raw_u32, len(country_sys), cntrydump.Diagnostics(), "")
+        for s in e.subfuncs:
+            assert s.data_ptr == cntrydump.decode_far_ptr(s.data_ptr.raw_u32, len(country_sys),
+                                                          cntrydump.Diagnostics(), "")
+
+
+def test_nonstandard_entry_uses_per_record_path(country_sys):
+    # header_len 14 instead of 12 on the last entry: the bulk walk stops
+    # there and the per-record path reads it, 2 extra bytes and all
+    buf = bytearray(country_sys)
+    struct.pack_into("<H", buf, 0x17 + 2 + 3 * 14, 14)
+    doc = parse_country_sys(bytes(buf))
+    expected = parse_country_sys(country_sys)
+    assert doc.entries[3].header_len == 14
+    assert [(e.country, e.codepage, e.subfunc_header_ptr) for e in doc.entries] == \
+        [(e.country, e.codepage, e.subfunc_header_ptr) for e in expected.entries]
+    assert not doc.warnings
+
+
+def test_nonstandard_subfunc_entry_uses_per_record_path(country_sys):
+    # entry_len 0 on the 3rd subfunction of entry 0 stops both paths there
+    buf = bytearray(country_sys)
+    struct.pack_into("<H", buf, 0x17 + 2 + 4 * 14 + 2 + 2 * 8, 0)
+    doc = parse_country_sys(bytes(buf))
+    assert [s.subfunc_id for s in doc.entries[0].subfuncs] == [1, 2]
+    assert "subfunc-len-zero" in doc.diagnostics.counts_by_code()
+    assert [s.subfunc_id for s in doc.entries[1].subfuncs] == [1, 2, 4, 5, 6, 7, 35]
+
+
+def test_cli_truncated_file(tmp_path, country_sys, capsys):
+    path = tmp_path / "short.sys"
+    path.write_bytes(country_sys[:0x10])
+    assert cntrydump.main([str(path)]) == 1
+    assert "too short" in capsys.readouterr().err
+
+
+def test_cli_missing_and_empty_file(tmp_path, capsys):
+    assert cntrydump.main([str(tmp_path / "nope.sys")]) == 1
+    assert "File not found" in capsys.readouterr().err
+    (tmp_path / "empty.sys").write_bytes(b"")
+    assert cntrydump.main([str(tmp_path / "empty.sys"), "--mmap"]) == 1
+    assert "File is empty" in capsys.readouterr().err
+
+
+def test_lazy_parse_defers_subfunctions(country_sys):
+    doc = cntrydump.parse_country_sys_lazy(country_sys)
+    assert isinstance(doc, cntrydump.LazyCountrySys)
+    assert [(e.country, e.codepage) for e in doc.entries] == [(1, 437), (31, 437), (49, 850), (49, 437)]
+    assert doc.cache_stats.references == 0
+    sf = doc.entries[2].subfuncs[0]
+    assert doc.cache_stats.references == 0
+    assert sf.decoded["date_sep"] == "."
+    assert doc.cache_stats.references == 1
+    # Memoized: a second access resolves nothing
+    assert sf.tagged is doc.entries[2].subfuncs[0].tagged
+    assert doc.cache_stats.references == 1
+
+
+def test_lazy_dump_matches_eager(country_sys, country_sys_path):
+    expected = dump(parse_country_sys(country_sys))
+    assert dump(cntrydump.parse_country_sys_lazy(country_sys)) == expected
+    with open_country_sys(country_sys_path, lazy=True) as doc:
+        assert dump(doc) == expected
+
+
+def test_lazy_strict_raises_on_access(country_sys):
+    bad = country_sys.replace(b"\xffYESNO  ", b"\xffNOYES  ")
+    doc = cntrydump.parse_country_sys_lazy(bad, strict=True)
+    doc.entries[0].subfuncs[0].decoded  # CTYINFO is fine
+    with pytest.raises(ValidationError, match="magic mismatch"):
+        doc.entries[0].subfuncs[-1].decoded
+
+
+def test_lazy_warnings_cover_what_was_decoded(country_sys):
+    bad = country_sys.replace(b"\xffYESNO  ", b"\xffNOYES  ")
+    doc = cntrydump.parse_country_sys_lazy(bad)
+    assert not doc.warnings
+    doc.entries[0].subfuncs[-1].decoded
+    assert any("magic mismatch" in w for w in doc.warnings)
+
+
+@pytest.fixture
+def real_country_sys():
+    """COUNTRY.SYS built from country.asm (make), if present."""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "country.sys")
+    if not os.path.isfile(path):
+        pytest.skip("country.sys not built (run make)")
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_real_file_parse_modes_agree(real_country_sys):
+    eager = parse_country_sys(real_country_sys)
+    assert eager.entries
+    assert dump(cntrydump.parse_country_sys_lazy(real_country_sys)) == dump(eager)
+    assert dump(parse_country_sys(memoryview(real_country_sys))) == dump(eager)
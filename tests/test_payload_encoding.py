@@ -0,0 +1,90 @@
+"""Payload encodings of the JSON output (PayloadEncoder, --payload-encoding)."""
+
+import base64
+import json
+
+import pytest
+
+import cntrydump
+from cntrydump import (PAYLOAD_ENCODINGS, PayloadEncoder, parse_country_sys, to_jsonable,
+                       write_country_sys_json, write_country_sys_jsonl)
+
+
+def ucase_record(doc_json):
+    return doc_json["entries"][0]["subfuncs"][1]["tagged"]
+
+
+def test_modes(country_sys):
+    doc = parse_country_sys(country_sys)
+    payload = bytes(doc.entries[0].subfuncs[1].tagged.payload)
+    records = {mode: ucase_record(to_jsonable(doc, mode)) for mode in PAYLOAD_ENCODINGS}
+    assert set(PAYLOAD_ENCODINGS) == {"hex", "base64", "none", "ref"}
+
+    assert records["hex"]["payload_hex"] == " ".join(f"0x{b:02X}" for b in payload)
+    assert records["hex"]["magic_raw_hex"] == records["none"]["magic_raw_hex"]
+    assert base64.b64decode(records["base64"]["payload_base64"]) == payload
+    assert base64.b64decode(records["base64"]["magic_raw_base64"]) == b"UCASE  "
+    assert not {"payload_hex", "payload_base64", "payload_ref"} & set(records["none"])
+    # Everything else is the same in every mode
+    assert records["none"] == {k: v for k, v in records["hex"].items() if k != "payload_hex"}
+
+
+def test_ref_stores_each_payload_once(country_sys):
+    doc = parse_country_sys(country_sys)
+    out = to_jsonable(doc, "ref")
+    refs = [s["tagged"]["payload_ref"] for e in out["entries"] for s in e["subfuncs"]]
+    assert len(refs) == 28
+    assert list(out["blocks"]) == list(dict.fromkeys(refs))
+    assert len(out["blocks"]) == 12
+    ucase = out["blocks"][ucase_record(out)["payload_ref"]]
+    assert base64.b64decode(ucase["payload_base64"]) == bytes(doc.entries[0].subfuncs[1].tagged.payload)
+    assert ucase["size"] == 128
+    assert len(ucase["offsets"]) == 1
+
+
+def test_ref_jsonl_blocks_precede_references(country_sys):
+    out = []
+    write_country_sys_jsonl(parse_country_sys(country_sys), out.append, payload_encoding="ref")
+    seen = set()
+    for record in map(json.loads, "".join(out).splitlines()):
+        if record["type"] == "block":
+            seen.add(record["key"])
+        elif record["type"] == "entry":
+            assert {s["tagged"]["payload_ref"] for s in record["subfuncs"]} <= seen
+    assert len(seen) == 12
+
+
+@pytest.mark.parametrize("mode", PAYLOAD_ENCODINGS)
+def test_streamed_json_matches_to_jsonable(country_sys, mode):
+    doc = parse_country_sys(country_sys)
+    out = []
+    write_country_sys_json(doc, out.append, payload_encoding=mode)
+    assert json.loads("".join(out)) == json.loads(json.dumps(to_jsonable(doc, mode)))
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError, match="Unknown payload encoding"):
+        PayloadEncoder("zip")
+
+
+def test_cli_payload_encoding(country_sys_path, capsys):
+    assert cntrydump.main([str(country_sys_path), "--json", "--payload-encoding", "none"]) == 0
+    assert "payload_hex" not in capsys.readouterr().out
+    assert cntrydump.main([str(country_sys_path), "--json"]) == 0
+    assert "payload_hex" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("options", [[], ["--summary"], ["--html"]])
+def test_cli_rejects_payload_encoding_elsewhere(country_sys_path, tmp_path, options, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cntrydump.main([str(country_sys_path), *options, "--output-dir", str(tmp_path),
+                        "--payload-encoding", "base64"])
+    assert exc.value.code == 2
+    assert "--payload-encoding only applies" in capsys.readouterr().err
+
+
+def test_cli_rejects_payload_encoding_with_compare(country_sys_path, country_sys_b_path, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cntrydump.main(["--compare", str(country_sys_path), str(country_sys_b_path), "--json",
+                        "--payload-encoding", "ref"])
+    assert exc.value.code == 2
@@ -0,0 +1,99 @@
+"""Slotted parse records and the Mapping view of the decoded subfunction records."""
+
+import dataclasses
+
+import pytest
+
+from cntrydump import (CountryEntry, CtyInfo, Dbcs, DecodedRecord, FarPtr, FChar, FCharRaw,
+                       SubfuncEntry, Tagged, YesNo, parse_country_sys, parse_country_sys_lazy)
+from conftest import fixture_entries
+from synthcountry import build_country_sys
+
+# The dicts decode_*() returned before the typed records, for DE/850
+DE_CTYINFO = {
+    "country_id": 49, "codepage": 850, "date_format": 1, "date_format_name": "DMY",
+    "currency_symbol": "EUR", "thousands_sep": ".", "decimal_sep": ",", "date_sep": ".",
+    "time_sep": ":", "currency_format": 0, "currency_decimals": 2, "time_format": 1,
+    "time_format_name": "24-hour", "case_map_ptr_raw": 0, "data_sep": ";", "reserved_len": 10,
+    "extra_len": 0,
+}
+DE_FCHAR = {
+    "characteristics": 142, "lowest_char": 0, "highest_char": 255, "excluded_first": 0,
+    "excluded_last": 32, "num_terminators": 14,
+    "terminators_hex": "0x2E 0x22 0x2F 0x5C 0x5B 0x5D 0x3A 0x7C 0x3C 0x3E 0x2B 0x3D 0x3B 0x2C",
+}
+DE_DBCS = {"ranges": [], "dbcs_dummy_word": 0, "payload_len": 0}
+DE_YESNO = {"yes": "J", "no": "N", "raw_hex": "0x4A 0x00 0x4E 0x00"}
+
+
+@pytest.fixture
+def doc():
+    """fixture_entries() plus a RU/866 entry with a real DBCS table and a short FCHAR."""
+    extra = (7, 866, {7: ("DBCS", b"\x81\x9f\xe0\xfc\x00\x00"), 5: ("FCHAR", b"\x01\x02")})
+    return parse_country_sys(build_country_sys(fixture_entries() + [extra]))
+
+
+def decoded(doc, country, codepage):
+    entry = next(e for e in doc.entries if (e.country, e.codepage) == (country, codepage))
+    return {s.subfunc_id: s.decoded for s in entry.subfuncs}
+
+
+def assert_slotted(obj):
+    assert "__slots__" in type(obj).__dict__
+    assert not hasattr(obj, "__dict__")
+
+
+def test_records_have_slots(doc):
+    entry = doc.entries[2]
+    sub = entry.subfuncs[0]
+    for obj in (entry, sub, sub.tagged, entry.subfunc_header_ptr, sub.data_ptr):
+        assert_slotted(obj)
+    assert (type(entry), type(sub), type(sub.tagged)) == (CountryEntry, SubfuncEntry, Tagged)
+    assert type(sub.data_ptr) is FarPtr
+    records = [s.decoded for e in doc.entries for s in e.subfuncs if s.decoded is not None]
+    assert {type(r) for r in records} == {CtyInfo, FChar, FCharRaw, Dbcs, YesNo}
+    for record in records:
+        assert_slotted(record)
+
+
+def test_lazy_records_have_slots(country_sys):
+    doc = parse_country_sys_lazy(country_sys)
+    entry = doc.entries[0]
+    assert_slotted(entry)
+    assert_slotted(entry.subfuncs[0])
+    assert_slotted(entry.subfuncs[0].tagged)
+
+
+def test_records_are_frozen(doc):
+    record = decoded(doc, 49, 850)[1]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        record.date_sep = "/"
+
+
+def test_records_equal_old_dicts(doc):
+    de = decoded(doc, 49, 850)
+    assert de[1] == DE_CTYINFO
+    assert DE_CTYINFO == de[1]
+    assert de[5] == DE_FCHAR
+    assert de[7] == DE_DBCS
+    assert de[35] == DE_YESNO
+    assert de[1] != dict(DE_CTYINFO, date_sep="/")
+    assert de[1] == decoded(doc, 49, 850)[1]
+    assert de[1] != decoded(doc, 49, 437)[1]
+    ru = decoded(doc, 7, 866)
+    assert ru[7] == {"ranges": [(0x81, 0x9F), (0xE0, 0xFC)], "dbcs_dummy_word": None, "payload_len": 6}
+    assert ru[5] == {"raw_hex": "0x01 0x02"}
+
+
+def test_records_read_like_dicts(doc):
+    ctyinfo = decoded(doc, 49, 850)[1]
+    assert isinstance(ctyinfo, DecodedRecord)
+    assert list(ctyinfo) == list(DE_CTYINFO)
+    assert list(ctyinfo.items()) == list(DE_CTYINFO.items())
+    assert len(ctyinfo) == len(DE_CTYINFO)
+    assert dict(ctyinfo) == DE_CTYINFO
+    assert ctyinfo["date_sep"] == ctyinfo.date_sep == "."
+    assert ctyinfo.get("no_such_field", "-") == "-"
+    assert "currency_symbol" in ctyinfo and "payload" not in ctyinfo
+    with pytest.raises(KeyError):
+        ctyinfo["no_such_field"]
@@ -0,0 +1,43 @@
+"""Buffered text output (LineWriter) and the text dump / --summary reports."""
+
+import pytest
+
+import cntrydump
+from conftest import read_data
+from cntrydump import LineWriter
+
+
+def test_line_writer_batches_lines():
+    chunks = []
+    with LineWriter(chunks.append, limit=10) as emit:
+        emit("abcd")
+        assert chunks == []
+        emit()
+        emit("efgh")
+        assert chunks == ["abcd\n\nefgh\n"]
+        emit("tail")
+    assert chunks == ["abcd\n\nefgh\n", "tail\n"]
+
+
+def test_line_writer_flush_without_lines():
+    chunks = []
+    LineWriter(chunks.append).flush()
+    assert chunks == []
+
+
+@pytest.mark.parametrize("options, golden", [([], "baseline_dump.txt"), (["--summary"], "baseline_summary.txt")])
+def test_cli_text_matches_baseline(country_sys_path, capsys, options, golden):
+    assert cntrydump.main([str(country_sys_path), *options]) == 0
+    assert capsys.readouterr().out == read_data(golden)
+
+
+@pytest.mark.parametrize("mode", ["--mmap", "--lazy"])
+def test_cli_parse_modes_print_the_same(country_sys_path, capsys, mode):
+    assert cntrydump.main([str(country_sys_path), mode]) == 0
+    assert capsys.readouterr().out == read_data("baseline_dump.txt")
+
+
+
+def test_cli_unsorted_no_offsets_matches_baseline(country_sys_path, capsys):
+    assert cntrydump.main([str(country_sys_path), "--unsorted", "--no-offsets"]) == 0
+    assert capsys.readouterr().out == read_data("baseline_dump_unsorted.txt")
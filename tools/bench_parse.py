@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+bench_parse.py - time the COUNTRY.SYS parser of cntrydump.py
+
+Times parse_country_sys() and decode_ctyinfo() on a synthetic file (see
+synthcountry.py), or on a real COUNTRY.SYS, and, where the module has them,
+the entry table walk and the subfunction header parse on their own.
+Reports the minimum over REPEAT rounds of NUMBER calls each.
+
+To compare two versions, point --module at another copy of the script:
+
+    git show <rev>:cntrydump.py > /tmp/cntrydump_old.py
+    tools/bench_parse.py --module /tmp/cntrydump_old.py
+    tools/bench_parse.py
+
+Usage:
+    bench_parse.py [--entries N | --file PATH] [--module PATH] [--repeat R] [--number N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import sys
+import timeit
+from types import ModuleType
+from typing import Callable, List, Optional, Tuple
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TOOLS)
+
+from synthcountry import build_country_sys, synthetic_entries  # noqa: E402
+
+
+def load_module(path: Optional[str]) -> ModuleType:
+    """Import cntrydump.py from path (None = the one next to tools/)."""
+    if path is None:
+        path = os.path.join(os.path.dirname(TOOLS), "cntrydump.py")
+    spec = importlib.util.spec_from_file_location("cntrydump_bench", path)
+    module = importlib.util.module_from_spec(spec)
+    # dataclasses look the module up in sys.modules while the class bodies run
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def benchmarks(mod: ModuleType, buf: bytes) -> List[Tuple[str, Optional[Callable[[], object]]]]:
+    """(name, callable) per timed stage; callable None if mod lacks the stage."""
+    doc = mod.parse_country_sys(buf)
+    ctyinfo = [(s.tagged, e.country) for e in doc.entries for s in e.subfuncs
+               if s.subfunc_id == 1 and s.tagged is not None]
+
+    def decode_all() -> None:
+        for tagged, country in ctyinfo:
+            mod.decode_ctyinfo(tagged, country)
+
+    entry_walk = subfunc_headers = None
+    if hasattr(mod, "_iter_entry_headers"):
+        ptrs = doc.entry_table_ptrs
+        headers = [(e.subfunc_header_ptr, e.country, e.codepage) for e in doc.entries]
+        # Older versions collect plain warning strings instead of Diagnostics
+        sink = getattr(mod, "Diagnostics", list)
+
+        def entry_walk() -> None:
+            for _ in mod._iter_entry_headers(buf, ptrs, sink()):
+                pass
+
+        def subfunc_headers() -> None:
+            diag = sink()
+            for ptr, country, codepage in headers:
+                mod._parse_subfuncs(buf, ptr, country, codepage, diag)
+
+    return [
+        ("parse_country_sys", lambda: mod.parse_country_sys(buf)),
+        ("entry table walk", entry_walk),
+        ("subfunction headers", subfunc_headers),
+        (f"decode_ctyinfo x{len(ctyinfo)}", decode_all),
+    ]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Time the COUNTRY.SYS parser of cntrydump.py.")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--entries", type=int, default=220, metavar="N",
+                     help="Entries of the synthetic file (default: 220)")
+    src.add_argument("--file", metavar="PATH", help="Time a real COUNTRY.SYS instead")
+    ap.add_argument("--module", metavar="PATH", help="cntrydump.py to time (default: this checkout's)")
+    ap.add_argument("--repeat", type=int, default=15, help="Rounds; the minimum is reported (default: 15)")
+    ap.add_argument("--number", type=int, default=10, help="Calls per round (default: 10)")
+    args = ap.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            buf = f.read()
+        label = args.file
+    else:
+        buf = build_country_sys(synthetic_entries(args.entries))
+        label = f"synthetic, {args.entries} entries"
+    mod = load_module(args.module)
+
+    print(f"# {mod.__file__}")
+    print(f"# {label}, {len(buf)} bytes; min of {args.repeat}x{args.number} runs")
+    for name, func in benchmarks(mod, buf):
+        if func is None:
+            print(f"  {name:<22}       n/a")
+            continue
+        best = min(timeit.repeat(func, repeat=args.repeat, number=args.number)) / args.number
+        print(f"  {name:<22} {best * 1e3:8.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
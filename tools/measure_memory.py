@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+measure_memory.py - memory held by a parsed COUNTRY.SYS, per entry
+
+Parses a synthetic file (see synthcountry.py), or a real COUNTRY.SYS, with
+tracemalloc running and reports the peak and the memory the parse result
+still holds afterwards, in total and per entry. The file buffer is read
+before tracing starts, so it is not counted; process-wide caches are
+warmed by one untraced parse first.
+
+To compare two versions, point --module at another copy of the script (see
+bench_parse.py).
+
+Usage:
+    measure_memory.py [--entries N | --file PATH] [--module PATH] [--lazy]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+TOOLS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, TOOLS)
+
+from bench_parse import load_module  # noqa: E402
+from synthcountry import build_country_sys, synthetic_entries  # noqa: E402
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Measure memory held by a parsed COUNTRY.SYS.")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--entries", type=int, default=450, metavar="N",
+                     help="Entries of the synthetic file (default: 450)")
+    src.add_argument("--file", metavar="PATH", help="Measure a real COUNTRY.SYS instead")
+    ap.add_argument("--module", metavar="PATH", help="cntrydump.py to measure (default: this checkout's)")
+    ap.add_argument("--lazy", action="store_true",
+                    help="Use parse_country_sys_lazy() (subfunctions are not resolved)")
+    args = ap.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            buf = f.read()
+        label = args.file
+    else:
+        buf = build_country_sys(synthetic_entries(args.entries))
+        label = "synthetic"
+    mod = load_module(args.module)
+    parse = mod.parse_country_sys_lazy if args.lazy else mod.parse_country_sys
+    parse(buf)
+
+    gc.collect()
+    tracemalloc.start()
+    doc = parse(buf)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = len(doc.entries) or 1
+    print(f"# {mod.__file__}")
+    print(f"# {label}, {len(buf)} bytes, {len(doc.entries)} entries{' (lazy)' if args.lazy else ''}")
+    print(f"  retained  {retained:10,} bytes  {retained // n:8,} bytes/entry")
+    print(f"  peak      {peak:10,} bytes  {peak // n:8,} bytes/entry")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+synthcountry.py - build synthetic COUNTRY.SYS files
+
+Produces files with the layout of the FreeDOS build (country.asm): file
+header, one entry table, the subfunction headers, then the tagged blocks,
+shared tables stored once, and the VERSION block plus "FreeDOS" trailer.
+Used by the tests and the tools/ measurement scripts, where nasm may not be
+available to assemble the real file.
+
+Usage:
+    synthcountry.py OUTPUT [--entries N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# (country, codepage, {subfunction ID: (magic, payload)})
+Entry = Tuple[int, int, Dict[int, Tuple[str, bytes]]]
+
+HEADER_SIZE = 0x17
+
+
+def tagged(magic: str, payload: bytes, tag: int = 0xFF, size: Optional[int] = None) -> bytes:
+    """A tagged block: tag, magic padded to 7 bytes, size WORD, payload."""
+    return (bytes([tag]) + magic.encode("ascii").ljust(7, b" ")
+            + struct.pack("<H", len(payload) if size is None else size) + payload)
+
+
+def ctyinfo(country: int, codepage: int, date_format: int = 0, currency: bytes = b"$",
+            thousands: bytes = b",", decimal: bytes = b".", date_sep: bytes = b"-",
+            time_sep: bytes = b":", currency_format: int = 0, decimals: int = 2,
+            time_format: int = 0, data_sep: bytes = b",") -> bytes:
+    """CTYINFO payload in the MS-DOS 6.x layout (38 bytes)."""
+    return struct.pack("<HHH5s2s2s2s2sBBBI2s10s", country, codepage, date_format, currency,
+                       thousands, decimal, date_sep, time_sep, currency_format, decimals,
+                       time_format, 0, data_sep, b"")
+
+
+# Shared tables, in the spirit of ucase_437 / fchar / en_collate_437
+UCASE_437 = bytes([128, 154, 69, 65, 142, 65, 143, 128, 69, 69, 69, 73, 73, 73, 142, 143,
+                   144, 146, 146, 79, 153, 79, 85, 85, 89, 153, 154, 155, 156, 157, 158, 159,
+                   65, 73, 79, 85, 165, 165]) + bytes(range(166, 256))
+UCASE_850 = bytes(range(128, 256))
+FCHAR = bytes([142, 0, 255, 65, 0, 32, 238, 14]) + b'."/\\[]:|<>+=;,'
+COLLATE_437 = bytes(range(256))
+# Same characters, with 'a'..'z' sorted together with 'A'..'Z'
+COLLATE_850 = bytes(c - 32 if 0x61 <= c <= 0x7A else c for c in range(256))
+YESNO_YN = b"Y\x00N\x00"
+YESNO_JN = b"J\x00N\x00"
+
+
+def standard_subfuncs(country: int, codepage: int, **ctyinfo_fields) -> Dict[int, Tuple[str, bytes]]:
+    """The 7 subfunctions of a country.asm COUNTRY entry."""
+    ucase = UCASE_850 if codepage == 850 else UCASE_437
+    return {
+        1: ("CTYINFO", ctyinfo(country, codepage, **ctyinfo_fields)),
+        2: ("UCASE", ucase),
+        4: ("UCASE", ucase),
+        5: ("FCHAR", FCHAR),
+        6: ("COLLATE", COLLATE_850 if codepage == 850 else COLLATE_437),
+        7: ("DBCS", b""),
+        35: ("YESNO", YESNO_JN if country == 49 else YESNO_YN),
+    }
+
+
+def synthetic_entries(n: int) -> List[Entry]:
+    """n entries cycling through a few countries and codepages."""
+    countries = (1, 31, 32, 33, 34, 39, 41, 44, 45, 46, 47, 49, 351, 358)
+    codepages = (437, 850, 858, 852, 860, 865)
+    out: List[Entry] = []
+    for i in range(n):
+        country = countries[i % len(countries)] + 1000 * (i // (len(countries) * len(codepages)))
+        codepage = codepages[(i // len(countries)) % len(codepages)]
+        out.append((country & 0xFFFF, codepage, standard_subfuncs(country & 0xFFFF, codepage)))
+    return out
+
+
+def build_country_sys(entries: Sequence[Entry], version: Optional[str] = "2.0",
+                      trailer: bytes = b"FreeDOS") -> bytes:
+    """
+    Assemble a COUNTRY.SYS image.
+
+    Args:
+        entries: (country, codepage, {sf_id: (magic, payload)}) per entry
+        version: "major.minor" for the VERSION block (None = no block)
+        trailer: Bytes appended at the very end
+
+    Returns:
+        The file contents; identical (magic, payload) blocks are stored
+        once and shared by all references, as in country.asm. DBCS blocks
+        with an empty payload are followed by the dummy terminator WORD.
+    """
+    entry_table = HEADER_SIZE
+    headers_start = entry_table + 2 + 14 * len(entries)
+    header_sizes = [2 + 8 * len(sfs) for _, _, sfs in entries]
+    blocks_start = headers_start + sum(header_sizes)
+
+    blocks = bytearray()
+    block_offsets: Dict[Tuple[str, bytes], int] = {}
+
+    def block(magic: str, payload: bytes) -> int:
+        off = block_offsets.get((magic, payload))
+        if off is None:
+            off = block_offsets[(magic, payload)] = blocks_start + len(blocks)
+            blocks.extend(tagged(magic, payload))
+            if magic == "DBCS" and not payload:
+                blocks.extend(b"\x00\x00")
+        return off
+
+    out = bytearray(b"\xffCOUNTRY" + bytes(8) + struct.pack("<HBI", 1, 1, entry_table))
+    out += struct.pack("<H", len(entries))
+    header_off = headers_start
+    headers = bytearray()
+    for (country, codepage, sfs), size in zip(entries, header_sizes):
+        out += struct.pack("<HHHHHI", 12, country, codepage, 0, 0, header_off)
+        headers += struct.pack("<H", len(sfs))
+        for sf_id, (magic, payload) in sfs.items():
+            headers += struct.pack("<HHI", 6, sf_id, block(magic, payload))
+        header_off += size
+    out += headers
+    out += blocks
+    if version is not None:
+        major, minor = version.split(".")
+        out += tagged("VERSION", major.encode() + b"\x00" + minor.encode() + b"\x00")
+    out += trailer
+    return bytes(out)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Write a synthetic COUNTRY.SYS file.")
+    ap.add_argument("output", help="File to write")
+    ap.add_argument("--entries", type=int, default=220, metavar="N",
+                    help="Number of country/codepage entries (default: 220)")
+    args = ap.parse_args()
+    data = build_country_sys(synthetic_entries(args.entries))
+    with open(args.output, "wb") as f:
+        f.write(data)
+    print(f"Wrote {args.output}: {len(data)} bytes, {args.entries} entries")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())